@@ -1,17 +1,38 @@
 import customtkinter as ctk
 from tkinter import messagebox,PhotoImage
 import threading
+import time
 import os
 import subprocess
 import sys
 import platform
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv, set_key
-from PIL import Image
-import asyncio
-from Rapports_trimestriel import effectuer_rapport_async_limited
 from config import Config
-from icecream import ic
-ic.disable()
+
+# Démarrage : seuls Tk, customtkinter (qui charge PIL.Image), dotenv et config
+# sont chargés avant la fenêtre. asyncio, la pile SMTP/IMAP/MIME
+# (Rapports_trimestriel) et icecream sont importés au premier usage, le logo
+# décodé une fois la fenêtre affichée (voir bench/startup_bench.py).
+if TYPE_CHECKING:
+    from progress import RunProgress, ProgressBoard
+
+_DEBUG = False   # TEST_MODE : traces icecream affichées
+
+
+def ic(*args):
+    """Trace icecream, chargé au premier appel (son import coûte ~0,1 s)."""
+    from icecream import ic as _ic
+    if not _DEBUG:
+        _ic.disable()
+    return _ic(*args)
+
+
+def enable_debug():
+    global _DEBUG
+    _DEBUG = True
+    from icecream import ic as _ic
+    _ic.enable()
 
 def resource_path(relative_path):
     try:
@@ -21,7 +42,9 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 ENV_FILE = resource_path(".env")
-MODE = "ASH"
+MODE = "ASH"   # profil par défaut (éditeur de modèles, PROFILES absent du .env)
+FRAME_MS = 100   # rafraîchissement de la progression (10 images/s)
+TABLE_COLUMNS = ("Protégé", "État", "Envoyé", "Débit", "Reste")
 
 load_dotenv(override=True)
 
@@ -29,7 +52,7 @@ class ASHGUI(ctk.CTk):
     def __init__(self):
         super().__init__()
         self.title("Envoi de Rapports ASH")
-        self.geometry("400x350")
+        self.geometry("640x640")
         self.ENV_FILE = r".env"
         self.grid_columnconfigure(0, weight=1)
         system = platform.system()
@@ -49,38 +72,151 @@ class ASHGUI(ctk.CTk):
                 except Exception as e:
                     ic(f"Unix icon load failed: {e}")
 
-        try:
-            logo_path = resource_path(r"assets\\ASH.png")
-            logo_img = ctk.CTkImage(Image.open(logo_path), size=(100, 100))
-            ctk.CTkLabel(self, image=logo_img, text="").pack(pady=(10, 0))
-        except:
-            pass
+        # logo décodé une fois la fenêtre affichée
+        self.logo_label = ctk.CTkLabel(self, text="", width=100, height=100)
+        self.logo_label.pack(pady=(10, 0))
+        self.after_idle(self._load_logo)
 
         ctk.CTkLabel(self, text="Envoi Automatisé des Rapports aide sociale", font=("Helvetica", 18)).pack(pady=10)
 
         self.status_label = ctk.CTkLabel(self, text="")
         self.status_label.pack(pady=5)
 
-        ctk.CTkButton(self, text="Envoyer les Rapports", command=self.threaded_launch_script).pack(pady=10)
+        # Progression par protégé, alimentée par le run via RunProgress
+        self.totals_label = ctk.CTkLabel(self, text="")
+        self.totals_label.pack(pady=(0, 5))
+        self.table = ctk.CTkScrollableFrame(self, height=200)
+        self.table.pack(fill="both", expand=True, padx=10, pady=5)
+        for col, title in enumerate(TABLE_COLUMNS):
+            self.table.grid_columnconfigure(col, weight=2 if col == 0 else 1)
+            ctk.CTkLabel(self.table, text=title, font=("Helvetica", 12, "bold")).grid(row=0, column=col, sticky="w", padx=4)
+        self.progress: RunProgress | None = None
+        self.board: ProgressBoard | None = None
+        self._rows: dict[str, tuple[list, list]] = {}   # protégé → (labels, textes affichés)
+
+        buttons = ctk.CTkFrame(self, fg_color="transparent")
+        buttons.pack(pady=10)
+        self.send_button = ctk.CTkButton(buttons, text="Envoyer les Rapports", command=self.threaded_launch_script)
+        self.send_button.pack(side="left", padx=5)
+        self.cancel_button = ctk.CTkButton(buttons, text="Annuler l'envoi", command=self.cancel_run, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
         ctk.CTkButton(self, text="Ouvrir le Dossier 'Protégés'", command=self.open_proteges_folder).pack(pady=5)
         ctk.CTkButton(self, text="Paramètres", command=self.open_settings).pack(pady=5)
 
-    def threaded_launch_script(self):
-        threading.Thread(target=self.launch_script, daemon=True).start()
-
-    def launch_script(self):
-        def update_status(msg):
-            self.status_label.configure(text=msg)
+    def _load_logo(self):
+        try:
+            from PIL import Image
+            logo_path = resource_path(r"assets\\ASH.png")
+            self.logo_img = ctk.CTkImage(Image.open(logo_path), size=(100, 100))
+            self.logo_label.configure(image=self.logo_img)
+        except:
+            pass
 
+    def threaded_launch_script(self):
+        from progress import RunProgress, ProgressBoard
+        if self.progress is not None:
+            return  # un run est déjà en cours
+        for labels, _ in self._rows.values():
+            for label in labels:
+                label.destroy()
+        self._rows.clear()
+        self.progress = RunProgress()
+        self.board = ProgressBoard()
+        self.send_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
         self.status_label.configure(text="Envoi des rapports en cours...")
+        self.totals_label.configure(text="")
+        threading.Thread(target=self.launch_script, args=(self.progress,), daemon=True).start()
+        self.after(FRAME_MS, self._poll_progress)
+
+    def launch_script(self, progress: "RunProgress"):
+        """Thread du run : ne touche jamais aux widgets, tout passe par `progress`."""
         try:
-            config = Config.load(self.ENV_FILE, mode="ASH")
-            asyncio.run(effectuer_rapport_async_limited(config=config,status_callback=update_status))
-            self.status_label.configure(text="Rapports envoyés avec succès !")
-            messagebox.showinfo("Succès", "Les rapports ont été envoyés avec succès !")
+            # PROFILES=ASH,APA dans le .env : les deux profils dans le même run
+            profiles = Config.load_profiles(self.ENV_FILE, default=MODE)
+            # pile réseau / MIME chargée au premier envoi, hors du démarrage
+            import asyncio
+            from Rapports_trimestriel import effectuer_rapport_async_limited
+            if profiles[0].paths.test_mode:
+                enable_debug()   # après les imports : chaque module fait ic.disable()
+            asyncio.run(effectuer_rapport_async_limited(
+                profiles=profiles, status_callback=progress.message, progress=progress,
+            ))
         except Exception as e:
+            progress.end(error=str(e))
+        else:
+            progress.end()
+
+    def cancel_run(self):
+        if self.progress is None:
+            return
+        self.progress.cancel()
+        self.cancel_button.configure(state="disabled")
+        self.status_label.configure(text="Annulation : fin des envois en cours…")
+
+    # ------------------------------------------------------------
+    # Progression (thread Tk, toutes les FRAME_MS)
+    # ------------------------------------------------------------
+
+    def _poll_progress(self):
+        from progress import SENDING, RETRY, format_rate, format_eta
+        progress, board = self.progress, self.board
+        if progress is None or board is None:
+            return
+        changed = board.apply(progress.drain(), progress.bytes_sent())
+        if board.status and not progress.cancelled:
+            self.status_label.configure(text=board.status)
+        # débit et reste des envois en cours bougent même sans nouvel événement
+        live = {name for name, row in board.rows.items() if row.state in (SENDING, RETRY)}
+        for name in changed | live:
+            self._render_row(name)
+        totals = board.totals()
+        self.totals_label.configure(text=(
+            f"{totals['done']}/{totals['count']} envoyés, {totals['failed']} échecs — "
+            f"{totals['sent'] / (1024 * 1024):.1f}/{totals['total'] / (1024 * 1024):.1f} Mo, "
+            f"{format_rate(totals['rate'])}, reste {format_eta(totals['eta'])}"
+        ))
+        if board.finished:
+            self._on_run_end(board)
+        else:
+            self.after(FRAME_MS, self._poll_progress)
+
+    def _render_row(self, name: str):
+        from progress import LABELS, format_rate, format_eta
+        row = self.board.rows[name]  # type: ignore[union-attr]
+        now = time.monotonic()
+        texts = [
+            name,
+            LABELS.get(row.state, row.state),
+            f"{row.sent / (1024 * 1024):.1f}/{row.total / (1024 * 1024):.1f} Mo",
+            format_rate(row.rate(now)),
+            format_eta(row.eta(now)),
+        ]
+        if name not in self._rows:
+            index = len(self._rows) + 1
+            labels = [ctk.CTkLabel(self.table, text="", anchor="w") for _ in TABLE_COLUMNS]
+            for col, label in enumerate(labels):
+                label.grid(row=index, column=col, sticky="w", padx=4)
+            self._rows[name] = (labels, [""] * len(TABLE_COLUMNS))
+        labels, shown = self._rows[name]
+        for i, text in enumerate(texts):
+            if shown[i] != text:
+                labels[i].configure(text=text)
+                shown[i] = text
+
+    def _on_run_end(self, board: "ProgressBoard"):
+        self.progress = None
+        self.send_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+        if board.error:
             self.status_label.configure(text="Une erreur est survenue.")
-            messagebox.showerror("Erreur", f"Une erreur est survenue lors de l'envoi des rapports :\n{e}")
+            messagebox.showerror("Erreur", f"Une erreur est survenue lors de l'envoi des rapports :\n{board.error}")
+        elif board.cancelled:
+            self.status_label.configure(text=board.status or "Envoi annulé.")
+            messagebox.showinfo("Annulé", "Envoi annulé : les envois en cours ont été terminés.")
+        else:
+            self.status_label.configure(text=board.status or "Rapports envoyés avec succès !")
+            messagebox.showinfo("Succès", "Les rapports ont été envoyés avec succès !")
 
     def open_proteges_folder(self):
         folder_path = os.path.abspath("Protégés")
@@ -289,7 +425,7 @@ class TemplateEditorWindow(ctk.CTkToplevel):
 if __name__ == "__main__":
     config = Config.load(".env", mode=MODE)
     if config.paths.test_mode:
-        ic.enable()
+        enable_debug()
 
     ctk.set_appearance_mode("System")
     ctk.set_default_color_theme("blue")
@@ -1,4 +1,7 @@
 import os
+import re
+import threading
+from dataclasses import dataclass
 from email.message import EmailMessage
 from email.utils import make_msgid, formatdate
 from datetime import datetime
@@ -16,6 +19,86 @@ def load_template(TEMPLATE_DIR:str, name: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
+
+@dataclass
+class CompiledTemplates:
+    """Templates d'un profil, prêts à l'emploi : il ne reste que la substitution."""
+    subject: str          # sujet sur une ligne, pour str.format_map
+    html: Template        # corps HTML
+    text: Template        # corps texte, html_to_text déjà appliqué au template (voir _text_values)
+
+
+# $variables du template mises de côté pendant html_to_text : \x01 + numéro + \x02
+_HOLE = "\x01{}\x02"
+_HOLE_RE = re.compile("\x01(\\d+)\x02")
+
+
+def _text_template(body_html: str) -> Template:
+    """
+    Template du corps texte : html_to_text appliqué au template HTML, les
+    $variables mises de côté pendant la conversion. Tout "$" qui en sort
+    ($$ du source, &#36;, texte) est un dollar littéral, échappé en "$$".
+    """
+    holes: list[str] = []
+
+    def keep(m: re.Match) -> str:
+        name = m.group("named") or m.group("braced")
+        if name is None:
+            return "$" if m.group("escaped") is not None else m.group()
+        holes.append("${%s}" % name)
+        return _HOLE.format(len(holes) - 1)
+
+    text = html_to_text(Template.pattern.sub(keep, body_html)).replace("$", "$$")
+    return Template(_HOLE_RE.sub(lambda m: holes[int(m.group(1))], text))
+
+
+# (chemin sujet, chemin corps) -> (empreinte des fichiers, templates compilés)
+_COMPILED: dict[tuple[str, str], tuple[tuple, CompiledTemplates]] = {}
+_COMPILED_LOCK = threading.Lock()
+
+
+def _stamp(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_compiled_templates(TEMPLATE_DIR: str, subject_name: str, body_html_name: str) -> CompiledTemplates:
+    """
+    Templates compilés, mis en cache par chemin + mtime/taille : un fichier
+    modifié (ex. TemplateEditorWindow.save_templates) est relu au message suivant.
+    """
+    key = (os.path.join(TEMPLATE_DIR, subject_name), os.path.join(TEMPLATE_DIR, body_html_name))
+    stamp = (_stamp(key[0]), _stamp(key[1]))
+
+    with _COMPILED_LOCK:
+        cached = _COMPILED.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    subject_tpl = load_template(TEMPLATE_DIR, subject_name)
+    body_html_tpl = load_template(TEMPLATE_DIR, body_html_name)
+
+    compiled = CompiledTemplates(
+        subject=subject_tpl.replace("\r", " ").replace("\n", " ").strip(),
+        html=Template(body_html_tpl),
+        # valeurs converties à part, à chaque message (_text_values)
+        text=_text_template(body_html_tpl),
+    )
+    with _COMPILED_LOCK:
+        _COMPILED[key] = (stamp, compiled)
+    return compiled
+
+def _text_values(context: dict) -> dict:
+    """
+    Valeurs pour le corps texte : le template texte est converti avant
+    substitution, une valeur qui contient du HTML (balises, entités) passe
+    donc elle-même par html_to_text, comme elle le ferait dans le corps HTML.
+    """
+    return {
+        k: html_to_text(v) if isinstance(v, str) and ("<" in v or "&" in v) else v
+        for k, v in context.items()
+    }
+
 # --------- Create Email ---------
 
 def compose_email(config: Config, context: dict) -> EmailMessage:
@@ -24,17 +107,20 @@ def compose_email(config: Config, context: dict) -> EmailMessage:
     TEMPLATE_DIR = config.template.TEMPLATE_DIR
     sender = config.identity.email
     recipient = config.identity.emailrec
+    templates = load_compiled_templates(
+        TEMPLATE_DIR,
+        config.template.subject_template_name,
+        config.template.body_html_template_name,
+    )
+
     # ---- Sujet ----
-    subject_tpl = load_template(TEMPLATE_DIR, config.template.subject_template_name)
-    subject_tpl = subject_tpl.replace("\r", " ").replace("\n", " ").strip()
-    subject = subject_tpl.format_map(context)
+    subject = templates.subject.format_map(context)
 
     # ---- Corps HTML ----
-    body_html_tpl = load_template(TEMPLATE_DIR, config.template.body_html_template_name)
-    body_html = Template(body_html_tpl).substitute(context)
+    body_html = templates.html.substitute(context)
 
-        # ---- Corps TXT (obligatoire) ----
-    body_txt = html_to_text(body_html)
+    # ---- Corps TXT (obligatoire) ----
+    body_txt = templates.text.substitute(_text_values(context))
 
     # Construction message
     msg = EmailMessage()
@@ -0,0 +1,50 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Variante « onedir » de Rapporteur ASH.spec : l'exécutable et ses
+# bibliothèques restent décompressés dans dist\Rapporteur ASH\, rien n'est
+# extrait dans %TEMP% à chaque lancement (démarrage plus rapide), et UPX est
+# désactivé (les DLL n'ont pas à être décompressées au chargement).
+# Build : build.bat onedir
+
+
+a = Analysis(
+    ['ASH_Email.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('assets', 'assets')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='Rapporteur ASH',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['assets\\icon.ico'],
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='Rapporteur ASH',
+)
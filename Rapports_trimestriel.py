@@ -1,27 +1,63 @@
 # Rapports_trimestriel_APA.py
 
 import os
+import sys
+import time
+import pstats
 import asyncio
+import itertools
+import cProfile
 import tempfile
 import shutil
 from typing import List, Optional
+from contextlib import nullcontext
+from functools import partial
+from dataclasses import dataclass
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime, date
 
 from config import Config
-from send_email import send_email  # version modernisée qu'on vient de corriger
+from send_email import (  # version modernisée qu'on vient de corriger
+    PreparedEmail,
+    prepare_email,
+    deliver_email,
+    finish_email,
+    deliver_email_async,
+    finish_email_async,
+    est_smtp_mb,
+)
+from smtp_pool import SMTPPool, DeliveryUnknown
+from imap_session import IMAPSession
+from async_transport import AsyncSMTPPool, AsyncIMAPSession
+from delivery_tracker import DeliveryTracker
+from smtp_limiter import AdaptiveLimiter, is_deferral, backoff_delay
+from rate_limit import SendQuota
+from run_journal import RunJournal, fingerprint, file_digests, PENDING, PREPARED, ACCEPTED, FAILED, UNKNOWN
+from manifest import Manifest, FolderEntry
+from progress import (
+    RunProgress, WAITING, PREPARING, QUEUED, SENDING, RETRY, FINISHING, DONE, CANCELLED,
+    FAILED as SEND_FAILED,
+)
+from run_log import get_logger, close_logger
+import perf
 from icecream import ic
 ic.disable()
 
 # ---------- Utilitaires ----------
-def log_message(log_dir: str, txt: str) -> None:
-    os.makedirs(log_dir, exist_ok=True)
-    path = os.path.join(log_dir, "log.txt")
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {txt}\n")
+def log_message(log_dir: str, txt: str, **event) -> None:
+    """
+    Ligne dans <log_dir>/log.txt (+ événement dans events.jsonl si des champs
+    sont donnés). Écrit en tâche de fond par le thread du RunLogger.
+    """
+    get_logger(log_dir).write(txt, **event)
     ic(txt)
 
 
+def log_event(log_dir: str, **event) -> None:
+    """Événement structuré seul (events.jsonl), sans ligne dans log.txt."""
+    get_logger(log_dir).write("", **event)
+
+
 def init_log_session(base_log_dir: str) -> str:
     run_dir = os.path.join(base_log_dir, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
     os.makedirs(run_dir, exist_ok=True)
@@ -77,30 +113,16 @@ def current_trimester(today: Optional[date] = None) -> tuple[int, int, str]:
     return tri, yr, suffix
 
 
-def _list_proteges(root: str) -> List[str]:
-    try:
-        return [
-            os.path.join(root, n)
-            for n in os.listdir(root)
-            if os.path.isdir(os.path.join(root, n))
-        ]
-    except FileNotFoundError:
-        return []
-
-
-def _list_files(dir_path: str) -> List[str]:
-    return [
-        os.path.join(dir_path, n)
-        for n in os.listdir(dir_path)
-        if os.path.isfile(os.path.join(dir_path, n))
-    ]
-
-
 def attachments_size_mb(paths: List[str]) -> float:
     return sum(os.path.getsize(p) for p in paths if os.path.isfile(p)) / (1024 * 1024)
 
 
 def _archive_and_clear_files(run_dir: str, protege_name: str, files: List[str]) -> None:
+    with perf.span("archive"):
+        _move_files(run_dir, protege_name, files)
+
+
+def _move_files(run_dir: str, protege_name: str, files: List[str]) -> None:
     dest_dir = os.path.join(run_dir, "sent", protege_name)
     os.makedirs(dest_dir, exist_ok=True)
     for p in files:
@@ -115,109 +137,839 @@ def _archive_and_clear_files(run_dir: str, protege_name: str, files: List[str])
                 pass
 
 
-# ---------- Envoi 1 protégé via send_email ----------
+# ---------- Pipeline : préparation → envoi → copie IMAP + archivage ----------
+@dataclass
+class _Job:
+    protege_name: str
+    files: List[str]
+    ctx: dict
+    prepared: Optional[PreparedEmail] = None
+    success: bool = False
+    fingerprint: str = ""             # calculée à la préparation (ou à la reprise si besoin)
+    folder: Optional[FolderEntry] = None   # entrée du manifeste (SHA-256 déjà connus)
+    archived: bool = False
+    cancelled: bool = False
+    unknown: bool = False             # réception incertaine : ni renvoyé, ni archivé
+    profile: str = ""                 # run à plusieurs profils : "ASH", "APA"...
+    config: Optional[Config] = None   # templates / dossier IMAP du profil
+
+    @property
+    def key(self) -> str:
+        """Nom dans le journal, la progression et l'archive : « ASH/Dupont » si plusieurs profils."""
+        return f"{self.profile}/{self.protege_name}" if self.profile else self.protege_name
+
+
+def _fingerprint(job: _Job) -> str:
+    """Empreinte des pièces jointes ; les SHA-256 lus restent dans le manifeste (runs suivants d'une surveillance)."""
+    digests = file_digests(job.files, job.folder.digests if job.folder is not None else None)
+    if job.folder is not None:
+        job.folder.remember(digests)
+    return fingerprint(job.files, digests)
+
+
+def _make_ctx(protege_name: str, tri: int, yr: int, suffix: str, files: List[str], config: Config) -> dict:
+    # Contexte pour send_email (identique à ce qu'on a fait pour ASH)
+    return {
+        "name": protege_name,
+        "tri": tri,
+        "year": yr,
+        "suffix": suffix,
+        "date": datetime.now().strftime("%d/%m/%Y"),
+        "sender_name": config.identity.name_sender,
+        "sender_role": config.identity.role,
+        "attachments": files,
+    }
+
+
+async def _prepare_one(job: _Job, config: Config, log_dir: str, executor: Executor) -> bool:
+    """Étape 1 : composition, zip/découpage, spool (CPU/disque)."""
+    info_mb = est_smtp_mb(job.files, config, sizes=job.ctx.get("sizes"))
+    log_message(
+        log_dir,
+        f"{job.key}: tentative via send_email (APA), "
+        f"taille SMTP≈{info_mb:.2f}MB (seuil info {config.smtp.max_mb}MB)"
+    )
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    try:
+        job.prepared = await loop.run_in_executor(executor, prepare_email, config, job.ctx)
+    except Exception as e:
+        log_message(
+            log_dir, f"FAIL {job.key} via send_email (APA): {e}",
+            protege=job.key, stage="prepare", outcome="fail",
+            duration=round(time.perf_counter() - t0, 3), error=str(e),
+        )
+        return False
+    log_event(
+        log_dir, protege=job.key, stage="prepare", outcome="ok",
+        duration=round(time.perf_counter() - t0, 3),
+        bytes=sum(sp.size for _, sp in job.prepared.messages),
+        messages=len(job.prepared.messages),
+    )
+
+    zip_stats = job.ctx.get("zip_stats")
+    if zip_stats and zip_stats.get("skipped"):
+        log_message(
+            log_dir,
+            f"{job.key}: zip ignoré (≈{zip_stats['projected_bytes'] / (1024 * 1024):.2f}MB "
+            f"prévus, toujours au-dessus du seuil) → envoi découpé"
+        )
+    elif zip_stats:
+        log_message(
+            log_dir,
+            f"{job.key}: zip {zip_stats['saved'] / (1024 * 1024):.2f}MB économisés "
+            f"en {zip_stats['seconds']:.2f}s ({zip_stats['stored']} stockés, "
+            f"{zip_stats['deflated']} compressés)"
+        )
+    return True
+
+
 async def _send_one(
-    sem: asyncio.Semaphore,
-    protege_name: str,
-    tri: int,
-    yr: int,
-    suffix: str,
-    files: List[str],
+    job: _Job,
+    config: Config,
     log_dir: str,
+    executor: Executor,
+    smtp_pool: "SMTPPool | AsyncSMTPPool | None" = None,
+    limiter: Optional[AdaptiveLimiter] = None,
+    quota: Optional[SendQuota] = None,
+    progress: Optional[RunProgress] = None,
+) -> str:
+    """
+    Étape 2 : envoi SMTP du (des) message(s) préparé(s) ; renvoie l'état à
+    journaliser : ACCEPTED, FAILED, ou UNKNOWN si la connexion a été coupée
+    après la fin du DATA (le serveur a peut-être accepté : pas de renvoi).
+    Un refus temporaire (421/4xx, connexion coupée) est retenté jusqu'à
+    `smtp.retries` fois, après une attente exponentielle avec jitter ;
+    `limiter` borne le parallélisme et apprend des réponses du serveur,
+    `quota` fait attendre ce qu'il faut pour rester sous les quotas du
+    fournisseur. Avec `progress`, une annulation interrompt ces attentes
+    (job.cancelled) mais jamais une transaction SMTP commencée.
+    """
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    nbytes = sum(sp.size for _, sp in job.prepared.messages)  # type: ignore[union-attr]
+    event = {
+        "protege": job.key,
+        "stage": "send",
+        "bytes": nbytes,
+        "message_id": job.ctx.get("message_id"),
+    }
+    if progress is not None:
+        for _, sp in job.prepared.messages:  # type: ignore[union-attr]
+            sp.on_progress = lambda n, name=job.key: progress.add_bytes(name, n)
+    attempt = 0
+    while True:
+        delay = None
+        if quota is not None:
+            # avant le créneau : l'attente de quota ne bloque pas de connexion
+            pending = job.prepared.pending_parts()  # type: ignore[union-attr]
+            acquire = quota.acquire(len(pending), sum(job.prepared.messages[i][1].size for i in pending))  # type: ignore[union-attr]
+            if progress is None:
+                await acquire
+            elif not await progress.wait(acquire):
+                job.cancelled = True
+                return FAILED
+        async with (limiter.slot() if limiter is not None else nullcontext()) as epoch:
+            if progress is not None:
+                if progress.cancelled:
+                    job.cancelled = True
+                    return FAILED
+                progress.emit(job.key, SENDING)
+            t_send = time.perf_counter()
+            try:
+                if isinstance(smtp_pool, AsyncSMTPPool):
+                    # moteur asyncio : l'envoi tourne sur la boucle, sans thread
+                    success = await deliver_email_async(job.prepared, config, smtp_pool)
+                else:
+                    # deliver_email est synchrone → on le pousse dans un thread dédié à l'envoi
+                    success = await loop.run_in_executor(executor, deliver_email, job.prepared, config, smtp_pool)
+            except Exception as e:
+                if isinstance(e, DeliveryUnknown):
+                    log_message(
+                        log_dir, f"INCERTAIN {job.key} via send_email (APA): {e}",
+                        **event, outcome="unknown", duration=round(time.perf_counter() - t0, 3),
+                        error=str(e), attempts=attempt + 1,
+                    )
+                    return UNKNOWN
+                if not is_deferral(e) or attempt >= config.smtp.retries:
+                    log_message(
+                        log_dir, f"FAIL {job.key} via send_email (APA): {e}",
+                        **event, outcome="fail", duration=round(time.perf_counter() - t0, 3),
+                        error=str(e), attempts=attempt + 1,
+                    )
+                    return FAILED
+                if limiter is not None:
+                    limiter.on_throttle(epoch)
+                    limiter.stats["retries"] += 1
+                delay = backoff_delay(attempt, config.smtp.retry_base)
+                log_message(
+                    log_dir, f"{job.key}: envoi différé ({e}), nouvel essai dans {delay:.1f}s",
+                    **event, outcome="deferred", error=str(e), attempts=attempt + 1,
+                )
+                if progress is not None:
+                    # les parties déjà acceptées restent comptées, le reste repartira
+                    done = set(range(len(job.prepared.messages))) - set(job.prepared.pending_parts())  # type: ignore[union-attr]
+                    progress.set_bytes(job.key, sum(job.prepared.messages[i][1].size for i in done))  # type: ignore[union-attr]
+                    progress.emit(job.key, RETRY, error=str(e))
+            else:
+                if limiter is not None and success:
+                    limiter.on_success(epoch, nbytes, time.perf_counter() - t_send)
+        if delay is None:
+            break
+        # l'attente se fait hors créneau : les autres envois continuent
+        if progress is None:
+            await asyncio.sleep(delay)
+        elif not await progress.sleep(delay):
+            job.cancelled = True
+            return FAILED
+        attempt += 1
+
+    event.update(outcome="ok" if success else "refused", duration=round(time.perf_counter() - t0, 3))
+    if attempt:
+        event["attempts"] = attempt + 1
+    if success:
+        log_message(log_dir, f"OK {job.key} via send_email (APA)", **event)
+    else:
+        log_message(log_dir, f"FAIL SMTP {job.key} via send_email (APA, accepted=False)", **event)
+    return ACCEPTED if success else FAILED
+
+
+async def _finish_one(
+    job: _Job,
     config: Config,
+    log_dir: str,
+    executor: Executor,
     move_after_ok: bool = True,
-) -> bool:
-    async with sem:
-        # Contexte pour send_email (identique à ce qu'on a fait pour ASH)
-        ctx = {
-            "name": protege_name,
-            "tri": tri,
-            "year": yr,
-            "suffix": suffix,
-            "date": datetime.now().strftime("%d/%m/%Y"),
-            "sender_name": config.identity.name_sender,
-            "sender_role": config.identity.role,
-            "attachments": files,
-        }
-
-        info_mb = attachments_size_mb(files) * config.smtp.b64_overhead
+    imap_session: Optional[IMAPSession] = None,
+    tracker: Optional[DeliveryTracker] = None,
+    imap_appender: Optional[AsyncIMAPSession] = None,
+) -> None:
+    """Étape 3 : copies IMAP, libération des spools, archivage des fichiers envoyés."""
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    try:
+        if imap_appender is not None and imap_session is not None:
+            await finish_email_async(job.prepared, config, imap_session, imap_appender)
+        else:
+            await loop.run_in_executor(executor, finish_email, job.prepared, config, False, imap_session)
+        if not job.success:
+            return
+        if tracker is not None:
+            tracker.expect(job.key, job.ctx["message_id"], job.ctx["subject"], job.ctx.get("parts"))
+        if move_after_ok:
+            await loop.run_in_executor(executor, _archive_and_clear_files, log_dir, job.key, job.files)
+            job.archived = not any(os.path.exists(p) for p in job.files)
+            if not job.archived:
+                log_message(log_dir, f"{job.key}: archivage incomplet, fichiers laissés en place")
+        log_event(
+            log_dir, protege=job.key, stage="finish", outcome="ok",
+            duration=round(time.perf_counter() - t0, 3),
+            imap_copied=job.prepared.result(config)["copied_sent"], archived=job.archived,  # type: ignore[union-attr]
+        )
+    except Exception as e:
         log_message(
-            log_dir,
-            f"{protege_name}: tentative via send_email (APA), "
-            f"taille SMTP≈{info_mb:.2f}MB (seuil info {config.smtp.max_mb}MB)"
+            log_dir, f"{job.key}: suivi après envoi incomplet: {e}",
+            protege=job.key, stage="finish", outcome="fail",
+            duration=round(time.perf_counter() - t0, 3), error=str(e),
         )
 
-        try:
-            # send_email est synchrone → on le pousse dans un thread
-            success = await asyncio.to_thread(send_email, config, ctx, False)
-
-            if success:
-                log_message(log_dir, f"OK {protege_name} via send_email (APA)")
-                if move_after_ok:
-                    _archive_and_clear_files(log_dir, protege_name, files)
-                return True
-            else:
-                log_message(log_dir, f"FAIL SMTP {protege_name} via send_email (APA, accepted=False)")
-                return False
 
-        except Exception as e:
-            log_message(log_dir, f"FAIL {protege_name} via send_email (APA): {e}")
+async def _run_pipeline(
+    jobs: List[_Job],
+    config: Config,
+    log_dir: str,
+    move_after_ok: bool,
+    smtp_pool: "SMTPPool | AsyncSMTPPool | None" = None,
+    imap_session: Optional[IMAPSession] = None,
+    tracker: Optional[DeliveryTracker] = None,
+    imap_appender: Optional[AsyncIMAPSession] = None,
+    journal: Optional[RunJournal] = None,
+    limiter: Optional[AdaptiveLimiter] = None,
+    quota: Optional[SendQuota] = None,
+    progress: Optional[RunProgress] = None,
+) -> List[bool]:
+    """
+    Trois étapes reliées par des files bornées, chacune avec ses propres
+    threads : pendant qu'un message part en SMTP, les suivants se préparent.
+    Une file pleine bloque l'étape précédente (backpressure).
+    Chaque changement d'état est écrit dans `journal` (reprise après arrêt).
+    Avec `limiter`, autant d'envoyeurs que son maximum, dont seuls `limit`
+    travaillent à la fois.
+    Avec `progress`, chaque étape y publie l'état des protégés ; après une
+    annulation, plus rien n'est préparé ni envoyé, les envois en cours vont
+    au bout et sont suivis normalement (copie IMAP, archivage). Les protégés
+    non envoyés restent « en cours » dans le journal : une reprise les enverra.
+    """
+    pc = config.pipeline
+    n_prepare = max(1, pc.prepare_workers)
+    n_send = limiter.maximum if limiter is not None else max(1, config.smtp.concurrency)
+    n_post = max(1, pc.post_workers)
+
+    todo: asyncio.Queue = asyncio.Queue()
+    to_send: asyncio.Queue = asyncio.Queue(maxsize=max(1, pc.queue_size))
+    to_finish: asyncio.Queue = asyncio.Queue(maxsize=max(1, pc.queue_size))
+
+    loop = asyncio.get_running_loop()
+    prepare_ex = ThreadPoolExecutor(max_workers=n_prepare, thread_name_prefix="prepare")
+    send_ex = ThreadPoolExecutor(max_workers=n_send, thread_name_prefix="send")
+    post_ex = ThreadPoolExecutor(max_workers=n_post, thread_name_prefix="post")
+    # un seul écrivain : les commits synchrones du journal (fsync) hors de la boucle, dans l'ordre
+    journal_ex = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+
+    async def record(job: _Job, **fields):
+        if journal is not None:
+            await loop.run_in_executor(journal_ex, partial(journal.record, job.key, job.fingerprint, **fields))
+
+    def emit(job: _Job, state: str, **fields):
+        if progress is not None:
+            progress.emit(job.key, state, **fields)
+
+    def cancel(job: _Job) -> bool:
+        """Vrai (et job marqué annulé) si une annulation a été demandée."""
+        if progress is None or not (job.cancelled or progress.cancelled):
             return False
+        job.cancelled = True
+        emit(job, CANCELLED)
+        return True
+
+    async def preparer():
+        while (job := await todo.get()) is not None:
+            if cancel(job):
+                continue
+            if journal is not None and not job.fingerprint:
+                # contenu lu ici, pendant que les envois précédents partent
+                try:
+                    job.fingerprint = await loop.run_in_executor(prepare_ex, _fingerprint, job)
+                except OSError as e:
+                    log_message(log_dir, f"{job.key}: pièces jointes illisibles: {e}")
+                    emit(job, SEND_FAILED, error="préparation")
+                    continue
+            await record(job, status=PENDING, run_dir=log_dir, error=None)
+            emit(job, PREPARING)
+            if await _prepare_one(job, job.config or config, log_dir, prepare_ex):
+                await record(job, status=PREPARED, message_id=job.ctx["message_id"])
+                emit(job, QUEUED, total=sum(sp.size for _, sp in job.prepared.messages))  # type: ignore[union-attr]
+                await to_send.put(job)
+            else:
+                await record(job, status=FAILED, error="préparation")
+                emit(job, SEND_FAILED, error="préparation")
+
+    async def sender():
+        while (job := await to_send.get()) is not None:
+            if cancel(job):
+                continue
+            status = await _send_one(job, job.config or config, log_dir, send_ex, smtp_pool, limiter, quota, progress)
+            if job.cancelled:   # annulé pendant une attente (quota, nouvel essai)
+                emit(job, CANCELLED)
+                continue
+            job.success, job.unknown = status == ACCEPTED, status == UNKNOWN
+            error = None if job.success else "réception incertaine" if job.unknown else "smtp"
+            await record(job, status=status, error=error)
+            emit(job, FINISHING if job.success else SEND_FAILED, error=error)
+            await to_finish.put(job)
+
+    async def finisher():
+        while (job := await to_finish.get()) is not None:
+            await _finish_one(job, job.config or config, log_dir, post_ex, move_after_ok, imap_session, tracker, imap_appender)
+            if job.success:
+                await record(job, imap_copied=job.prepared.result(config)["copied_sent"], archived=job.archived)
+                emit(job, DONE)
+
+    for job in jobs:
+        todo.put_nowait(job)
+        emit(job, WAITING, total=int(sum(job.ctx.get("sizes", {}).values()) * config.smtp.b64_overhead))
+
+    async def stage(workers, n, downstream: Optional[asyncio.Queue], n_down: int):
+        await asyncio.gather(*(workers() for _ in range(n)))
+        if downstream is not None:
+            for _ in range(n_down):
+                await downstream.put(None)
+
+    try:
+        for _ in range(n_prepare):
+            todo.put_nowait(None)
+        await asyncio.gather(
+            stage(preparer, n_prepare, to_send, n_send),
+            stage(sender, n_send, to_finish, n_post),
+            stage(finisher, n_post, None, 0),
+        )
+    finally:
+        for ex in (prepare_ex, send_ex, post_ex):
+            ex.shutdown(wait=False, cancel_futures=True)
+        journal_ex.shutdown(wait=True)   # écritures déjà lancées : terminées avant journal.close()
+        # spools des envois interrompus (annulation)
+        for job in jobs:
+            if job.prepared is not None:
+                job.prepared.close()
+
+    return [job.success for job in jobs]
+
+
+def _journal_names(job: _Job, primary: Config) -> List[str]:
+    """
+    Noms possibles de ce job dans le journal. Un même profil peut tourner
+    seul (« Dupont ») ou avec d'autres (« ASH/Dupont ») : on accepte les
+    deux noms, le nom seul uniquement pour le profil principal.
+    """
+    if not job.profile and primary.profile:
+        return [job.key, f"{primary.profile}/{job.protege_name}"]
+    if job.profile and job.profile == primary.profile:
+        return [job.key, job.protege_name]
+    return [job.key]
+
+
+def _journal_entry(journal: RunJournal, job: _Job, primary: Config) -> Optional[dict]:
+    for name in _journal_names(job, primary):
+        entry = journal.get(name, job.fingerprint)
+        if entry is not None:
+            return entry
+    return None
+
+
+# ---------- Connexions et session de surveillance ----------
+@dataclass
+class _Connections:
+    """Pools SMTP/IMAP d'un run, ou de toute une surveillance (SendSession)."""
+    smtp_pool: "SMTPPool | AsyncSMTPPool"
+    imap_session: Optional[IMAPSession] = None
+    imap_appender: Optional[AsyncIMAPSession] = None
+
+    @classmethod
+    def open(cls, config: Config) -> "_Connections":
+        # Une session SMTP authentifiée par worker (plafond du mode adaptatif), réutilisée pour tout le run
+        size = config.smtp.max_concurrency if config.smtp.adaptive else max(1, config.smtp.concurrency)
+        use_asyncio = config.pipeline.engine == "asyncio"
+        smtp_pool = AsyncSMTPPool(config, size=size) if use_asyncio else SMTPPool(config, size=size)
+        # Idem côté IMAP : une session persistante pour les copies / recherches de dossiers
+        imap_session = IMAPSession.from_config(config) if config.imap.copy_sent else None
+        # Moteur asyncio : les APPEND passent par des connexions asyncio dédiées
+        imap_appender = AsyncIMAPSession.from_config(config) if (use_asyncio and imap_session) else None
+        return cls(smtp_pool, imap_session, imap_appender)
+
+    async def close(self, run_dir: str) -> None:
+        if isinstance(self.smtp_pool, AsyncSMTPPool):
+            await self.smtp_pool.close()
+        else:
+            self.smtp_pool.close()
+        log_message(run_dir, self.smtp_pool.summary())
+        if self.imap_appender is not None:
+            await self.imap_appender.close()
+            log_message(run_dir, self.imap_appender.summary())
+        if self.imap_session is not None:
+            self.imap_session.close()
+            log_message(run_dir, self.imap_session.summary())
+
+
+class SendSession:
+    """
+    Ce qui survit d'un run à l'autre quand les runs s'enchaînent (cli.py
+    watch) : un seul dossier de run, les connexions SMTP/IMAP, les quotas
+    et le manifeste de chaque profil, que chaque run ne reparcourt que pour
+    les dossiers demandés (`only`). Les connexions sont ouvertes au premier
+    vrai envoi ; la session s'ouvre et se ferme dans la boucle asyncio des runs.
+    Chaque run est un lot numéroté : ses rapports (perf, profil, réception)
+    ont leur propre fichier dans le dossier commun.
+    """
+
+    def __init__(self, profiles: List[Config]):
+        self.profiles = profiles
+        self.run_dir = init_log_session(profiles[0].paths.log_dir)
+        self.manifests: dict[str, Manifest] = {}   # profil ("" si un seul) → manifeste tenu à jour
+        self.quota = SendQuota.from_config(profiles[0])
+        self.batch = 0                             # lot en cours (1 au premier run)
+        self._connections: Optional[_Connections] = None
+
+    def batch_file(self, name: str) -> str:
+        """Nom du fichier `name` pour le lot en cours : perf.json → perf-003.json."""
+        stem, ext = os.path.splitext(name)
+        return f"{stem}-{self.batch:03d}{ext}"
+
+    def connections(self) -> _Connections:
+        if self._connections is None:
+            self._connections = _Connections.open(self.profiles[0])
+        return self._connections
+
+    async def close(self) -> None:
+        if self.quota.enabled:
+            log_message(self.run_dir, self.quota.summary())
+        if self._connections is not None:
+            await self._connections.close(self.run_dir)
+            self._connections = None
+        close_logger(self.run_dir)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
 
 
 # ---------- Orchestrateur ----------
-async def effectuer_rapport_async_limited(config: Config | None = None, status_callback=print) -> None:
+async def effectuer_rapport_async_limited(
+    config: Config | None = None,
+    status_callback=print,
+    resume: bool = False,
+    progress: Optional[RunProgress] = None,
+    dry_run: bool = False,
+    only: Optional[List[str]] = None,
+    profiles: Optional[List[Config]] = None,
+    session: Optional[SendSession] = None,
+) -> dict:
+    """
+    Envoie les rapports de tous les protégés.
+    resume=True : les envois déjà acceptés ce trimestre (même pièces jointes,
+    d'après le journal) sont sautés ; seuls les échecs et envois interrompus
+    sont retentés. Les envois à la réception incertaine (connexion coupée
+    après la fin du DATA) ne le sont jamais : ils sont signalés (unknown)
+    pour vérification.
+    progress : état de chaque protégé et octets envoyés pour une interface,
+    et annulation propre (progress.cancel(), depuis n'importe quel thread).
+    dry_run=True : messages préparés (templates, zip, découpage) et listés,
+    sans connexion SMTP/IMAP, ni journal, ni archivage.
+    only : noms des dossiers de protégés à traiter (les autres sont ignorés).
+    profiles : plusieurs profils (APA, ASH...) dans le même run, chacun avec
+    ses templates, son dossier Protégés et son dossier IMAP ; ils partagent
+    les connexions SMTP/IMAP, le parallélisme et les quotas du premier, et
+    les protégés y sont nommés « PROFIL/nom ».
+    session : runs enchaînés (surveillance), qui gardent dossier de run,
+    connexions, quotas et manifestes ; profils pris dans la session.
+    Retourne les protégés par issue : sent, failed, unknown, cancelled, skipped, planned.
+    """
+    if session is not None:
+        profiles = session.profiles
+    if profiles:
+        config = profiles[0]
     if config is None:
         config = Config.load(".env")
 
         # On force test mode (mais uniquement pour cette exécution !)
         config.paths.test_mode = True 
+    profiles = profiles or [config]
+    for other in profiles[1:]:
+        if (other.identity.email, other.smtp.host) != (config.identity.email, config.smtp.host):
+            raise ValueError(f"Profil {other.profile}: compte d'envoi différent de {config.profile}, lancer un run séparé")
+    # deux profils sur le même dossier : chaque protégé recevrait deux e-mails
+    # et les deux profils archiveraient les mêmes fichiers
+    roots: dict[str, str] = {}
+    for cfg in profiles:
+        root = os.path.normcase(os.path.realpath(cfg.paths.proteges_dir))
+        if root in roots:
+            raise ValueError(
+                f"Profils {roots[root]} et {cfg.profile}: même dossier Protégés ({cfg.paths.proteges_dir}), "
+                f"définir {cfg.profile}_PROTEGES_DIR"
+            )
+        roots[root] = cfg.profile
+
+    run_dir = session.run_dir if session is not None else init_log_session(config.paths.log_dir)
+    if session is not None:
+        session.batch += 1
+    recorder = perf.start()
+    # TEST_MODE : profil cProfile du thread de la boucle (orchestration, moteur asyncio)
+    profiler = cProfile.Profile() if config.paths.test_mode else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return await _run_report(profiles, run_dir, status_callback, resume, progress, dry_run, only, session)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _write_profile(profiler, run_dir, session)
+        perf.stop()
+        _log_perf(recorder, run_dir, session)
+        # log.txt / events.jsonl complets, même après une erreur ou une annulation
+        close_logger(run_dir)
 
-    run_dir = init_log_session(config.paths.log_dir)
-    tri, yr, suffix = current_trimester()
 
-    # TEST_MODE : 0 = prod (on déplace les fichiers), 1 = test (on laisse les fichiers en place)
-    move_after_ok = (config.paths.test_mode == 0)
+def _report_file(name: str, session: Optional[SendSession]) -> str:
+    """Fichier de rapport du run ; en surveillance, un par lot (perf-003.json)."""
+    return session.batch_file(name) if session is not None else name
 
-    status_callback("Préparation des envois…")
-    proteges = _list_proteges(config.paths.proteges_dir)
-    if not proteges:
-        status_callback("Aucun dossier dans 'Protégés'.")
+
+def _write_profile(profiler: cProfile.Profile, run_dir: str, session: Optional[SendSession] = None) -> None:
+    path = os.path.join(run_dir, _report_file("profile.prof", session))
+    profiler.dump_stats(path)
+    with open(os.path.join(run_dir, _report_file("profile.txt", session)), "w", encoding="utf-8") as f:
+        pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(40)
+
+
+def _log_perf(recorder: perf.PerfRecorder, run_dir: str, session: Optional[SendSession] = None) -> None:
+    """perf.json (perf-NNN.json par lot) dans le dossier du run + une ligne de synthèse dans log.txt."""
+    filename = _report_file("perf.json", session)
+    try:
+        recorder.write(run_dir, filename)
+    except OSError as e:
+        log_message(run_dir, f"{filename} non écrit: {e}")
         return
+    report = recorder.report()
+    slowest = sorted(report["stages"].items(), key=lambda kv: kv[1]["total_s"], reverse=True)[:3]
+    detail = ", ".join(f"{name} {st['total_s']:.2f}s (p95 {st['p95_s']:.2f}s)" for name, st in slowest)
+    log_message(
+        run_dir,
+        f"Perf: {report['wall_s']:.1f}s, {report['bytes_uploaded'] / (1024 * 1024):.1f}MB envoyés "
+        f"({report['effective_mb_per_s'] or 0:.2f}MB/s) ; {detail}"
+    )
+
+
+def _log_quota_forecast(quota: SendQuota, jobs: List[_Job], config: Config, run_dir: str, status_callback) -> None:
+    """Heure de fin au plus tôt permise par les quotas (taille SMTP estimée depuis les pièces jointes)."""
+    nbytes = int(sum(sum(job.ctx["sizes"].values()) for job in jobs) * config.smtp.b64_overhead)
+    seconds = quota.predict(len(jobs), nbytes)
+    if seconds <= 0:
+        msg = f"Quota SMTP ({quota.describe()}): {len(jobs)} envois dans les quotas, pas d'attente prévue"
+    else:
+        end = datetime.fromtimestamp(time.time() + seconds)
+        wait = f"{seconds:.0f}s" if seconds < 90 else f"{seconds / 60:.0f} min"
+        msg = (
+            f"Quota SMTP ({quota.describe()}): {len(jobs)} envois, "
+            f"fin estimée vers {end:%H:%M:%S} (au moins {wait})"
+        )
+    log_message(run_dir, msg)
+    status_callback(msg)
+
+
+async def _dry_run(jobs: List[_Job], config: Config, run_dir: str) -> List[bool]:
+    """Préparation seule : ce qui partirait (messages, tailles), sans connexion ni archivage."""
+    executor = ThreadPoolExecutor(max_workers=max(1, config.pipeline.prepare_workers), thread_name_prefix="prepare")
 
-    CONCURRENCY = max(1, config.smtp.concurrency)
-    sem = asyncio.Semaphore(CONCURRENCY)
-    tasks = []
-    for p in sorted(proteges):
-        protege_name = os.path.basename(p)
-        files = _list_files(p)
+    async def one(job: _Job) -> bool:
+        if not await _prepare_one(job, job.config or config, run_dir, executor):
+            return False
+        sizes = [sp.size for _, sp in job.prepared.messages]  # type: ignore[union-attr]
+        job.prepared.close()  # type: ignore[union-attr]
+        log_message(
+            run_dir,
+            f"[dry-run] {job.key}: {len(sizes)} message(s), {sum(sizes) / (1024 * 1024):.2f}MB "
+            f"→ {config.identity.emailrec}",
+        )
+        return True
+
+    try:
+        return list(await asyncio.gather(*(one(job) for job in jobs)))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _only_names(tag: str, only: List[str]) -> List[str]:
+    """Dossiers de ce profil parmi `only` (« Dupont », ou « ASH/Dupont » pour le profil ASH)."""
+    prefix = f"{tag}/"
+    return [k[len(prefix):] if tag and k.startswith(prefix) else k for k in only if "/" not in k or (tag and k.startswith(prefix))]
+
+
+async def _scan_profile(
+    config: Config, tag: str, run_dir: str, tri: int, yr: int, suffix: str, dry_run: bool,
+    only: Optional[List[str]] = None, session: Optional[SendSession] = None,
+) -> List[_Job]:
+    """
+    Parcours du dossier Protégés d'un profil : un job par protégé ayant des
+    pièces jointes. Avec une session, seuls les dossiers de `only` sont
+    reparcourus dans le manifeste gardé d'un run à l'autre.
+    """
+    label = f"{tag}: " if tag else ""
+    # un manifeste par dossier parcouru (manifest.json pour un run à un seul profil)
+    manifest_path = os.path.join(config.paths.log_dir, f"manifest_{tag}.json" if tag else "manifest.json")
+    wanted = _only_names(tag, only) if only is not None else None
+    manifest = session.manifests.get(tag) if session is not None else None
+    if manifest is not None and wanted is not None:
+        with perf.span("scan"):
+            await asyncio.to_thread(manifest.refresh, wanted)
+        previous = None
+    else:
+        previous = manifest or Manifest.load(manifest_path)
+        # tailles et dates seulement : le contenu n'est lu que pour les envois qui en ont besoin
+        with perf.span("scan"):
+            manifest = await asyncio.to_thread(Manifest.scan, config.paths.proteges_dir, False, previous)
+        if session is not None:
+            session.manifests[tag] = manifest
+    if not manifest.folders:
+        return []
+    if previous is not None:
+        changes = manifest.diff(previous)
+        log_message(
+            run_dir,
+            f"{label}Depuis le dernier run: {len(changes['added'])} nouveaux, {len(changes['changed'])} modifiés, "
+            f"{len(changes['removed'])} disparus, {len(changes['unchanged'])} inchangés"
+        )
+        for name in changes["added"] + changes["changed"]:
+            log_message(run_dir, f"  {'nouveau' if name in changes['added'] else 'modifié'}: {name}")
+    if not dry_run:
+        manifest.save(manifest_path)
+
+    jobs = []
+    for protege_name, folder in sorted(manifest.folders.items()):
+        if wanted is not None and protege_name not in wanted:
+            continue
+        files = folder.paths
         if not files:
-            log_message(run_dir, f"No attachment found for {protege_name}, skipped.")
+            log_message(run_dir, f"No attachment found for {label}{protege_name}, skipped.")
             continue
+        ctx = _make_ctx(protege_name, tri, yr, suffix, files, config)
+        ctx["sizes"] = folder.sizes
+        jobs.append(_Job(
+            protege_name, files, ctx, folder=folder,
+            profile=tag, config=config if tag else None,
+        ))
+    return jobs
+
+
+async def _run_report(
+    profiles: List[Config],
+    run_dir: str,
+    status_callback,
+    resume: bool,
+    progress: Optional[RunProgress] = None,
+    dry_run: bool = False,
+    only: Optional[List[str]] = None,
+    session: Optional[SendSession] = None,
+) -> dict:
+    config = profiles[0]   # connexions, parallélisme, quotas, journal : communs à tous les profils
+    tri, yr, suffix = current_trimester()
+    if progress is not None:
+        progress.bind()
+    outcome: dict[str, List[str]] = {
+        "sent": [], "failed": [], "unknown": [], "cancelled": [], "skipped": [], "planned": [],
+    }
 
-        tasks.append(
-            _send_one(
-                sem=sem,
-                protege_name=protege_name,
-                tri=tri,
-                yr=yr,
-                suffix=suffix,
-                files=files,
-                log_dir=run_dir,
-                move_after_ok=move_after_ok,
-                config=config,
-            )
-        )
+    # TEST_MODE : 0 = prod (on déplace les fichiers), 1 = test (on laisse les fichiers en place)
+    move_after_ok = (config.paths.test_mode == 0)
 
-    results = await asyncio.gather(*tasks)
-    success = sum(1 for r in results if r)
-    fail = len(results) - success
-    status_callback(f"Envoi terminé: {success} succès, {fail} échecs.")
-    log_message(run_dir, f"Résumé: {success} succès, {fail} échecs.")
+    status_callback("Préparation des envois…")
+    # Un seul parcours par dossier Protégés, partagé par toutes les étapes (tailles, empreintes)
+    multi = len(profiles) > 1
+    scanned = await asyncio.gather(*(
+        _scan_profile(cfg, cfg.profile if multi else "", run_dir, tri, yr, suffix, dry_run, only, session)
+        for cfg in profiles
+    ))
+    if not any(scanned):
+        status_callback("Aucun des dossiers demandés dans 'Protégés'." if only is not None else "Aucun dossier dans 'Protégés'.")
+        return outcome
+    # profils entrelacés : chacun avance dès le début du run, aucun n'attend la fin de l'autre
+    jobs = [job for batch in itertools.zip_longest(*scanned) for job in batch if job is not None]
+
+    # Journal du trimestre : empreinte des pièces jointes → état de l'envoi.
+    # Simulation : rien n'est créé, le journal existant n'est que lu (reprise).
+    journal_path = RunJournal.quarter_path(config.paths.log_dir, tri, yr)
+    if not dry_run:
+        journal = await asyncio.to_thread(RunJournal, journal_path)
+    elif resume and os.path.exists(journal_path):
+        journal = RunJournal(journal_path, read_only=True)
+    else:
+        journal = None
+
+    if resume and journal is not None:
+        todo = []
+        for job in jobs:
+            if not any(journal.has_status(name, ACCEPTED, UNKNOWN) for name in _journal_names(job, config)):
+                todo.append(job)   # rien d'envoyé ce trimestre : empreinte calculée à la préparation
+                continue
+            job.fingerprint = await asyncio.to_thread(_fingerprint, job)
+            entry = _journal_entry(journal, job, config)
+            if entry is not None and entry["status"] == UNKNOWN:
+                # peut-être déjà reçu : jamais renvoyé automatiquement
+                outcome["unknown"].append(job.key)
+                log_message(
+                    run_dir, f"{job.key}: réception incertaine lors d'un run précédent ({entry['message_id']}), "
+                    f"non renvoyé : vérifier chez le destinataire, puis relancer sans --resume si besoin",
+                )
+                continue
+            if entry is None or entry["status"] != ACCEPTED:
+                todo.append(job)
+                continue
+            outcome["skipped"].append(job.key)
+            log_message(run_dir, f"{job.key}: déjà envoyé ({entry['message_id']}), ignoré")
+            if move_after_ok and not entry["archived"] and not dry_run:
+                # envoi accepté mais archivage raté lors du run précédent
+                await asyncio.to_thread(_archive_and_clear_files, run_dir, job.key, job.files)
+                archived = not any(os.path.exists(p) for p in job.files)
+                await asyncio.to_thread(journal.record, job.key, job.fingerprint, archived=archived)
+        jobs = todo
+    skipped = len(outcome["skipped"])
+
+    # Quotas du fournisseur : les envois partent au rythme permis, fin estimée d'avance
+    quota = session.quota if session is not None else SendQuota.from_config(config)
+    if quota.enabled:
+        _log_quota_forecast(quota, jobs, config, run_dir, status_callback)
+    else:
+        quota = None
+
+    if dry_run:
+        if journal is not None:
+            journal.close()
+        results = await _dry_run(jobs, config, run_dir)
+        outcome["planned"] = [job.key for job, ok in zip(jobs, results) if ok]
+        outcome["failed"] = [job.key for job, ok in zip(jobs, results) if not ok]
+        resumed = f", {skipped} déjà envoyés" if skipped else ""
+        if outcome["unknown"]:
+            resumed += f", {len(outcome['unknown'])} à vérifier (réception incertaine)"
+        msg = f"Simulation: {len(outcome['planned'])} envois prévus, {len(outcome['failed'])} échecs de préparation{resumed}."
+        status_callback(msg)
+        log_message(run_dir, msg)
+        return outcome
+
+    # Parallélisme SMTP : fixe, ou adaptatif (départ au plafond appris lors du run précédent)
+    limiter = AdaptiveLimiter.from_config(config) if config.smtp.adaptive else None
+    # connexions du run, ou celles de la session (gardées d'un lot à l'autre)
+    connections = session.connections() if session is not None else _Connections.open(config)
+
+    # Suivi de réception groupé (une seule surveillance IMAP pour tout le run)
+    tracker = None
+    if config.imap.confirm and jobs:
+        try:
+            tracker = DeliveryTracker.from_config(config)
+            await asyncio.to_thread(tracker.start)
+        except Exception as e:
+            log_message(run_dir, f"Suivi de réception désactivé: {e}")
+            tracker = None
 
+    try:
+        results = await _run_pipeline(
+            jobs,
+            config,
+            run_dir,
+            move_after_ok,
+            smtp_pool=connections.smtp_pool,
+            imap_session=connections.imap_session,
+            tracker=tracker,
+            imap_appender=connections.imap_appender,
+            journal=journal,
+            limiter=limiter,
+            quota=quota,
+            progress=progress,
+        )
+    finally:
+        journal.close()
+        if quota is not None and session is None:
+            log_message(run_dir, quota.summary())
+        if limiter is not None:
+            limiter.remember()
+            log_message(run_dir, limiter.summary())
+        if session is None:
+            await connections.close(run_dir)
+    for job, ok in zip(jobs, results):
+        outcome["sent" if ok else "cancelled" if job.cancelled else "unknown" if job.unknown else "failed"].append(job.key)
+    success, fail, cancelled = len(outcome["sent"]), len(outcome["failed"]), len(outcome["cancelled"])
+    resumed = f", {skipped} déjà envoyés" if skipped else ""
+    if cancelled:
+        resumed += f", {cancelled} annulés (à reprendre)"
+    if outcome["unknown"]:
+        resumed += f", {len(outcome['unknown'])} à vérifier (réception incertaine: {', '.join(outcome['unknown'])})"
+    status_callback(f"Envoi {'annulé' if cancelled else 'terminé'}: {success} succès, {fail} échecs{resumed}.")
+    log_message(run_dir, f"Résumé: {success} succès, {fail} échecs{resumed}.")
+
+    if tracker is not None and success and not (progress is not None and progress.cancelled):
+        status_callback("Vérification de la réception des envois…")
+        try:
+            report = await asyncio.to_thread(tracker.watch, config.imap.confirm_timeout)
+            tracker.write_report(run_dir, report, _report_file("confirmations.json", session))
+            confirmed = sum(1 for r in report.values() if r["confirmed"])
+            log_message(run_dir, f"Réception confirmée: {confirmed}/{len(report)}")
+            status_callback(f"Réception confirmée: {confirmed}/{len(report)}")
+        except Exception as e:
+            log_message(run_dir, f"Suivi de réception interrompu: {e}")
+    return outcome
 
 if __name__ == "__main__":
+    # entrée historique ; pour les runs sans interface, voir cli.py
     ic.enable()
     config = Config.load(".env",mode="ASH")
-    asyncio.run(effectuer_rapport_async_limited(config=config))
+    asyncio.run(effectuer_rapport_async_limited(config=config, resume="--resume" in sys.argv))
 
@@ -0,0 +1,675 @@
+# async_transport.py
+
+import ssl
+import time
+import base64
+import socket
+import asyncio
+import imaplib
+import smtplib
+import functools
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from email.utils import parseaddr, getaddresses
+
+import perf
+from config import Config
+from smtp_pool import RECONNECT_CODES, DeliveryUnknown
+from mime_stream import SpooledMessage
+from folder_cache import is_stale_folder_error
+from imap_session import IMAPSession, _quote_mailbox, parse_appenduid
+from imap_handler import find_sent_folder, find_best_folder
+from icecream import ic
+ic.disable()
+
+CRLF = b"\r\n"
+IMAPS_PORT = 993
+
+# Moteur « asyncio » : les mêmes échanges que smtplib / imaplib, mais sur des
+# streams asyncio. Un envoi en cours n'occupe plus un thread : des centaines
+# de transactions peuvent tourner sur une seule boucle d'événements, chaque
+# lecture / écriture ayant son propre timeout (et étant annulable).
+# Les erreurs levées sont celles de smtplib / imaplib : le reste du code
+# (pool, reprise sur 421, dossiers périmés) les traite à l'identique.
+
+
+@functools.lru_cache(maxsize=1)
+def _local_hostname() -> str:
+    # même valeur que smtplib pour EHLO (résolution DNS une seule fois)
+    fqdn = socket.getfqdn()
+    return fqdn if "." in fqdn else "[127.0.0.1]"
+
+
+# --------------------------------------------------------------------
+# SMTP
+# --------------------------------------------------------------------
+
+class AsyncSMTP:
+    """Session SMTP sur asyncio streams : EHLO, STARTTLS, AUTH, DSN, DATA en flux."""
+
+    def __init__(self, host: str, port: int, use_ssl: bool, timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.esmtp_features: dict[str, str] = {}
+
+    async def _io(self, aw):
+        return await asyncio.wait_for(aw, self.timeout)
+
+    # ------------------------------------------------------------
+    # Protocole
+    # ------------------------------------------------------------
+
+    async def connect(self) -> "AsyncSMTP":
+        tls = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await self._io(
+            asyncio.open_connection(self.host, self.port, ssl=tls)
+        )
+        code, resp = await self.getreply()
+        if code != 220:
+            self.abort()
+            raise smtplib.SMTPConnectError(code, resp)
+        await self.ehlo()
+        if not self.use_ssl and self.has_extn("starttls"):
+            code, _ = await self.docmd("STARTTLS")
+            if code == 220:
+                await self._starttls(ssl.create_default_context())
+                await self.ehlo()
+        return self
+
+    async def _starttls(self, context: ssl.SSLContext) -> None:
+        if hasattr(self.writer, "start_tls"):   # Python ≥ 3.11
+            await self._io(self.writer.start_tls(context, server_hostname=self.host))  # type: ignore[union-attr]
+            return
+        # Python 3.10 : loop.start_tls, puis reader / writer rebranchés sur le transport TLS
+        loop = asyncio.get_running_loop()
+        transport = self.writer.transport  # type: ignore[union-attr]
+        protocol = transport.get_protocol()
+        tls = await self._io(loop.start_tls(transport, protocol, context, server_hostname=self.host))
+        self.reader._transport = tls        # type: ignore[union-attr]
+        protocol._transport = tls           # type: ignore[attr-defined]
+        protocol._over_ssl = True           # type: ignore[attr-defined]
+        self.writer = asyncio.StreamWriter(tls, protocol, self.reader, loop)
+
+    async def getreply(self) -> tuple[int, bytes]:
+        lines = []
+        while True:
+            line = await self._io(self.reader.readline())  # type: ignore[union-attr]
+            if not line:
+                self.abort()
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[4:].strip(b" \t\r\n"))
+            if line[3:4] != b"-":
+                break
+        try:
+            code = int(line[:3])
+        except ValueError:
+            code = -1
+        return code, b"\n".join(lines)
+
+    async def docmd(self, cmd: str, args: str = "") -> tuple[int, bytes]:
+        if self.writer is None:
+            raise smtplib.SMTPServerDisconnected("please run connect() first")
+        self.writer.write((f"{cmd} {args}".strip() + "\r\n").encode("ascii"))
+        await self._io(self.writer.drain())
+        return await self.getreply()
+
+    async def ehlo(self) -> None:
+        code, resp = await self.docmd("EHLO", _local_hostname())
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, resp)
+        self.esmtp_features = {}
+        for line in resp.decode("latin-1").split("\n")[1:]:
+            name, _, params = line.partition(" ")
+            self.esmtp_features[name.lower()] = params.strip()
+
+    def has_extn(self, name: str) -> bool:
+        return name.lower() in self.esmtp_features
+
+    async def login(self, user: str, password: str) -> None:
+        methods = self.esmtp_features.get("auth", "").upper().split()
+        if "PLAIN" in methods:
+            token = base64.b64encode(f"\0{user}\0{password}".encode("utf-8")).decode("ascii")
+            code, resp = await self.docmd("AUTH", f"PLAIN {token}")
+        elif "LOGIN" in methods:
+            code, resp = await self.docmd("AUTH", "LOGIN")
+            for secret in (user, password):
+                if code != 334:
+                    break
+                code, resp = await self.docmd(base64.b64encode(secret.encode("utf-8")).decode("ascii"))
+        else:
+            raise smtplib.SMTPNotSupportedError("No suitable authentication method found.")
+        if code not in (235, 503):
+            raise smtplib.SMTPAuthenticationError(code, resp)
+
+    async def rset(self) -> tuple[int, bytes]:
+        return await self.docmd("RSET")
+
+    async def noop(self) -> tuple[int, bytes]:
+        return await self.docmd("NOOP")
+
+    async def quit(self) -> None:
+        try:
+            await self.docmd("QUIT")
+        finally:
+            self.abort()
+
+    def abort(self) -> None:
+        """Ferme la socket sans attendre (utilisable pendant une annulation)."""
+        writer, self.writer, self.reader = self.writer, None, None
+        if writer is not None:
+            writer.close()
+
+    async def _reset_quietly(self, code: int) -> None:
+        if code == 421:
+            self.abort()
+            return
+        try:
+            await self.rset()
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    # ------------------------------------------------------------
+    # Transaction
+    # ------------------------------------------------------------
+
+    async def send_spooled(self, msg: EmailMessage, spooled: SpooledMessage, rcpt_options=()) -> None:
+        """Équivalent de send_email._send_spooled : MAIL / RCPT / DATA depuis le spool."""
+        from_addr = parseaddr(msg["Sender"] or msg["From"])[1]
+        to_addrs = [a for _, a in getaddresses(
+            msg.get_all("To", []) + msg.get_all("Cc", []) + msg.get_all("Bcc", [])
+        ) if a]
+
+        mail_opts = f" SIZE={spooled.size}" if self.has_extn("size") else ""
+        code, resp = await self.docmd("MAIL", f"FROM:<{from_addr}>{mail_opts}")
+        if code != 250:
+            await self._reset_quietly(code)
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+        refused = {}
+        opts = "".join(" " + o for o in rcpt_options)
+        for addr in to_addrs:
+            code, resp = await self.docmd("RCPT", f"TO:<{addr}>{opts}")
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+            if code == 421:
+                self.abort()
+                raise smtplib.SMTPRecipientsRefused(refused)
+        if len(refused) == len(to_addrs):
+            await self._reset_quietly(0)
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = await self.docmd("DATA")
+        if code != 354:
+            await self._reset_quietly(code)
+            raise smtplib.SMTPDataError(code, resp)
+        chunks = spooled.smtp_chunks()
+        chunk = next(chunks)
+        for following in chunks:
+            self.writer.write(chunk)  # type: ignore[union-attr]
+            await self._io(self.writer.drain())  # type: ignore[union-attr]
+            chunk = following
+        # dernier morceau = fin du DATA : au-delà, une coupure laisse l'envoi incertain
+        try:
+            self.writer.write(chunk)  # type: ignore[union-attr]
+            await self._io(self.writer.drain())  # type: ignore[union-attr]
+            code, resp = await self.getreply()
+        except (OSError, asyncio.TimeoutError) as e:
+            self.abort()
+            raise DeliveryUnknown(f"pas de réponse après la fin du DATA ({e}), réception incertaine: vérifier avant de renvoyer") from e
+        if code != 250:
+            await self._reset_quietly(code)
+            raise smtplib.SMTPDataError(code, resp)
+
+
+async def smtp_connect_async(config: Config, timeout: float = 60) -> AsyncSMTP:
+    s = AsyncSMTP(config.smtp.host, config.smtp.port, config.smtp.use_ssl, timeout=timeout)
+    with perf.span("connect"):
+        await s.connect()
+    try:
+        with perf.span("auth"):
+            await s.login(config.identity.email, config.identity.email_pwd)
+    except BaseException:
+        s.abort()
+        raise
+    return s
+
+
+class AsyncSMTPPool:
+    """
+    Pendant asyncio de SMTPPool : mêmes règles (RSET entre deux envois, NOOP
+    après `idle_check` secondes d'inactivité, sessions jetées sur 421), mais
+    les emprunts se font sans thread, sur la boucle d'événements.
+    """
+
+    def __init__(self, config: Config, size: int | None = None, idle_check: float = 30.0, timeout: float = 60):
+        self.config = config
+        self.size = max(1, size or config.smtp.concurrency)
+        self.idle_check = idle_check
+        self.timeout = timeout
+
+        self._idle: list[tuple[AsyncSMTP, float]] = []
+        self._slots = asyncio.Semaphore(self.size)
+        self._closed = False
+
+        self.stats = {
+            "connections": 0,
+            "reused": 0,
+            "transactions": 0,
+            "reconnects": 0,
+            "noop_failures": 0,
+        }
+
+    async def _checkout(self) -> AsyncSMTP:
+        while self._idle:
+            s, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.idle_check:
+                self.stats["reused"] += 1
+                return s
+            try:
+                ok = (await s.noop())[0] == 250
+            except Exception:
+                ok = False
+            if ok:
+                self.stats["reused"] += 1
+                return s
+            self.stats["noop_failures"] += 1
+            self.stats["reconnects"] += 1
+            s.abort()
+        s = await smtp_connect_async(self.config, self.timeout)
+        self.stats["connections"] += 1
+        return s
+
+    async def _checkin(self, s: AsyncSMTP) -> None:
+        try:
+            ok = (await s.rset())[0] == 250
+        except Exception:
+            ok = False
+        if ok and not self._closed:
+            self._idle.append((s, time.monotonic()))
+        else:
+            s.abort()
+
+    def discard(self, s: AsyncSMTP) -> None:
+        self.stats["reconnects"] += 1
+        s.abort()
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._slots:
+            s = await self._checkout()
+            self.stats["transactions"] += 1
+            try:
+                yield s
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code in RECONNECT_CODES:
+                    self.discard(s)
+                else:
+                    await self._checkin(s)
+                raise
+            except smtplib.SMTPRecipientsRefused as e:
+                if {c for c, _ in e.recipients.values()} & set(RECONNECT_CODES):
+                    self.discard(s)
+                else:
+                    await self._checkin(s)
+                raise
+            except BaseException:
+                # déconnexion, timeout, annulation : état inconnu, on ne réutilise pas
+                self.discard(s)
+                raise
+            else:
+                await self._checkin(s)
+
+    async def close(self) -> None:
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for s, _ in idle:
+            try:
+                await s.quit()
+            except Exception:
+                s.abort()
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"SMTP pool (asyncio): {st['transactions']} transactions, {st['connections']} connexions, "
+            f"{st['reused']} réutilisations, {st['reconnects']} reconnexions"
+        )
+
+
+async def _send_on_async(s: AsyncSMTP, msg: EmailMessage, config: Config, res: dict, spooled: SpooledMessage) -> None:
+    """Même négociation DSN que send_email._send_on."""
+    rcpt_opts = [config.smtp.dsn_options] if (config.smtp.request_dsn and s.has_extn("dsn")) else []
+    res["used_dsn"] = bool(rcpt_opts)
+    try:
+        with perf.span("send", spooled.size):
+            await s.send_spooled(msg, spooled, rcpt_opts)
+        res["accepted"] = True
+    except smtplib.SMTPRecipientsRefused as e:
+        # Si le serveur a interprété NOTIFY comme partie de l'adresse, retente sans DSN
+        err = next(iter(e.recipients.values()))
+        if rcpt_opts and b"NOTIFY=" in err[1]:
+            with perf.span("send", spooled.size):
+                await s.send_spooled(msg, spooled)
+            res["accepted"] = True
+            res["used_dsn"] = False
+        else:
+            raise
+
+
+async def smtp_send_verified_async(
+    msg: EmailMessage,
+    config: Config,
+    pool: AsyncSMTPPool,
+    spooled: SpooledMessage,
+) -> dict:
+    """
+    Version asyncio de smtp_send_verified (avec pool) : DSN si annoncé et
+    demandé, un nouvel essai sur une session neuve après 421 / déconnexion.
+    """
+    # import local : send_email importe ce module
+    from send_email import _is_reconnect_error
+
+    res = {
+        "accepted": False,
+        "used_dsn": False,
+        "message_id": msg["Message-ID"],
+        "copied_sent": False,
+    }
+    for attempt in range(2):
+        try:
+            async with pool.connection() as s:
+                await _send_on_async(s, msg, config, res, spooled)
+            break
+        except Exception as e:
+            if attempt == 0 and _is_reconnect_error(e):
+                ic(f"[SMTP] session perdue ({e}), nouvelle tentative")
+                continue
+            raise
+    return res
+
+
+# --------------------------------------------------------------------
+# IMAP (APPEND)
+# --------------------------------------------------------------------
+
+class AsyncIMAP:
+    """Connexion IMAP minimale sur asyncio streams : LOGIN, APPEND en flux, LOGOUT."""
+
+    def __init__(self, host: str, username: str, password: str,
+                 port: int = IMAPS_PORT, use_ssl: bool = True, timeout: float = 60):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self._tagnum = 0
+
+    async def _io(self, aw):
+        return await asyncio.wait_for(aw, self.timeout)
+
+    async def _readline(self) -> bytes:
+        line = await self._io(self.reader.readline())  # type: ignore[union-attr]
+        if not line:
+            self.abort()
+            raise imaplib.IMAP4.abort("connexion IMAP fermée")
+        return line
+
+    async def _send(self, data: bytes) -> None:
+        self.writer.write(data)  # type: ignore[union-attr]
+        await self._io(self.writer.drain())  # type: ignore[union-attr]
+
+    def _new_tag(self) -> bytes:
+        self._tagnum += 1
+        return b"A%04d" % self._tagnum
+
+    async def _tagged(self, tag: bytes) -> tuple[str, list[bytes]]:
+        while True:
+            line = await self._readline()
+            if line.startswith(tag + b" "):
+                typ, _, rest = line[len(tag) + 1:].partition(b" ")
+                return typ.decode(), [rest.rstrip()]
+
+    async def connect(self) -> "AsyncIMAP":
+        tls = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await self._io(
+            asyncio.open_connection(self.host, self.port, ssl=tls)
+        )
+        greeting = await self._readline()
+        if not greeting.startswith(b"* OK"):
+            self.abort()
+            raise imaplib.IMAP4.error(f"accueil IMAP inattendu: {greeting!r}")
+        tag = self._new_tag()
+        await self._send(
+            tag + b" LOGIN " + _quote_mailbox(self.username) + b" " + _quote_mailbox(self.password) + CRLF
+        )
+        typ, data = await self._tagged(tag)
+        if typ != "OK":
+            self.abort()
+            raise imaplib.IMAP4.error(f"LOGIN refusé: {data}")
+        return self
+
+    async def append(self, mailbox: str, date_time: str, spooled: SpooledMessage) -> tuple[str, list[bytes]]:
+        """Même échange que imap_session._append_stream."""
+        tag = self._new_tag()
+        await self._send(
+            tag + b" APPEND " + _quote_mailbox(mailbox) + b" " + date_time.encode("ascii")
+            + b" {%d}\r\n" % spooled.size
+        )
+        while True:
+            line = await self._readline()
+            if line.startswith(b"+"):
+                break
+            if line.startswith(tag + b" "):
+                # refus immédiat (dossier inexistant...)
+                typ, _, rest = line[len(tag) + 1:].partition(b" ")
+                return typ.decode(), [rest.rstrip()]
+
+        for chunk in spooled.chunks():
+            await self._send(chunk)
+        await self._send(CRLF)
+        return await self._tagged(tag)
+
+    async def logout(self) -> None:
+        try:
+            tag = self._new_tag()
+            await self._send(tag + b" LOGOUT\r\n")
+            await self._tagged(tag)
+        except Exception:
+            pass
+        finally:
+            self.abort()
+
+    def abort(self) -> None:
+        writer, self.writer, self.reader = self.writer, None, None
+        if writer is not None:
+            writer.close()
+
+
+class AsyncIMAPSession:
+    """
+    `size` connexions IMAP asyncio pour les APPEND d'un run. La résolution des
+    dossiers reste celle d'IMAPSession (LIST + FolderCache) : après le premier
+    message ce ne sont plus que des lectures de cache.
+    """
+
+    RECOVERABLE = (imaplib.IMAP4.abort, asyncio.TimeoutError, OSError)
+
+    def __init__(self, server: str, username: str, password: str, size: int = 1,
+                 timeout: float = 60, port: int = IMAPS_PORT, use_ssl: bool = True):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.port = port
+        self.use_ssl = use_ssl
+
+        self._conns: asyncio.Queue[AsyncIMAP | None] = asyncio.Queue()
+        for _ in range(max(1, size)):
+            self._conns.put_nowait(None)
+        self._open: set[AsyncIMAP] = set()
+
+        self.stats = {"logins": 0, "commands": 0, "reconnects": 0}
+
+    @classmethod
+    def from_config(cls, config: Config) -> "AsyncIMAPSession":
+        return cls(config.imap.host, config.identity.email, config.identity.email_pwd, size=config.imap.sessions)
+
+    async def _connect(self) -> AsyncIMAP:
+        imap = AsyncIMAP(self.server, self.username, self.password,
+                         port=self.port, use_ssl=self.use_ssl, timeout=self.timeout)
+        await imap.connect()
+        self._open.add(imap)
+        self.stats["logins"] += 1
+        return imap
+
+    def _drop(self, imap: AsyncIMAP | None) -> None:
+        if imap is not None:
+            self._open.discard(imap)
+            imap.abort()
+
+    async def append(self, mailbox: str, spooled: SpooledMessage, find=None) -> str | None:
+        """APPEND dans `mailbox`. None si OK, sinon un message d'erreur."""
+        return (await self.append_uid(mailbox, spooled, find))[0]
+
+    async def append_uid(self, mailbox: str, spooled: SpooledMessage, find=None) -> tuple[str | None, int | None]:
+        """
+        append, plus l'UID du message créé (APPENDUID) si le serveur le donne.
+        Connexion perdue pendant l'APPEND : rejoué seulement si `find()`
+        (coroutine : UID du message déjà dans le dossier, ou None) ne l'y
+        trouve pas ; sans `find`, l'erreur est rendue.
+        """
+        date_time = imaplib.Time2Internaldate(time.time())
+        imap = await self._conns.get()
+        try:
+            for attempt in range(2):
+                started = False
+                try:
+                    imap = imap or await self._connect()
+                    self.stats["commands"] += 1
+                    started = True
+                    typ, data = await imap.append(mailbox, date_time, spooled)
+                    break
+                except self.RECOVERABLE as e:
+                    self._drop(imap)
+                    imap = None
+                    if attempt or (started and find is None):
+                        return str(e), None
+                    self.stats["reconnects"] += 1
+                    if started:
+                        # le serveur a peut-être enregistré le message : on vérifie avant de renvoyer
+                        try:
+                            found = await find()
+                        except Exception as e2:
+                            return f"{e} (vérification impossible: {e2})", None
+                        if found is not None:
+                            return None, found
+                    ic(f"[IMAP] connexion perdue ({e}), reconnexion")
+                except BaseException:
+                    self._drop(imap)
+                    imap = None
+                    raise
+        finally:
+            self._conns.put_nowait(imap)
+        if typ != "OK":
+            return f"IMAP append failed: {typ} {data}", None
+        return None, parse_appenduid(data)
+
+    async def close(self) -> None:
+        for imap in list(self._open):
+            await imap.logout()
+        self._open.clear()
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"IMAP session (asyncio): {st['commands']} commandes, {st['logins']} logins, "
+            f"{st['reconnects']} reconnexions"
+        )
+
+
+async def copy_to_imap_async(
+    msg: EmailMessage,
+    result: dict,
+    config: Config,
+    session: IMAPSession,
+    appender: AsyncIMAPSession,
+    spooled: SpooledMessage,
+    dev=False,
+) -> None:
+    """
+    Version asyncio de copy_to_imap : dossiers résolus par `session` (cache),
+    APPEND envoyé par `appender`, UID COPY vers le second dossier par `session`.
+    """
+    user = config.identity.email
+    pwd = config.identity.email_pwd
+    server = config.imap.host
+
+    if not (server and user and pwd):
+        return
+
+    def resolve_sent():
+        folder, _, _ = find_sent_folder(server, user, pwd, config.imap.sentbox_name, session=session)
+        return folder
+
+    def resolve_apa():
+        folder, _ = find_best_folder(
+                        target_name=config.imap.mailbox_name,
+                        IMAP_SERVER=server,
+                        MAIL_USERNAME=user,
+                        MAIL_PASSWORD=pwd,
+                        session=session)
+        return folder
+
+    def find(folder):
+        """Recherche du message dans `folder` après une coupure pendant l'APPEND (session synchrone)."""
+        message_id = msg["Message-ID"]
+        if not message_id:
+            return None
+        return lambda: asyncio.to_thread(session.find_uid, folder, message_id)
+
+    placed = None   # (dossier, UID) du premier APPEND : les suivants sont des UID COPY
+    for label, resolve in (("Envoyés", resolve_sent), (config.imap.mailbox_name, resolve_apa)):
+        if not label:
+            continue
+        # résolution synchrone (cache, sinon LIST) : hors de la boucle d'événements
+        with perf.span("imap_resolve"):
+            folder = await asyncio.to_thread(resolve)
+        if not folder:
+            if not dev:
+                ic(f"[IMAP] Impossible de déterminer le dossier '{label}'.")
+            continue
+        if isinstance(folder, (tuple, list)):
+            folder = folder[0]
+        if placed is not None:
+            # copie côté serveur, sans renvoyer le message
+            with perf.span("imap_copy"):
+                err = await asyncio.to_thread(session.copy_uid, placed[0], placed[1], folder, msg["Message-ID"])
+            if err is None:
+                result["copied_sent"] = True
+                continue
+            ic(f"[IMAP] UID COPY impossible ({err}), nouvel APPEND")
+        with perf.span("append", spooled.size):
+            err, uid = await appender.append_uid(folder, spooled, find(folder))
+        if err and is_stale_folder_error(err):
+            # dossier renommé depuis la mise en cache : on vide le cache et on résout à nouveau
+            session.forget_folders()
+            with perf.span("imap_resolve"):
+                folder = await asyncio.to_thread(resolve)
+            if folder:
+                folder = folder[0] if isinstance(folder, (tuple, list)) else folder
+                with perf.span("append", spooled.size):
+                    err, uid = await appender.append_uid(folder, spooled, find(folder))
+        if err is None and uid is not None and placed is None:
+            placed = (folder, uid)
+        result["copied_sent"] = (err is None)
+        if not dev and err:
+            ic(f"[IMAP] Append échec: {err}")
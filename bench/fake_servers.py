@@ -0,0 +1,302 @@
+# bench/fake_servers.py
+
+"""
+Serveurs SMTP et IMAP de substitution pour les mesures hors ligne.
+
+Ils tournent dans un thread (boucle asyncio dédiée), en clair sur
+127.0.0.1, et n'implémentent que ce que le code d'envoi utilise :
+- SMTP : EHLO (DSN, PIPELINING, SIZE, AUTH), AUTH, MAIL/RCPT/DATA, RSET,
+  NOOP, QUIT ; latence par réponse, débit DATA plafonné, 421 au-delà de
+  N connexions simultanées ou de N messages par connexion
+- IMAP : CAPABILITY, LOGIN, LIST, SELECT/EXAMINE, STATUS, APPEND (APPENDUID),
+  UID SEARCH/FETCH/COPY, IDLE, NOOP, LOGOUT
+
+Seuls les en-têtes des messages sont gardés (la mémoire mesurée reste celle
+du client).
+"""
+
+import re
+import time
+import asyncio
+import threading
+
+CRLF = b"\r\n"
+_DATA_END = b"\r\n.\r\n"
+
+
+class _Server:
+    """Boucle asyncio dans un thread + start_server."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.port = 0
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._server = None
+
+    async def _reply(self, w: asyncio.StreamWriter, data: bytes) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        w.write(data)
+        await w.drain()
+
+    async def handle(self, r: asyncio.StreamReader, w: asyncio.StreamWriter) -> None:
+        raise NotImplementedError
+
+    def start(self) -> "_Server":
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+
+            async def main():
+                self._server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+                self.port = self._server.sockets[0].getsockname()[1]
+                ready.set()
+                await self._server.serve_forever()
+
+            try:
+                self.loop.run_until_complete(main())
+            except asyncio.CancelledError:
+                pass
+
+        threading.Thread(target=run, name=type(self).__name__, daemon=True).start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self.loop is not None and self._server is not None:
+            self.loop.call_soon_threadsafe(self._server.close)
+
+
+class FakeSMTP(_Server):
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: float | None = None,
+        max_connections: int | None = None,
+        max_per_connection: int | None = None,
+    ):
+        super().__init__(latency)
+        self.bandwidth = bandwidth                  # octets/s pour tout le serveur (DATA)
+        self.max_connections = max_connections
+        self.max_per_connection = max_per_connection
+
+        self.connections = 0
+        self.active = 0
+        self.peak_active = 0
+        self.messages = 0
+        self.bytes_received = 0
+        self.rejected_421 = 0
+        self.headers: list[bytes] = []
+        self._next_slot = 0.0                        # seau à jetons du débit
+
+    async def _throttle(self, n: int) -> None:
+        if not self.bandwidth:
+            return
+        now = time.monotonic()
+        self._next_slot = max(self._next_slot, now) + n / self.bandwidth
+        delay = self._next_slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _read_data(self, r: asyncio.StreamReader) -> bytes:
+        buf = bytearray()
+        while True:
+            chunk = await r.read(64 * 1024)
+            if not chunk:
+                raise ConnectionError("connexion fermée pendant DATA")
+            buf += chunk
+            await self._throttle(len(chunk))
+            if buf.endswith(_DATA_END) or buf == b".\r\n":
+                return bytes(buf)
+
+    async def handle(self, r, w):
+        self.connections += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        sent_here = 0
+        try:
+            if self.max_connections and self.active > self.max_connections:
+                self.rejected_421 += 1
+                await self._reply(w, b"421 too many connections\r\n")
+                return
+            await self._reply(w, b"220 fake ESMTP\r\n")
+            while True:
+                line = await r.readline()
+                if not line:
+                    return
+                cmd = line.decode("latin-1").strip().upper()
+                if cmd.startswith(("EHLO", "HELO")):
+                    await self._reply(
+                        w,
+                        b"250-fake\r\n250-DSN\r\n250-PIPELINING\r\n250-SIZE 52428800\r\n"
+                        b"250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n",
+                    )
+                elif cmd.startswith("AUTH"):
+                    await self._reply(w, b"235 2.7.0 authenticated\r\n")
+                elif cmd.startswith("MAIL"):
+                    if self.max_per_connection and sent_here >= self.max_per_connection:
+                        self.rejected_421 += 1
+                        await self._reply(w, b"421 4.7.0 too many messages, closing\r\n")
+                        return
+                    await self._reply(w, b"250 2.1.0 ok\r\n")
+                elif cmd.startswith("DATA"):
+                    await self._reply(w, b"354 go ahead\r\n")
+                    data = await self._read_data(r)
+                    self.messages += 1
+                    sent_here += 1
+                    self.bytes_received += len(data)
+                    self.headers.append(data.split(b"\r\n\r\n", 1)[0])
+                    await self._reply(w, b"250 2.0.0 queued\r\n")
+                elif cmd.startswith("STARTTLS"):
+                    await self._reply(w, b"502 5.5.1 not here\r\n")
+                elif cmd.startswith("QUIT"):
+                    await self._reply(w, b"221 bye\r\n")
+                    return
+                else:  # RCPT, RSET, NOOP...
+                    await self._reply(w, b"250 ok\r\n")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.active -= 1
+            w.close()
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "peak_connections": self.peak_active,
+            "messages": self.messages,
+            "bytes": self.bytes_received,
+            "rejected_421": self.rejected_421,
+        }
+
+
+class FakeIMAP(_Server):
+    def __init__(self, folders=("INBOX", "INBOX/APA", "INBOX/ASH", "Sent"), latency: float = 0.0):
+        super().__init__(latency)
+        # dossier -> [(uid, en-têtes)]
+        self.boxes: dict[str, list[tuple[int, bytes]]] = {f: [] for f in folders}
+        self.uidnext = {f: 1 for f in folders}
+        self.logins = 0
+        self.appends = 0
+        self.append_bytes = 0
+        self.copies = 0
+        self._waiters: list[asyncio.Event] = []
+
+    def _add(self, box: str, raw: bytes) -> int:
+        uid = self.uidnext[box]
+        self.uidnext[box] += 1
+        self.boxes[box].append((uid, raw.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n"))
+        for ev in self._waiters:
+            ev.set()
+        return uid
+
+    async def handle(self, r, w):
+        selected = None
+
+        def out(s):
+            w.write(s.encode("utf-8") if isinstance(s, str) else s)
+
+        try:
+            await self._reply(w, b"* OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] fake IMAP ready\r\n")
+            while True:
+                raw = await r.readline()
+                if not raw:
+                    return
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                m = re.match(r"(\S+) (\S+)\s*(.*)", line)
+                if not m:
+                    continue
+                tag, cmd, rest = m.group(1), m.group(2).upper(), m.group(3)
+
+                literal = None
+                lit = re.search(r"\{(\d+)\}$", rest)
+                if lit:
+                    await self._reply(w, b"+ go ahead\r\n")
+                    literal = await r.readexactly(int(lit.group(1)))
+                    await r.readline()
+                    rest = rest[:lit.start()].rstrip()
+
+                if cmd == "CAPABILITY":
+                    out("* CAPABILITY IMAP4rev1 IDLE UIDPLUS\r\n")
+                elif cmd == "LOGIN":
+                    self.logins += 1
+                elif cmd == "LIST":
+                    for f in self.boxes:
+                        out(f'* LIST (\\HasNoChildren) "/" "{f}"\r\n')
+                elif cmd in ("SELECT", "EXAMINE"):
+                    selected = rest.strip('"')
+                    if selected not in self.boxes:
+                        await self._reply(w, f"{tag} NO [NONEXISTENT] no such mailbox\r\n".encode())
+                        continue
+                    out(f"* {len(self.boxes[selected])} EXISTS\r\n* OK [UIDVALIDITY 1]\r\n"
+                        f"* OK [UIDNEXT {self.uidnext[selected]}]\r\n")
+                elif cmd == "STATUS":
+                    box = re.match(r'"?([^"]*)"? ', rest).group(1)  # type: ignore[union-attr]
+                    out(f'* STATUS "{box}" (UIDNEXT {self.uidnext[box]} MESSAGES {len(self.boxes[box])})\r\n')
+                elif cmd == "APPEND":
+                    box = re.match(r'"((?:[^"\\]|\\.)*)"|(\S+)', rest)  # type: ignore[assignment]
+                    name = (box.group(1) or box.group(2)).replace('\\"', '"')  # type: ignore[union-attr]
+                    if name not in self.boxes:
+                        await self._reply(w, f"{tag} NO [TRYCREATE] no such mailbox\r\n".encode())
+                        continue
+                    self.appends += 1
+                    self.append_bytes += len(literal or b"")
+                    uid = self._add(name, literal or b"")
+                    await self._reply(w, f"{tag} OK [APPENDUID 1 {uid}] done\r\n".encode())
+                    continue
+                elif cmd == "UID":
+                    sub, _, args = rest.partition(" ")
+                    sub = sub.upper()
+                    msgs = self.boxes.get(selected, [])  # type: ignore[arg-type]
+                    if sub == "SEARCH":
+                        rng = re.search(r"UID (\d+):\*", args)
+                        lo = int(rng.group(1)) if rng else 1
+                        hits = [u for u, hdr in msgs
+                                if u >= lo and (literal is None or literal.lower() in hdr.lower())]
+                        if rng and not hits and msgs:
+                            hits = [msgs[-1][0]]  # « n:* » contient toujours le dernier UID
+                        out("* SEARCH " + " ".join(map(str, hits)) + "\r\n")
+                    elif sub == "FETCH":
+                        a, _, b = args.split()[0].partition(":")
+                        lo, hi = int(a), (10 ** 9 if b == "*" else int(b or a))
+                        for i, (u, hdr) in enumerate(msgs):
+                            if lo <= u <= hi:
+                                out(f"* {i + 1} FETCH (UID {u} BODY[HEADER] {{{len(hdr)}}}\r\n".encode() + hdr + b")\r\n")
+                    elif sub == "COPY":
+                        u, dest = args.split(None, 1)
+                        dest = dest.strip('"')
+                        hdr = next(h for uu, h in msgs if str(uu) == u)
+                        nu = self._add(dest, hdr)
+                        self.copies += 1
+                        await self._reply(w, f"{tag} OK [COPYUID 1 {u} {nu}] done\r\n".encode())
+                        continue
+                elif cmd == "IDLE":
+                    await self._reply(w, b"+ idling\r\n")
+                    ev = asyncio.Event()
+                    self._waiters.append(ev)
+                    done_line = asyncio.ensure_future(r.readline())
+                    changed = asyncio.ensure_future(ev.wait())
+                    done, _ = await asyncio.wait({done_line, changed}, return_when=asyncio.FIRST_COMPLETED)
+                    if changed in done:
+                        await self._reply(w, f"* {len(self.boxes.get(selected, []))} EXISTS\r\n".encode())  # type: ignore[arg-type]
+                        await done_line
+                    self._waiters.remove(ev)
+                    changed.cancel()
+                elif cmd == "LOGOUT":
+                    await self._reply(w, f"* BYE\r\n{tag} OK bye\r\n".encode())
+                    return
+                await self._reply(w, f"{tag} OK done\r\n".encode())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            w.close()
+
+    def stats(self) -> dict:
+        return {
+            "logins": self.logins,
+            "appends": self.appends,
+            "bytes": self.append_bytes,
+            "copies": self.copies,
+        }
@@ -0,0 +1,122 @@
+# bench/html_to_text_bench.py
+
+"""
+Sorties de référence et micro-mesure de email_utils.html_to_text.
+
+    python bench/html_to_text_bench.py              # vérifie les sorties + mesure
+    python bench/html_to_text_bench.py --update     # réécrit les sorties de référence
+
+Chaque bench/golden/<nom>.txt est la sortie attendue pour <nom>.html (ou,
+pour ASH_body, pour templates/ASH_body.html). La mesure compare le
+convertisseur à l'ancienne version (une douzaine de re.sub successifs,
+recopiée ici) sur le template réel et sur des templates de taille
+croissante : prose (paragraphes, <br>, <strong>) et structures (listes
+imbriquées, tableaux, liens, une balise tous les douze caractères).
+Code de sortie 1 si une sortie diffère de sa référence ; les mêmes
+vérifications tournent dans tests/test_html_to_text.py.
+"""
+
+import os
+import re
+import sys
+import timeit
+import argparse
+from html import unescape
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from email_utils import html_to_text  # noqa: E402
+
+GOLDEN = os.path.join(HERE, "golden")
+SOURCES = {
+    "ASH_body": os.path.join(ROOT, "templates", "ASH_body.html"),
+    "structures": os.path.join(GOLDEN, "structures.html"),
+}
+
+PROSE = (
+    "<p>Bonjour <strong>$name</strong>,</p>\n"
+    "<p>Veuillez trouver ci-joint le rapport trimestriel pour la période du ${tri} TR $year,\n"
+    "établi à partir des relevés transmis par l'établissement et des pièces du dossier.<br>\n"
+    "Les montants sont exprimés en euros, les écarts significatifs sont signalés en fin de document.</p>\n"
+)
+
+
+def _regex_html_to_text(html: str) -> str:
+    """Ancienne version de html_to_text : puces "- " sans imbrication, cellules collées."""
+    text = html.replace("\r", "")
+    text = re.sub(r"<\s*br\s*/?>", "\n", text, flags=re.I)
+    text = re.sub(r"</\s*p\s*>", "\n\n", text, flags=re.I)
+    text = re.sub(r"<\s*p\s*>", "", text, flags=re.I)
+    text = re.sub(r"<\s*li\s*>", "- ", text, flags=re.I)
+    text = re.sub(r"</\s*li\s*>", "\n", text, flags=re.I)
+    text = re.sub(r"</\s*ul\s*>", "\n", text, flags=re.I)
+    text = re.sub(r"</\s*ol\s*>", "\n", text, flags=re.I)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = unescape(text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def check_golden(update: bool = False) -> list[str]:
+    problems = []
+    for name, src in SOURCES.items():
+        out = html_to_text(_read(src)) + "\n"
+        path = os.path.join(GOLDEN, f"{name}.txt")
+        if update:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(out)
+            continue
+        expected = _read(path)
+        if out != expected:
+            problems.append(f"{name}: sortie différente de {os.path.relpath(path, ROOT)}")
+    return problems
+
+
+def _time(fn, html: str) -> float:
+    number = max(1, 20000 // max(1, len(html) // 100))
+    return min(timeit.repeat(lambda: fn(html), number=number, repeat=5)) / number
+
+
+def measure() -> None:
+    body = _read(SOURCES["ASH_body"])
+    structures = _read(SOURCES["structures"])
+    cases = [
+        ("ASH_body", body),
+        ("prose x10", PROSE * 10),
+        ("prose x200", PROSE * 200),
+        ("structures", structures),
+        ("structures x50", structures * 50),
+    ]
+    print(f"  {'template':<16}{'taille':>10}{'ancien (µs)':>14}{'nouveau (µs)':>14}{'gain':>8}")
+    for label, html in cases:
+        old = _time(_regex_html_to_text, html)
+        new = _time(html_to_text, html)
+        print(f"  {label:<16}{len(html):>10}{old * 1e6:>14.1f}{new * 1e6:>14.1f}{old / new:>7.2f}x")
+    print(f"  ancien == nouveau sur ASH_body : {_regex_html_to_text(body) == html_to_text(body)}")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Sorties de référence et mesure de html_to_text")
+    p.add_argument("--update", action="store_true", help="réécrire les sorties de référence")
+    args = p.parse_args(argv)
+
+    problems = check_golden(update=args.update)
+    if args.update:
+        print(f"Sorties de référence réécrites dans {GOLDEN}")
+        return 0
+    for line in problems:
+        print(f"ÉCART {line}")
+    measure()
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+# bench/run_bench.py
+
+"""
+Mesure de bout en bout, hors ligne, de effectuer_rapport_async_limited.
+
+    python bench/run_bench.py                       # mesure + comparaison à la référence
+    python bench/run_bench.py --save-baseline       # enregistre la mesure comme référence
+    python bench/run_bench.py --folders 200 --smtp-latency 0.02 --smtp-bandwidth 2e6
+
+Démarre les serveurs SMTP/IMAP de substitution (bench/fake_servers.py),
+génère un dossier « Protégés » synthétique, lance un run complet et
+rapporte messages/s, MB/s, pic mémoire (RSS) et latences par étape
+(perf.json du run). Code de sortie 1 si une métrique régresse de plus de
+--tolerance par rapport à bench/baseline.json.
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import asyncio
+import argparse
+import imaplib
+import tempfile
+import platform
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_servers import FakeSMTP, FakeIMAP  # noqa: E402
+
+BASELINE = os.path.join(HERE, "baseline.json")
+
+
+# --------------------------------------------------------------------
+# Arborescence synthétique
+# --------------------------------------------------------------------
+
+def make_tree(root: str, folders: int, files_per_folder: int, median_kb: float, max_kb: float,
+              text_ratio: float, seed: int) -> int:
+    """
+    Crée `folders` dossiers de protégés. Tailles en loi log-normale autour
+    de `median_kb` (plafonnées à `max_kb`) ; une part `text_ratio` de
+    fichiers texte compressibles, le reste en « PDF » incompressibles.
+    Retourne le nombre total d'octets.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for i in range(folders):
+        d = os.path.join(root, f"Protege {i:04d}")
+        os.makedirs(d)
+        for j in range(files_per_folder):
+            size = int(min(max_kb, rng.lognormvariate(0, 0.8) * median_kb) * 1024)
+            if rng.random() < text_ratio:
+                line = f"Compte rendu {i} / pièce {j} : situation stable, suivi trimestriel.\n".encode("utf-8")
+                data = (line * (size // len(line) + 1))[:size]
+                name = f"note_{j}.txt"
+            else:
+                data = b"%PDF-1.7\n" + rng.randbytes(max(0, size - 9))
+                name = f"rapport_{j}.pdf"
+            with open(os.path.join(d, name), "wb") as f:
+                f.write(data)
+            total += size
+    return total
+
+
+# --------------------------------------------------------------------
+# Run
+# --------------------------------------------------------------------
+
+def _redirect_imap(port: int) -> None:
+    """
+    Le code ouvre imaplib.IMAP4_SSL(host) (port 993) : pour le banc, les
+    connexions IMAP (synchrones et asyncio) partent en clair vers le faux serveur.
+    """
+    class _PlainIMAP(imaplib.IMAP4):
+        def __init__(self, host="", port_=None, *args, timeout=None, **kwargs):
+            super().__init__("127.0.0.1", port, timeout=timeout)
+
+    imaplib.IMAP4_SSL = _PlainIMAP  # type: ignore[misc]
+
+    import async_transport
+    original = async_transport.AsyncIMAPSession.from_config
+
+    def from_config(cls, config):
+        session = original.__func__(cls, config)
+        session.port, session.use_ssl = port, False
+        return session
+
+    async_transport.AsyncIMAPSession.from_config = classmethod(from_config)  # type: ignore[assignment]
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux : Ko, macOS : octets
+        return round(peak / 1024 / (1024 if platform.system() == "Darwin" else 1), 1)
+    except ImportError:
+        try:
+            import psutil  # type: ignore[import-not-found]
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except Exception:
+            return None
+
+
+def run(args) -> dict:
+    smtp = FakeSMTP(
+        latency=args.smtp_latency,
+        bandwidth=args.smtp_bandwidth,
+        max_connections=args.smtp_max_connections,
+        max_per_connection=args.smtp_max_per_connection,
+    ).start()
+    imap = FakeIMAP(latency=args.imap_latency).start()
+    _redirect_imap(imap.port)
+
+    # imports après la redirection IMAP
+    from config import (Config, SMTPConfig, IMAPConfig, PathsConfig, IdentityConfig,
+                        PipelineConfig)
+    from Rapports_trimestriel import effectuer_rapport_async_limited
+
+    work = tempfile.mkdtemp(prefix="bench_")
+    try:
+        proteges = os.path.join(work, "Protégés")
+        logs = os.path.join(work, "logs")
+        total_bytes = make_tree(proteges, args.folders, args.files, args.median_kb, args.max_kb,
+                                args.text_ratio, args.seed)
+        # templates du dépôt, quel que soit le dossier courant (TEMPLATE_DIR relatif à ROOT)
+        templates = Config.find_templates(args.mode)
+        templates.TEMPLATE_DIR = os.path.join(ROOT, templates.TEMPLATE_DIR)
+
+        config = Config(
+            smtp=SMTPConfig(
+                host="127.0.0.1", port=smtp.port, use_ssl=False, request_dsn=True,
+                max_mb=args.max_mb, concurrency=args.concurrency, b64_overhead=1.37,
+                dsn_options="NOTIFY=SUCCESS,FAILURE,DELAY", mdn_requested=False,
+                adaptive=args.adaptive, max_concurrency=args.max_concurrency,
+                limits_path=os.path.join(work, "smtp_limits.json"), retry_base=args.retry_base,
+                rate_msgs_per_min=args.rate_per_min, rate_mb_per_hour=args.rate_mb_per_hour,
+            ),
+            imap=IMAPConfig(
+                host="127.0.0.1", mailbox_name="INBOX/APA", sentbox_name="Sent",
+                copy_sent=not args.no_imap, sessions=args.imap_sessions,
+                folder_cache_path=os.path.join(work, "folders.json"),
+            ),
+            # TEST_MODE=0 : pas de cProfile pendant la mesure (les fichiers sont archivés dans `work`)
+            paths=PathsConfig(proteges_dir=proteges, log_dir=logs, test_mode=0),
+            identity=IdentityConfig(
+                email="bench@example.org", email_pwd="x", emailrec="dest@example.org",
+                name_sender="Banc", role="Mesure",
+            ),
+            template=templates,
+            pipeline=PipelineConfig(
+                prepare_workers=args.prepare_workers,
+                queue_size=2 * args.concurrency,
+                post_workers=args.imap_sessions,
+                engine=args.engine,
+            ),
+        )
+
+        outcome = asyncio.run(effectuer_rapport_async_limited(config, status_callback=lambda _: None))
+
+        run_dir = max(d for d in os.listdir(logs) if os.path.isdir(os.path.join(logs, d)))
+        with open(os.path.join(logs, run_dir, "perf.json"), encoding="utf-8") as f:
+            perf = json.load(f)
+    finally:
+        smtp.stop()
+        imap.stop()
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+        else:
+            print(f"Arborescence et logs conservés dans {work}")
+
+    # un message par protégé : sinon les débits mesurés ne veulent rien dire
+    if smtp.messages != args.folders:
+        failed = ", ".join(outcome["failed"][:5]) + ("…" if len(outcome["failed"]) > 5 else "")
+        raise SystemExit(
+            f"Run incomplet : {smtp.messages} messages reçus par le serveur SMTP pour {args.folders} "
+            f"protégés (échecs : {failed or 'aucun'}) ; voir les logs du run (--keep)"
+        )
+
+    wall = perf["wall_s"] or 1e-9
+    return {
+        "params": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "keep", "tolerance", "repeat")},
+        "folders": args.folders,
+        "attachments_mb": round(total_bytes / (1024 * 1024), 2),
+        "messages": smtp.messages,
+        "wall_s": perf["wall_s"],
+        "messages_per_s": round(smtp.messages / wall, 2),
+        "mb_per_s": perf["effective_mb_per_s"],
+        "peak_rss_mb": _peak_rss_mb(),
+        "smtp": smtp.stats(),
+        "imap": imap.stats(),
+        "stages": {
+            name: {"p50_s": st["p50_s"], "p95_s": st["p95_s"], "max_s": st["max_s"]}
+            for name, st in perf["stages"].items()
+        },
+    }
+
+
+# --------------------------------------------------------------------
+# Rapport / référence
+# --------------------------------------------------------------------
+
+def median_result(results: list[dict]) -> dict:
+    """Médiane de plusieurs mesures (débits, mémoire, latences par étape)."""
+    if len(results) == 1:
+        return results[0]
+    out = dict(results[-1])
+    for key in ("wall_s", "messages_per_s", "mb_per_s", "peak_rss_mb"):
+        values = [r[key] for r in results if r.get(key) is not None]
+        out[key] = statistics.median(values) if values else None
+    out["stages"] = {
+        name: {
+            k: round(statistics.median(r["stages"][name][k] for r in results if name in r["stages"]), 4)
+            for k in ("p50_s", "p95_s", "max_s")
+        }
+        for name in results[-1]["stages"]
+    }
+    out["repeat"] = len(results)
+    return out
+
+
+def print_report(result: dict) -> None:
+    print(f"{result['messages']} messages, {result['attachments_mb']} MB de pièces jointes, "
+          f"{result['wall_s']:.2f}s (médiane de {result.get('repeat', 1)} run(s))")
+    print(f"  {result['messages_per_s']:.2f} messages/s, {result['mb_per_s']} MB/s, "
+          f"pic RSS {result['peak_rss_mb']} MB")
+    print(f"  SMTP {result['smtp']}  IMAP {result['imap']}")
+    print(f"  {'étape':<14}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}")
+    for name, st in result["stages"].items():
+        print(f"  {name:<14}{st['p50_s']:>10.4f}{st['p95_s']:>10.4f}{st['max_s']:>10.4f}")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Régressions au-delà de `tolerance` (0.2 = 20 %)."""
+    problems = []
+    if result["params"] != baseline.get("params"):
+        print("Attention : paramètres différents de la référence, comparaison indicative.")
+
+    for key in ("messages_per_s", "mb_per_s"):
+        old, new = baseline.get(key), result.get(key)
+        if old and new is not None and new < old * (1 - tolerance):
+            problems.append(f"{key}: {new} < {old} (référence)")
+
+    old_rss, new_rss = baseline.get("peak_rss_mb"), result.get("peak_rss_mb")
+    if old_rss and new_rss and new_rss > old_rss * (1 + tolerance):
+        problems.append(f"peak_rss_mb: {new_rss} > {old_rss} (référence)")
+
+    for name, st in result["stages"].items():
+        old = baseline.get("stages", {}).get(name, {}).get("p95_s")
+        # écarts de moins de 10 ms : bruit (ordonnancement, cache disque)
+        if old and st["p95_s"] > max(old * (1 + tolerance), old + 0.01):
+            problems.append(f"{name} p95: {st['p95_s']}s > {old}s (référence)")
+    return problems
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Banc d'essai hors ligne des envois trimestriels")
+    p.add_argument("--folders", type=int, default=40)
+    p.add_argument("--files", type=int, default=3, help="pièces jointes par protégé")
+    p.add_argument("--median-kb", type=float, default=400)
+    p.add_argument("--max-kb", type=float, default=6000)
+    p.add_argument("--text-ratio", type=float, default=0.3, help="part de fichiers compressibles")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--mode", default="ASH")
+    p.add_argument("--engine", choices=("thread", "asyncio"), default="thread")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--adaptive", action="store_true", help="parallélisme SMTP adaptatif (AIMD)")
+    p.add_argument("--max-concurrency", type=int, default=8, help="plafond du mode adaptatif")
+    p.add_argument("--retry-base", type=float, default=0.05, help="attente avant un nouvel essai (s)")
+    p.add_argument("--rate-per-min", type=float, default=0, help="quota messages/minute (0 = aucun)")
+    p.add_argument("--rate-mb-per-hour", type=float, default=0, help="quota Mo/heure (0 = aucun)")
+    p.add_argument("--prepare-workers", type=int, default=2)
+    p.add_argument("--imap-sessions", type=int, default=1)
+    p.add_argument("--max-mb", type=float, default=19)
+    p.add_argument("--no-imap", action="store_true", help="pas de copie IMAP")
+    p.add_argument("--smtp-latency", type=float, default=0.0, help="délai par réponse SMTP (s)")
+    p.add_argument("--smtp-bandwidth", type=float, default=None, help="débit DATA max (octets/s)")
+    p.add_argument("--smtp-max-connections", type=int, default=None)
+    p.add_argument("--smtp-max-per-connection", type=int, default=None)
+    p.add_argument("--imap-latency", type=float, default=0.0)
+    p.add_argument("--repeat", type=int, default=3, help="nombre de runs (médiane)")
+    p.add_argument("--tolerance", type=float, default=0.2)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--keep", action="store_true", help="garder l'arborescence et les logs")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    result = median_result([run(args) for _ in range(max(1, args.repeat))])
+    print_report(result)
+
+    if args.save_baseline:
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Référence enregistrée dans {BASELINE}")
+        return 0
+
+    if not os.path.isfile(BASELINE):
+        print("Pas de référence (--save-baseline pour en créer une).")
+        return 0
+    with open(BASELINE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    problems = compare(result, baseline, args.tolerance)
+    for line in problems:
+        print(f"RÉGRESSION {line}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
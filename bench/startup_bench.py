@@ -0,0 +1,122 @@
+# bench/startup_bench.py
+
+"""
+Budget de démarrage de l'interface (imports avant l'affichage de la fenêtre).
+
+    python bench/startup_bench.py                    # mesure + vérification du budget
+    python bench/startup_bench.py --repeat 10 --top 30
+    python bench/startup_bench.py --report startup.txt
+
+Lance `python -X importtime -c "import ASH_Email"` dans un processus neuf
+(plusieurs fois, on garde le plus rapide), puis affiche :
+- la durée totale des imports et les modules les plus coûteux, au format
+  de -X importtime (propre | cumulé | module) ;
+- les modules qui doivent rester hors du démarrage (pile SMTP/IMAP/MIME,
+  asyncio, icecream...) : chargés au premier envoi, pas avant ; PIL n'y
+  est pas, customtkinter l'importe lui-même ;
+- pour information, le coût de ce premier envoi (import de
+  Rapports_trimestriel).
+Budget et liste des modules différés : bench/startup_budget.json.
+Code de sortie 1 si le budget est dépassé ou si un module différé est
+chargé au démarrage, 2 si l'import échoue (dépendance manquante).
+À lancer avec les vraies dépendances (customtkinter, Pillow) : une
+mesure sans elles ne dit rien du démarrage réel.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BUDGET = os.path.join(HERE, "startup_budget.json")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def importtime(module: str) -> list[tuple[int, int, int, str]]:
+    """Un import à froid de `module` : [(propre µs, cumulé µs, profondeur, nom)], dans l'ordre."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"code {proc.returncode}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            entries.append((int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return entries
+
+
+def total_us(entries, module: str) -> int:
+    """Cumulé de `module` : ses imports, sans le démarrage de l'interpréteur (site, encodings)."""
+    return next(cum for _, cum, depth, name in entries if depth == 0 and name == module)
+
+
+def best_of(module: str, repeat: int):
+    runs = [importtime(module) for _ in range(max(1, repeat))]
+    return min(runs, key=lambda entries: total_us(entries, module))
+
+
+def loaded(entries, prefix: str) -> bool:
+    return any(name == prefix or name.startswith(prefix + ".") for *_, name in entries)
+
+
+def format_report(entries, top: int) -> list[str]:
+    lines = [f"{'propre (µs)':>12} | {'cumulé (µs)':>12} | module"]
+    for self_us, cum, depth, name in sorted(entries, key=lambda e: e[1], reverse=True)[:top]:
+        lines.append(f"{self_us:>12} | {cum:>12} | {'  ' * depth}{name}")
+    return lines
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Budget de démarrage de l'interface (imports)")
+    p.add_argument("--repeat", type=int, default=5, help="mesures (on garde la plus rapide)")
+    p.add_argument("--top", type=int, default=20, help="modules affichés")
+    p.add_argument("--report", help="écrit aussi le rapport complet dans ce fichier")
+    args = p.parse_args(argv)
+
+    with open(BUDGET, encoding="utf-8") as f:
+        budget = json.load(f)
+    module = budget["module"]
+
+    try:
+        entries = best_of(module, args.repeat)
+        first_send = best_of(budget["first_use"], args.repeat)
+    except RuntimeError as e:
+        print(f"Import impossible: {e}")
+        return 2
+
+    startup_ms = total_us(entries, module) / 1000
+    problems = []
+    if startup_ms > budget["max_ms"]:
+        problems.append(f"démarrage {startup_ms:.0f} ms > budget {budget['max_ms']} ms")
+    early = [name for name in budget["deferred"] if loaded(entries, name)]
+    if early:
+        problems.append("chargés au démarrage: " + ", ".join(early))
+
+    report = format_report(entries, args.top)
+    print(f"import {module}: {startup_ms:.1f} ms (budget {budget['max_ms']} ms), {len(entries)} modules")
+    print("\n".join("  " + line for line in report))
+    print(f"  différés ({len(budget['deferred'])}): {'OK' if not early else 'ÉCART'}")
+    print(
+        f"premier envoi (import {budget['first_use']}): {total_us(first_send, budget['first_use']) / 1000:.1f} ms "
+        f"de plus, hors démarrage"
+    )
+    for line in problems:
+        print(f"ÉCART {line}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(f"# import {module}: {startup_ms:.1f} ms, {sys.version.split()[0]} {sys.platform}\n")
+            f.write("\n".join(format_report(entries, len(entries))) + "\n")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,20 @@
 @echo off
 REM Compilation de l'application APA_Email en .exe
 python -m pip install -r requirements.txt
-python -m PyInstaller -F -w -n "Rapporteur ASH" --icon "assets/icon.ico" --add-data "assets;assets" ASH_Email.py
+REM "build.bat onedir" : dossier décompressé, démarrage plus rapide (pas d'extraction dans %%TEMP%%)
+set OUT=dist
+if /I "%1"=="onedir" (
+    python -m PyInstaller --noconfirm "Rapporteur ASH onedir.spec"
+    set "OUT=dist\Rapporteur ASH"
+) else (
+    python -m PyInstaller -F -w -n "Rapporteur ASH" --icon "assets/icon.ico" --add-data "assets;assets" ASH_Email.py
+)
 
 REM Copie des fichiers de configuration modifiables
-xcopy templates dist\templates\ /E /I /Y
-xcopy assets dist\assets\ /E /I /Y
-xcopy Protégés dist\Protégés\ /E /I /Y
-xcopy .env dist\ /E /I /Y
+xcopy templates "%OUT%\templates\" /E /I /Y
+xcopy assets "%OUT%\assets\" /E /I /Y
+xcopy Protégés "%OUT%\Protégés\" /E /I /Y
+xcopy .env "%OUT%\" /E /I /Y
 
 echo.
 echo === Build terminé ===
@@ -0,0 +1,200 @@
+# cli.py
+
+"""
+Envoi des rapports sans interface (serveur, tâche planifiée).
+
+    python cli.py run                          # envoie tout le dossier Protégés
+    python cli.py run --dry-run                # prépare et liste, n'envoie rien
+    python cli.py run --resume --concurrency 4
+    python cli.py run --mode ASH,APA           # les deux profils dans le même run
+    python cli.py watch --settle 120           # envoie chaque dossier dès qu'il est complet
+
+Ctrl-C / SIGTERM pendant un run : plus de nouvel envoi, ceux en cours vont
+au bout (un second Ctrl-C coupe tout). Code de sortie : 0 si tout est parti,
+1 s'il reste des échecs, 2 si la configuration est invalide, 130 si arrêté.
+"""
+
+import sys
+import signal
+import asyncio
+import argparse
+from datetime import datetime
+
+from config import Config
+from icecream import ic
+ic.disable()
+
+
+def _status(msg: str) -> None:
+    print(f"[{datetime.now():%H:%M:%S}] {msg}", flush=True)
+
+
+def load_profiles(args) -> list[Config]:
+    """Une Config par profil de --mode (ou de PROFILES) ; le premier porte les réglages communs."""
+    profiles = Config.load_profiles(args.env, args.mode)
+    for config in profiles:
+        if args.concurrency:
+            # au plus N envois SMTP simultanés (le mode adaptatif reste sous ce plafond)
+            config.smtp.concurrency = args.concurrency
+            config.smtp.max_concurrency = args.concurrency
+            config.pipeline.queue_size = max(config.pipeline.queue_size, 2 * args.concurrency)
+        if args.engine:
+            config.pipeline.engine = args.engine
+    if profiles[0].paths.test_mode:
+        ic.enable()
+    return profiles
+
+
+async def _send(profiles: list[Config], args, only: list[str] | None = None, session=None) -> tuple[dict, bool]:
+    """Un run (dans `session` si fournie) ; rend (protégés par issue, arrêt demandé)."""
+    # import ici : la pile SMTP/IMAP n'est chargée que pour un vrai run
+    from Rapports_trimestriel import effectuer_rapport_async_limited
+    from progress import RunProgress
+
+    progress = RunProgress()
+    loop = asyncio.get_running_loop()
+
+    def stop(sig):
+        _status("Arrêt demandé : fin des envois en cours (Ctrl-C à nouveau pour tout couper)…")
+        progress.cancel()
+        loop.remove_signal_handler(sig)   # le signal suivant reprend son effet normal
+
+    signals = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop, sig)
+            signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows : Ctrl-C interrompt le run directement
+    try:
+        outcome = await effectuer_rapport_async_limited(
+            profiles=profiles, status_callback=_status, resume=args.resume, progress=progress,
+            dry_run=args.dry_run, only=only, session=session,
+        )
+    finally:
+        # entre deux lots de la surveillance, Ctrl-C reprend son effet normal
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+    return outcome, progress.cancelled
+
+
+def cmd_run(profiles: list[Config], args) -> int:
+    outcome, stopped = asyncio.run(_send(profiles, args, args.only or None))
+    if stopped:
+        return 130
+    return 1 if outcome["failed"] or outcome["unknown"] else 0
+
+
+def cmd_watch(profiles: list[Config], args) -> int:
+    """
+    Surveille PROTEGES_DIR et envoie chaque dossier de protégé dès qu'il est
+    complet et stable (`--settle` s sans changement), par petits lots plutôt
+    qu'en une seule rafale en fin de trimestre. Toujours en mode reprise :
+    un dossier déjà envoyé avec les mêmes pièces n'est pas renvoyé.
+    Un seul profil par surveillance.
+    """
+    if len(profiles) > 1:
+        print("watch: un seul profil à la fois (--mode ASH ou --mode APA)", file=sys.stderr)
+        return 2
+    args.resume = True
+    return asyncio.run(_watch(profiles, args))
+
+
+async def _watch(profiles: list[Config], args) -> int:
+    """
+    Boucle de surveillance, dans une seule boucle asyncio : les lots partagent
+    une SendSession (dossier de run, connexions SMTP/IMAP, quotas, manifeste
+    dont seuls les dossiers du lot sont reparcourus).
+    """
+    from folder_watch import FolderWatcher, StableFolders
+    from Rapports_trimestriel import SendSession
+
+    root = profiles[0].paths.proteges_dir
+    stable = StableFolders(root, settle=args.settle)
+    with FolderWatcher(root, backend=args.backend, poll_interval=args.poll) as watcher:
+        async with SendSession(profiles) as session:
+            stable.touch(*watcher.folders())   # dossiers déjà présents au démarrage
+            _status(
+                f"Surveillance de {root} ({watcher.backend}) : envoi {args.settle:g}s après le dernier "
+                f"changement d'un dossier, {stable.pending} dossiers à examiner"
+            )
+            while True:
+                stable.touch(*await asyncio.to_thread(watcher.wait, stable.next_check()))
+                ready = stable.ready()
+                if not ready:
+                    continue
+                # les dossiers qui se stabilisent pendant ce court délai partent dans le même lot
+                await asyncio.sleep(args.batch_delay)
+                stable.touch(*watcher.wait(0))
+                ready = sorted(set(ready) | set(stable.ready()))
+                _status(f"{len(ready)} dossier(s) prêt(s): {', '.join(ready)}")
+                try:
+                    outcome, stopped = await _send(profiles, args, ready, session)
+                except Exception as e:
+                    _status(f"Run interrompu: {e}")
+                    stable.retry(ready, args.retry_after)
+                    continue
+                if stopped:
+                    return 130
+                # réception incertaine : pas de nouvel essai automatique (doublon possible)
+                stable.sent(outcome["sent"] + outcome["skipped"] + outcome["planned"] + outcome["unknown"])
+                if outcome["unknown"]:
+                    _status(f"À vérifier avant tout renvoi (réception incertaine): {', '.join(outcome['unknown'])}")
+                if outcome["failed"]:
+                    _status(f"Nouvel essai dans {args.retry_after:g}s: {', '.join(outcome['failed'])}")
+                    stable.retry(outcome["failed"], args.retry_after)
+
+
+def _modes(value: str) -> list[str]:
+    modes = [m.strip().upper() for m in value.split(",") if m.strip()]
+    unknown = sorted(set(modes) - {"ASH", "APA"})
+    if not modes or unknown:
+        raise argparse.ArgumentTypeError(f"profil inconnu: {', '.join(unknown) or repr(value)} (ASH, APA)")
+    return modes
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--env", default=".env", help="fichier de configuration (défaut: .env)")
+    common.add_argument(
+        "--mode", type=_modes, metavar="ASH[,APA]",
+        help="profil(s) de templates, plusieurs dans le même run (défaut: PROFILES du .env, sinon ASH)",
+    )
+    common.add_argument("--dry-run", action="store_true", help="prépare les messages sans rien envoyer ni déplacer")
+    common.add_argument("--concurrency", type=int, help="envois SMTP simultanés au plus")
+    common.add_argument("--engine", choices=("thread", "asyncio"), help="moteur d'envoi (défaut: PIPELINE_ENGINE)")
+
+    p = argparse.ArgumentParser(prog="cli.py", description="Envoi des rapports trimestriels sans interface")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", parents=[common], help="un run complet, puis fin")
+    run.add_argument("--resume", action="store_true", help="saute les envois déjà acceptés ce trimestre")
+    run.add_argument("--only", nargs="+", metavar="PROTEGE", help="seulement ces dossiers de protégés")
+    run.set_defaults(func=cmd_run)
+
+    watch = sub.add_parser("watch", parents=[common], help="surveille le dossier et envoie au fil de l'eau")
+    watch.add_argument("--settle", type=float, default=60.0, help="secondes sans changement avant envoi (défaut: 60)")
+    watch.add_argument("--backend", choices=("auto", "inotify", "poll"), default="auto")
+    watch.add_argument("--poll", type=float, default=5.0, help="intervalle du parcours périodique (défaut: 5s)")
+    watch.add_argument("--batch-delay", type=float, default=2.0, help="attente pour grouper les dossiers prêts (défaut: 2s)")
+    watch.add_argument("--retry-after", type=float, default=300.0, help="nouvel essai après un échec (défaut: 300s)")
+    watch.set_defaults(func=cmd_watch)
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        profiles = load_profiles(args)
+    except Exception as e:
+        print(f"Configuration invalide: {e}", file=sys.stderr)
+        return 2
+    try:
+        return args.func(profiles, args)
+    except KeyboardInterrupt:
+        _status("Arrêt demandé.")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# compression.py
+
+import os
+import time
+import zlib
+import zipfile
+
+from icecream import ic
+ic.disable()
+
+# Signatures de formats déjà compressés : les deflater ne gagne que 1 à 3 %
+_MAGIC = (
+    b"%PDF",                 # PDF (flux FlateDecode / images JPEG)
+    b"\xff\xd8\xff",         # JPEG
+    b"\x89PNG",              # PNG
+    b"GIF8",                 # GIF
+    b"PK\x03\x04",           # ZIP, docx/xlsx/odt...
+    b"\x1f\x8b",             # gzip
+    b"BZh",                  # bzip2
+    b"\xfd7zXZ",             # xz
+    b"7z\xbc\xaf",           # 7z
+    b"Rar!",                 # rar
+)
+_PRECOMPRESSED_EXT = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".heic", ".webp", ".zip", ".7z", ".rar",
+    ".gz", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".mp3", ".mp4", ".mov",
+}
+
+SAMPLE_SIZE = 256 * 1024     # échantillon pour estimer le taux de compression
+DEFLATE_LEVEL = 6
+# en-tête local + entrée du répertoire central (hors nom), cf. format ZIP
+_ZIP_ENTRY_OVERHEAD = 30 + 46
+_ZIP_END_OVERHEAD = 22
+
+
+def is_precompressed(path: str) -> bool:
+    """Vrai si le fichier est dans un format déjà compressé (signature, sinon extension)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(16)
+    except OSError:
+        return False
+    if head.startswith(_MAGIC):
+        return True
+    if head[4:8] == b"ftyp" or (head.startswith(b"RIFF") and head[8:12] == b"WEBP"):
+        return True  # MP4/MOV/HEIC, WEBP
+    return os.path.splitext(path)[1].lower() in _PRECOMPRESSED_EXT
+
+
+def _deflated_estimate(path: str, size: int) -> int:
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_SIZE)
+    if not sample:
+        return 0
+    ratio = len(zlib.compress(sample, DEFLATE_LEVEL)) / len(sample)
+    return int(size * min(ratio, 1.0))
+
+
+def estimate_zip_size(paths: list[str]) -> int:
+    """Taille prévisible de l'archive, sans la construire (échantillonnage)."""
+    total = _ZIP_END_OVERHEAD
+    for p in paths:
+        size = os.path.getsize(p)
+        name_len = 2 * len(os.path.basename(p).encode("utf-8"))
+        data = size if is_precompressed(p) else _deflated_estimate(p, size)
+        total += _ZIP_ENTRY_OVERHEAD + name_len + data
+    return total
+
+
+# ------------------------------------------------------------
+# Construction de l'archive
+# ------------------------------------------------------------
+
+def build_zip(zpath: str, paths: list[str]) -> dict:
+    """
+    Archive `paths` dans `zpath` :
+    - formats déjà compressés stockés tels quels (ZIP_STORED)
+    - les autres deflatés (ZIP_DEFLATED, lus par blocs par zipfile)
+    Retourne les statistiques (durée, octets économisés...).
+    """
+    t0 = time.perf_counter()
+    stored = [p for p in paths if is_precompressed(p)]
+    bytes_in = sum(os.path.getsize(p) for p in paths)
+
+    with zipfile.ZipFile(zpath, "w") as zf:
+        for p in paths:
+            zf.write(
+                p, arcname=os.path.basename(p),
+                compress_type=zipfile.ZIP_STORED if p in stored else zipfile.ZIP_DEFLATED,
+                compresslevel=DEFLATE_LEVEL,
+            )
+
+    bytes_out = os.path.getsize(zpath)
+    return {
+        "files": len(paths),
+        "stored": len(stored),
+        "deflated": len(paths) - len(stored),
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "saved": bytes_in - bytes_out,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
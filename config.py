@@ -1,6 +1,6 @@
 # config.py
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -18,6 +18,25 @@ def guess_imap_host(email: str) -> str:
     return f"imap.{domain}"
 
 
+# Quotas d'envoi par serveur SMTP (messages/minute, Mo/heure) : valeurs
+# prudentes, en deçà des limites annoncées par les fournisseurs grand public
+_RATE_LIMITS = (
+    (("orange", "wanadoo"), (20, 300)),
+    (("gmail", "googlemail"), (20, 1000)),
+    (("office365", "outlook", "hotmail", "live.com"), (30, 1000)),
+    (("yahoo",), (10, 300)),
+)
+
+
+def guess_rate_limits(smtp_host: str) -> tuple[float, float]:
+    """Quotas du fournisseur d'après l'hôte SMTP ; (0, 0) = inconnu, pas de limite."""
+    host = smtp_host.lower()
+    for keys, limits in _RATE_LIMITS:
+        if any(k in host for k in keys):
+            return limits
+    return 0, 0
+
+
 @dataclass
 class SMTPConfig:
     host:          str
@@ -26,9 +45,17 @@ class SMTPConfig:
     request_dsn:   bool
     max_mb:        float
     concurrency:   int
-    b64_overhead:  float   # <-- nouveau
+    b64_overhead:  float   # ancienne estimation ; la taille SMTP est désormais calculée exactement
     dsn_options:   str
     mdn_requested: bool
+    oversize_strategy: str = "zip"   # "zip" ou "split" (plusieurs messages numérotés)
+    adaptive: bool = False           # parallélisme ajusté selon les réponses du serveur (AIMD)
+    max_concurrency: int = 8         # plafond du parallélisme adaptatif
+    limits_path: Optional[str] = None   # plafonds appris par serveur (None = non mémorisés)
+    retries: int = 4                 # nouveaux essais d'un envoi différé (4xx, connexion coupée)
+    retry_base: float = 2.0          # secondes, doublées à chaque essai (avec jitter)
+    rate_msgs_per_min: float = 0     # quota du fournisseur (0 = pas de limite)
+    rate_mb_per_hour: float = 0
 
 
 @dataclass
@@ -37,6 +64,12 @@ class IMAPConfig:
     mailbox_name: str
     sentbox_name: Optional[str]
     copy_sent: bool
+    sessions: int = 1   # connexions IMAP persistantes partagées pendant un run
+    folder_cache_path: Optional[str] = None   # None = cache des dossiers en mémoire seulement
+    folder_cache_ttl: float = 7 * 24 * 3600   # secondes
+    confirm: bool = False          # surveiller la réception des envois en fin de run
+    confirm_box: str = "INBOX"
+    confirm_timeout: float = 120   # secondes
 
 @dataclass
 class TemplateConfig:
@@ -51,6 +84,14 @@ class PathsConfig:
     test_mode: int  # 0 = normal, 1 = test (ne déplace pas les fichiers)
 
 
+@dataclass
+class PipelineConfig:
+    prepare_workers: int = 2   # threads de préparation (composition, zip, spool)
+    queue_size: int = 4        # messages préparés en attente d'envoi (backpressure)
+    post_workers: int = 1      # threads de copie IMAP + archivage
+    engine: str = "thread"     # "thread" (smtplib/imaplib) ou "asyncio" (streams natifs)
+
+
 @dataclass
 class IdentityConfig:
     email: str
@@ -67,10 +108,13 @@ class Config:
     paths: PathsConfig
     identity: IdentityConfig
     template: TemplateConfig
+    pipeline: PipelineConfig = field(default_factory=PipelineConfig)
+    profile: str = ""   # APA / ASH ; "" si chargé sans mode
 
     @classmethod
     def load(cls, env_path: str = ".env", mode: Optional[str] = None) -> "Config":
         load_dotenv(env_path, override=True)
+        profile = (mode or "").strip().upper()
 
         email = os.getenv("email", "")
         email_pwd = os.getenv("email_pwd", "")
@@ -89,15 +133,44 @@ class Config:
         b64_overhead = float(os.getenv("B64_OVERHEAD", "1.37"))  # <-- ici
         dsn_options = os.getenv("SMTP_DSN_OPTIONS", "NOTIFY=SUCCESS,FAILURE,DELAY")
         mdn_requested = bool(os.getenv("SMTP_REQUEST_MDN", 0))
+        oversize_strategy = os.getenv("SMTP_OVERSIZE", "zip").strip().lower()
+        # adaptatif seulement sur demande, et jamais au-delà de SMTP_CONCURRENCY sans plafond explicite
+        adaptive = os.getenv("SMTP_ADAPTIVE", "0") == "1"
+        max_concurrency = int(os.getenv("SMTP_MAX_CONCURRENCY", str(concurrency)))
+        smtp_retries = int(os.getenv("SMTP_RETRIES", "4"))
+        retry_base = float(os.getenv("SMTP_RETRY_BASE", "2"))
+        # quotas : valeurs du fournisseur (hôte SMTP), surchargées par le .env ("0" = pas de limite)
+        default_rate, default_mb = guess_rate_limits(smtp_host)
+        rate_msgs_per_min = float(os.getenv("SMTP_RATE_PER_MIN", str(default_rate)))
+        rate_mb_per_hour = float(os.getenv("SMTP_RATE_MB_PER_HOUR", str(default_mb)))
 
         # ---- IMAP ----
         imap_host = os.getenv("IMAP_HOST", guess_imap_host(email))
         mailbox_name = os.getenv("Mailbox_name", "INBOX/APA")
+        if profile:
+            mailbox_name = os.getenv(f"{profile}_MAILBOX_NAME", mailbox_name)
         sentbox_name = os.getenv("Sentbox_name")
         copy_sent = os.getenv("IMAP_COPY_SENT", "0") == "1"
+        imap_sessions = int(os.getenv("IMAP_SESSIONS", "1"))
+        # cache de résolution des dossiers, à côté du .env ("" pour désactiver la persistance)
+        env_dir = os.path.dirname(os.path.abspath(env_path))
+        folder_cache_path = os.getenv("IMAP_FOLDER_CACHE", os.path.join(env_dir, ".imap_folders.json")) or None
+        limits_path = os.getenv("SMTP_LIMITS_CACHE", os.path.join(env_dir, ".smtp_limits.json")) or None
+        folder_cache_ttl = float(os.getenv("IMAP_FOLDER_CACHE_TTL", str(7 * 24 * 3600)))
+        confirm = os.getenv("IMAP_CONFIRM", "0") == "1"
+        confirm_box = os.getenv("IMAP_CONFIRM_BOX", "INBOX")
+        confirm_timeout = float(os.getenv("IMAP_CONFIRM_TIMEOUT", "120"))
+
+        # ---- pipeline d'envoi ----
+        prepare_workers = int(os.getenv("PIPELINE_PREPARE_WORKERS", "2"))
+        queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", str(2 * max(1, concurrency))))
+        post_workers = int(os.getenv("PIPELINE_POST_WORKERS", str(imap_sessions)))
+        engine = os.getenv("PIPELINE_ENGINE", "thread").strip().lower()
 
         # ---- chemin / logs / mode test ----
         proteges_dir = os.getenv("PROTEGES_DIR", "Protégés")
+        if profile:
+            proteges_dir = os.getenv(f"{profile}_PROTEGES_DIR", proteges_dir)
         log_dir = os.getenv("LOG_DIR", "logs")
         test_mode = int(os.getenv("TEST_MODE", "0"))
 
@@ -119,12 +192,26 @@ class Config:
                 b64_overhead=b64_overhead,
                 dsn_options=dsn_options,
                 mdn_requested=mdn_requested,
+                oversize_strategy=oversize_strategy,
+                adaptive=adaptive,
+                max_concurrency=max_concurrency,
+                limits_path=limits_path,
+                retries=smtp_retries,
+                retry_base=retry_base,
+                rate_msgs_per_min=rate_msgs_per_min,
+                rate_mb_per_hour=rate_mb_per_hour,
             ),
             imap=IMAPConfig(
                 host=imap_host,
                 mailbox_name=mailbox_name,
                 sentbox_name=sentbox_name,
                 copy_sent=copy_sent,
+                sessions=imap_sessions,
+                folder_cache_path=folder_cache_path,
+                folder_cache_ttl=folder_cache_ttl,
+                confirm=confirm,
+                confirm_box=confirm_box,
+                confirm_timeout=confirm_timeout,
             ),
             paths=PathsConfig(
                 proteges_dir=proteges_dir,
@@ -139,8 +226,39 @@ class Config:
                 role=role,
             ),
             template=template_cfg,
+            pipeline=PipelineConfig(
+                prepare_workers=prepare_workers,
+                queue_size=queue_size,
+                post_workers=post_workers,
+                engine=engine,
+            ),
+            profile=profile,
         )
 
+    @classmethod
+    def load_profiles(cls, env_path: str = ".env", modes=None, default: str = "ASH") -> list["Config"]:
+        """
+        Une Config par profil, pour un run qui les enchaîne ensemble
+        (templates, dossier Protégés et dossier IMAP propres à chacun).
+        modes : liste ou "ASH,APA" ; à défaut, variable PROFILES du .env.
+        """
+        if modes is None:
+            load_dotenv(env_path, override=True)
+            modes = os.getenv("PROFILES", default)
+        if isinstance(modes, str):
+            modes = modes.split(",")
+        names = list(dict.fromkeys(m.strip().upper() for m in modes if m.strip())) or [default]
+        if len(names) > 1:
+            # pas de repli sur PROTEGES_DIR : deux profils sur le même dossier
+            # enverraient chaque rapport deux fois
+            missing = [m for m in names if not os.getenv(f"{m}_PROTEGES_DIR")]
+            if missing:
+                raise RuntimeError(
+                    "Plusieurs profils: dossier Protégés à définir pour chacun ("
+                    + ", ".join(f"{m}_PROTEGES_DIR" for m in missing) + ")"
+                )
+        return [cls.load(env_path, mode=m) for m in names]
+
     # ------------------------------------------------------
     # Sélection des templates selon le "mode"
     # ------------------------------------------------------
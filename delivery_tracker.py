@@ -0,0 +1,194 @@
+# delivery_tracker.py
+
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+from email import policy
+from email.parser import BytesHeaderParser
+
+from config import Config
+from imap_watch import MailboxWatcher
+from icecream import ic
+ic.disable()
+
+_UID_RE = re.compile(rb"UID (\d+)")
+_MSGID_RE = re.compile(r"<[^<>\s]+>")
+# préfixes ajoutés par une réponse / un transfert
+_SUBJECT_PREFIX = re.compile(r"^(?:(?:re|tr|fwd?)\s*:\s*)+", re.I)
+_HEADER_FIELDS = "(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID IN-REPLY-TO REFERENCES SUBJECT)])"
+
+
+def _normalize_subject(subject: str) -> str:
+    return " ".join(_SUBJECT_PREFIX.sub("", subject.strip()).split()).casefold()
+
+
+class DeliveryTracker:
+    """
+    Confirmation groupée des envois d'un run.
+
+    On enregistre (protégé, Message-ID, sujet) de chaque envoi accepté, puis
+    on surveille UNE fois le dossier cible : chaque nouveau lot d'UID est
+    récupéré en un seul FETCH (plage d'UID) et comparé à tous les messages en
+    attente : Message-ID exact (Message-ID / In-Reply-To / References),
+    sinon sujet identique, et seulement s'il ne désigne qu'un message.
+    Un envoi découpé en plusieurs messages n'est confirmé qu'à l'arrivée de
+    toutes ses parties.
+    """
+
+    def __init__(self, server: str, username: str, password: str, box: str):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.box = box
+
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict] = {}
+        self.start_uid: int | None = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> "DeliveryTracker":
+        return cls(
+            config.imap.host,
+            config.identity.email,
+            config.identity.email_pwd,
+            config.imap.confirm_box,
+        )
+
+    def _watcher(self) -> MailboxWatcher:
+        return MailboxWatcher(self.server, self.username, self.password, self.box)
+
+    # ------------------------------------------------------------
+    # Enregistrement
+    # ------------------------------------------------------------
+
+    def start(self) -> None:
+        """Mémorise UIDNEXT avant les envois : seuls les messages suivants comptent."""
+        with self._watcher() as w:
+            self.start_uid = w.uidnext
+
+    def expect(
+        self,
+        protege: str,
+        message_id: str,
+        subject: str,
+        parts: list[tuple[str, str]] | None = None,
+    ) -> None:
+        """
+        `parts` : (Message-ID, sujet) de chaque message quand l'envoi a été
+        découpé ; sinon le message unique (`message_id`, `subject`).
+        """
+        with self._lock:
+            self._pending[protege] = {
+                "message_id": message_id,
+                "subject": subject,
+                "sent_at": time.time(),
+                "parts": [
+                    {"message_id": mid, "subject": subj, "confirmed_at": None, "uid": None}
+                    for mid, subj in (parts or [(message_id, subject)])
+                ],
+            }
+
+    # ------------------------------------------------------------
+    # Surveillance
+    # ------------------------------------------------------------
+
+    def _outstanding(self) -> list[dict]:
+        """Messages pas encore reçus, toutes parties confondues."""
+        with self._lock:
+            return [part for e in self._pending.values() for part in e["parts"] if part["confirmed_at"] is None]
+
+    def _fetch_headers(self, w: MailboxWatcher, since: int) -> list[tuple[int, dict]]:
+        typ, data = w.imap.uid("FETCH", f"{since}:*", _HEADER_FIELDS)  # type: ignore[union-attr]
+        if typ != "OK":
+            return []
+        parser = BytesHeaderParser(policy=policy.default)   # sujets =?utf-8?...?= décodés
+        out = []
+        for item in data:
+            if not isinstance(item, tuple) or len(item) < 2:
+                continue
+            m = _UID_RE.search(item[0])
+            if not m or int(m.group(1)) < since:
+                continue
+            hdr = parser.parsebytes(item[1])
+            out.append((int(m.group(1)), {k.lower(): str(v) for k, v in hdr.items()}))
+        return out
+
+    def _match(self, uid: int, hdr: dict) -> None:
+        ids = set(_MSGID_RE.findall(" ".join(hdr.get(k, "") for k in ("message-id", "in-reply-to", "references"))))
+        outstanding = self._outstanding()
+        hits = [part for part in outstanding if part["message_id"] and part["message_id"].strip() in ids]
+        if not hits:
+            subject = _normalize_subject(hdr.get("subject", ""))
+            hits = [part for part in outstanding if subject and _normalize_subject(part["subject"] or "") == subject]
+            if len(hits) > 1:
+                return   # sujet partagé par plusieurs messages : seul le Message-ID peut trancher
+        now = time.time()
+        with self._lock:
+            for part in hits:
+                part["confirmed_at"] = now
+                part["uid"] = uid
+
+    def watch(self, timeout: float = 120, interval: float = 2) -> dict:
+        """Surveille le dossier jusqu'à confirmation de tous les envois ou timeout."""
+        end = time.monotonic() + timeout
+        with self._watcher() as w:
+            since = self.start_uid or w.uidnext
+            while self._outstanding():
+                headers = self._fetch_headers(w, since)
+                for uid, hdr in headers:
+                    self._match(uid, hdr)
+                if headers:
+                    since = max(uid for uid, _ in headers) + 1
+                w.uidnext = max(w.uidnext, since)
+
+                remaining = end - time.monotonic()
+                if not self._outstanding() or remaining <= 0:
+                    break
+                # IDLE plafonné : un message arrivé juste avant IDLE ne serait pas signalé
+                w.wait_for_change(min(remaining, 30), interval)
+        return self.report()
+
+    # ------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------
+
+    def report(self) -> dict:
+        def iso(ts):
+            return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+        def entry(e):
+            parts = e["parts"]
+            # confirmé à l'arrivée de la dernière partie
+            done = None if any(p["confirmed_at"] is None for p in parts) else max(p["confirmed_at"] for p in parts)
+            out = {
+                "confirmed": done is not None,
+                "message_id": e["message_id"],
+                "subject": e["subject"],
+                "sent_at": iso(e["sent_at"]),
+                "confirmed_at": iso(done),
+                "delay_s": round(done - e["sent_at"], 2) if done else None,
+                "uid": parts[0]["uid"],
+            }
+            if len(parts) > 1:
+                out["parts"] = [
+                    {
+                        "message_id": p["message_id"],
+                        "subject": p["subject"],
+                        "confirmed": p["confirmed_at"] is not None,
+                        "uid": p["uid"],
+                    }
+                    for p in parts
+                ]
+            return out
+
+        with self._lock:
+            return {protege: entry(e) for protege, e in sorted(self._pending.items())}
+
+    def write_report(self, run_dir: str, report: dict | None = None, name: str = "confirmations.json") -> str:
+        path = os.path.join(run_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report if report is not None else self.report(), f, ensure_ascii=False, indent=2)
+        return path
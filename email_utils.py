@@ -1,38 +1,306 @@
 from html import unescape
-import re 
+import re
+
+# Morceau "<..." absent de _OPS (attributs, majuscules, "<" du texte) : nom,
+# attributs (guillemets compris) et ">" ; sinon c'est du texte
+_TAG_REST = re.compile(r"(/?[a-zA-Z][a-zA-Z0-9]*)([^>\"']*(?:(?:\"[^\"]*\"|'[^']*')[^>\"']*)*)>")
+_OPEN_QUOTE = re.compile(r"/?[a-zA-Z][a-zA-Z0-9]*[^>\"']*(?:(?:\"[^\"]*\"|'[^']*')[^>\"']*)*([\"'])")
+_MARKUP = re.compile(r"<!--.*?-->|<![^>]*>|<\?[^>]*>", re.S)
+_HREF = re.compile(r"""(?<![-\w:.])href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+_ALT = re.compile(r"""(?<![-\w:.])alt\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+# motifs à préfixe littéral : la recherche saute directement aux candidats
+_SPACES = re.compile(r"  +")
+_NEWLINES = re.compile(r"\n\n\n+")
+_INDENT = "\0"   # indentation des listes imbriquées, protégée du nettoyage des espaces
+
+# fin de ligne déjà en place : _ensure_newlines(out, 1) n'aurait rien à faire
+_EOL = {"\n", "\n\n"}
+# Fins implicites : l'élément suivant, </tr> ou la fin de la liste les referment.
+# Retirées d'avance (str.replace) : autant de balises en moins dans la boucle.
+_IMPLIED_END = ("</li>", "</td>", "</th>")
+# Conteneur ouvert → traitement du texte : 1 = blancs de mise en page ignorés, 2 = cellule
+_CONTEXT = {"ul": 1, "ol": 1, "table": 1, "thead": 1, "tbody": 1, "tfoot": 1, "tr": 1, "td": 2, "th": 2}
+# Fin de bloc → sauts de ligne garantis après
+_BLOCK_END = {
+    "/p": "\n\n", "/div": "\n", "/blockquote": "\n\n", "/pre": "\n\n",
+    "/h1": "\n\n", "/h2": "\n\n", "/h3": "\n\n", "/h4": "\n\n", "/h5": "\n\n", "/h6": "\n\n",
+}
+# Texte exact entre < et > → opération ("" : balise sans effet sur la mise en page).
+# Les balises avec attributs ou en majuscules passent par _parse_tag.
+_OPS = {
+    "br": "br", "br/": "br", "br /": "br", "hr": "hr", "hr/": "hr", "hr /": "hr",
+    "ul": "list", "ol": "list", "li": "li", "td": "cell", "th": "cell", "tr": "tr",
+    "table": "table", "thead": "group", "tbody": "group", "tfoot": "group",
+    "a": "a", "/a": "/a", "img": "img",
+    "script": "skip", "style": "skip", "head": "skip", "title": "skip",
+    "/ul": "close", "/ol": "close", "/tr": "close", "/table": "close",
+    "/thead": "close", "/tbody": "close", "/tfoot": "close",
+    "/li": "", "/td": "", "/th": "",
+}
+_OPS.update(dict.fromkeys(_BLOCK_END, "end"))
+for _tag in ("p", "div", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "span", "strong", "b", "i",
+             "em", "u", "font", "small", "sup", "sub", "code", "center", "html", "body"):
+    _OPS.setdefault(_tag, "")
+    _OPS.setdefault("/" + _tag, "")
+# Avec attributs, ces balises lisent href / alt / le "/" final
+_WITH_ATTRS = {"a": "a+", "img": "img+", "skip": "skip+"}
+
+
+def _attr(pattern: re.Pattern, attrs: str) -> str | None:
+    m = pattern.search(attrs)
+    if m is None:
+        return None
+    return next(v for v in m.groups() if v is not None)
+
+
+def _ensure_newlines(out: list[str], n: int) -> None:
+    """Termine la ligne en cours : au moins `n` sauts de ligne, sans blancs avant (out[0] : sentinelle)."""
+    if len(out) < 2:
+        return
+    last = out[-1]
+    if last and last[-1] not in " \t\n":
+        out.append("\n" * n)   # cas courant : fin de texte
+        return
+    if last and last.count("\n") == len(last) >= n:
+        return                  # déjà fait (</ul></table>...)
+    nl = 0
+    while len(out) > 1:
+        last = out[-1]
+        stripped = last.rstrip(" \t\n")
+        nl += last.count("\n", len(stripped))
+        if stripped:
+            out[-1] = stripped
+            break
+        out.pop()
+    if len(out) > 1:
+        out.append("\n" * (n if n > nl else nl))
+
+
+def _parse_tag(chunk: str, it) -> tuple[str | None, str, str]:
+    """Morceau "<..." hors _OPS : (nom, attributs, texte qui suit), ou (None, "", texte)."""
+    m = _TAG_REST.match(chunk)
+    if m is None:
+        quote = _OPEN_QUOTE.match(chunk)
+        if quote is None:
+            return None, "", "<" + chunk
+        # '<' dans une valeur d'attribut : recolle les morceaux jusqu'au guillemet fermant
+        pieces = [chunk]
+        for piece in it:
+            pieces.append(piece)
+            if quote.group(1) in piece:
+                break
+        chunk = "<".join(pieces)
+        m = _TAG_REST.match(chunk)
+        if m is None:
+            return None, "", "<" + chunk
+    return m.group(1), m.group(2), chunk[m.end():]
+
+
+def _skip_block(it, name: str) -> str:
+    """Saute le contenu de <script>, <style>, <head>... ; renvoie le texte après la balise fermante."""
+    depth = 1
+    for chunk in it:
+        tag = chunk.partition(">")[0].split(None, 1)
+        tag = tag[0].lower() if tag else ""
+        if tag == name:
+            depth += 1
+        elif tag == "/" + name:
+            depth -= 1
+            if not depth:
+                return chunk.partition(">")[2]
+    return ""
+
 
 def html_to_text(html: str) -> str:
     """
-    Convertit un petit HTML de mail en texte lisible :
-    - <br> → \n
-    - </p> → \n\n
-    - <li> → "- "
-    - suppression des balises restantes
-    - unescape des entités (&eacute; -> é)
+    Convertit un HTML de mail en texte lisible, en un seul passage sur les
+    morceaux de html.split("<") :
+    - <br> → \n, fin de <p> → ligne vide, retours à la ligne du source gardés
+    - listes : "- " ou "1. ", indentées selon l'imbrication
+    - tableaux : une ligne par <tr>, cellules séparées par " | "
+    - liens : "texte (url)" quand l'url n'est pas déjà le texte
+    - script/style/head ignorés, autres balises supprimées
+    - unescape des entités (&eacute; -> é), espaces et lignes vides réduits
+    Même traitement quelle que soit la taille : un gros template rend la
+    concaténation des rendus de ses parties.
     """
+    if "<!" in html or "<?" in html:
+        html = _MARKUP.sub("", html)
+    for end in _IMPLIED_END:
+        html = html.replace(end, "")
+    it = iter(html.split("<"))
+    out: list[str] = ["\n", next(it)]   # "\n" : sentinelle, jamais retirée
+    stack: list[str] = []          # listes, éléments et tableaux ouverts
+    counters: list[int] = []       # numéro courant de chaque liste ouverte (0 = puces)
+    cells: list[int] = []          # cellules déjà ouvertes dans chaque <tr>
+    links: list[tuple[str | None, int]] = []
+    top = None                     # stack[-1]
+    ctx = 0                        # _CONTEXT[top]
+    fresh = False                  # début de puce / cellule : blancs de tête ignorés
+    start = 0                      # début de la cellule en cours dans out
 
-    # Normalise les retours à la ligne dans le HTML lui-même
-    text = html.replace("\r", "")
-
-    # Les blocs "visuels"
-    text = re.sub(r"<\s*br\s*/?>", "\n", text, flags=re.I)
-    text = re.sub(r"</\s*p\s*>", "\n\n", text, flags=re.I)
-    text = re.sub(r"<\s*p\s*>", "", text, flags=re.I)
-
-    # Listes
-    text = re.sub(r"<\s*li\s*>", "- ", text, flags=re.I)
-    text = re.sub(r"</\s*li\s*>", "\n", text, flags=re.I)
-    text = re.sub(r"</\s*ul\s*>", "\n", text, flags=re.I)
-    text = re.sub(r"</\s*ol\s*>", "\n", text, flags=re.I)
+    # noms locaux : la boucle tourne une fois par balise
+    append, ensure, get, eol, context = out.append, _ensure_newlines, _OPS.get, _EOL, _CONTEXT
 
-    # On vire toutes les autres balises
-    text = re.sub(r"<[^>]+>", "", text)
+    for chunk in it:
+        name, gt, text = chunk.partition(">")
+        op = get(name) if gt else None
+        if op is None:
+            name, attrs, text = _parse_tag(chunk, it)
+            if name is None:
+                op = ""
+            else:
+                op = get(name)
+                if op is None:
+                    name = name.lower()
+                    op = get(name, "")
+                if attrs.strip():
+                    op = _WITH_ATTRS.get(op, op)
 
-    # Decode &eacute;, &amp;, etc.
-    text = unescape(text)
+        if op:
+            if op == "close":
+                tag = name[1:]
+                if tag == top:
+                    stack.pop()
+                    if tag == "tr":
+                        cells.pop()
+                    elif tag == "ul" or tag == "ol":
+                        counters.pop()
+                elif tag in stack:
+                    # referme aussi ce qui a été laissé ouvert dedans
+                    while stack:
+                        closed = stack.pop()
+                        if closed == "ul" or closed == "ol":
+                            counters.pop()
+                        elif closed == "tr":
+                            cells.pop()
+                        if closed == tag:
+                            break
+                else:
+                    tag = None
+                if tag:
+                    top = stack[-1] if stack else None
+                    ctx = context.get(top, 0)
+                    fresh = False
+                    if tag == "tr":
+                        if out[-1] not in eol:
+                            ensure(out, 1)
+                    elif tag != "thead" and tag != "tbody" and tag != "tfoot":
+                        # ligne vide après la liste / le tableau le plus extérieur
+                        ensure(out, 1 if counters or "table" in stack else 2)
+            elif op == "li":
+                if out[-1][-1:] > " ":
+                    append("\n")
+                elif out[-1] not in eol:
+                    ensure(out, 1)
+                    if top == "li":
+                        out[-1] = "\n"   # fin implicite de l'élément précédent : pas de ligne vide
+                if top != "li":
+                    stack.append("li")
+                    top = "li"
+                    ctx = 0
+                if counters:
+                    indent = _INDENT * 2 * (len(counters) - 1)
+                    if counters[-1]:
+                        append(f"{indent}{counters[-1]}. ")
+                        counters[-1] += 1
+                    else:
+                        append(indent + "- ")
+                else:
+                    append("- ")
+                fresh = True
+            elif op == "cell":
+                if cells:
+                    if cells[-1]:
+                        # fin de la cellule précédente : blancs retirés, puis séparateur
+                        while len(out) > start and out[-1].isspace():
+                            out.pop()
+                        out[-1] = out[-1].rstrip(" \t")
+                        append(" | ")
+                    cells[-1] += 1
+                if ctx == 2:
+                    stack[-1] = name
+                else:
+                    stack.append(name)
+                    ctx = 2
+                top = name
+                fresh = True
+                start = len(out)
+            elif op == "end":
+                if out[-1][-1:] > " ":
+                    append(_BLOCK_END[name])
+                else:
+                    ensure(out, len(_BLOCK_END[name]))
+            elif op == "tr":
+                if out[-1][-1:] > " ":
+                    append("\n")
+                elif out[-1] not in eol:
+                    ensure(out, 1)
+                stack.append("tr")
+                cells.append(0)
+                top = "tr"
+                ctx = 1
+            elif op == "br":
+                append("\n")
+            elif op == "a" or op == "a+":
+                links.append((_attr(_HREF, attrs) if op == "a+" else None, len(out)))
+            elif op == "/a":
+                if links:
+                    href, at = links.pop()
+                    label = "".join(out[at:]).strip()
+                    if href and not href.startswith("#") and href not in (label, "mailto:" + label):
+                        append(f" ({href})")
+            elif op == "list":
+                if out[-1] not in eol:
+                    ensure(out, 1)
+                stack.append(name)
+                counters.append(1 if name == "ol" else 0)
+                top = name
+                ctx = 1
+            elif op == "table" or op == "group":
+                if op == "table" and out[-1] not in eol:
+                    ensure(out, 1)
+                stack.append(name)
+                top = name
+                ctx = 1
+            elif op == "img+":
+                append(_attr(_ALT, attrs) or "")
+            elif op == "hr":
+                if out[-1] not in eol:
+                    ensure(out, 1)
+            elif op == "skip" or (op == "skip+" and not attrs.rstrip().endswith("/")):
+                text = _skip_block(it, name)
 
-    # Nettoyage espaces & sauts de ligne
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+        if not text:
+            continue
+        if ctx:
+            if ctx == 1:
+                if text.isspace():
+                    continue   # mise en page du source entre deux balises de structure
+            else:
+                text = text.replace("\n", " ")
+        if fresh:
+            text = text.lstrip()
+            if not text:
+                continue
+            fresh = False
+        elif text.isspace() and out[-1][-1:] == "\n":
+            continue   # rien à ajouter en début de ligne
+        append(text)
 
+    # Nettoyage final : un passage C chacun, seulement si nécessaire
+    text = "".join(out)
+    if "\r" in text:
+        text = text.replace("\r", "")
+    if "&" in text:
+        text = unescape(text)
+    if "\t" in text:
+        text = text.replace("\t", " ")
+    if "  " in text:
+        text = _SPACES.sub(" ", text)
+    text = text.replace(" \n", "\n").replace("\n ", "\n")
+    if "\n\n\n" in text:
+        text = _NEWLINES.sub("\n\n", text)
+    if _INDENT in text:
+        text = text.replace(_INDENT, " ")
     return text.strip()
@@ -0,0 +1,93 @@
+# folder_cache.py
+
+import os
+import json
+import time
+import threading
+
+from config import Config
+from icecream import ic
+ic.disable()
+
+# Réponses APPEND indiquant que le dossier résolu n'existe plus (renommé/supprimé)
+STALE_FOLDER_CODES = ("TRYCREATE", "NONEXISTENT")
+
+
+def is_stale_folder_error(err: str | None) -> bool:
+    return bool(err) and any(code in err.upper() for code in STALE_FOLDER_CODES)  # type: ignore[union-attr]
+
+
+class FolderCache:
+    """
+    Cache de résolution des dossiers IMAP, clé = (host, user, cible).
+
+    Garde le résultat brut de LIST et les dossiers résolus ('Envoyés',
+    Mailbox_name...) pour éviter de relister et rescorer tous les dossiers à
+    chaque message. Persisté dans un petit fichier JSON à côté du .env, avec
+    une durée de validité (TTL).
+    """
+
+    def __init__(self, path: str | None, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: dict = {}
+        self._load()
+
+    @classmethod
+    def from_config(cls, config: Config) -> "FolderCache":
+        return cls(config.imap.folder_cache_path, config.imap.folder_cache_ttl)
+
+    # ------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------
+
+    def _load(self) -> None:
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except Exception as e:
+            ic(f"[IMAP] cache dossiers illisible, ignoré: {e}")
+            self._data = {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            ic(f"[IMAP] cache dossiers non enregistré: {e}")
+
+    # ------------------------------------------------------------
+    # Accès
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _account(host: str, user: str) -> str:
+        return f"{host.lower()}|{user.lower()}"
+
+    def get(self, host: str, user: str, target: str):
+        """Valeur mise en cache pour `target`, ou None si absente / expirée."""
+        with self._lock:
+            entry = self._data.get(self._account(host, user), {}).get(target)
+        if not entry or time.time() - entry["t"] > self.ttl:
+            return None
+        return entry["value"]
+
+    def set(self, host: str, user: str, target: str, value) -> None:
+        with self._lock:
+            account = self._data.setdefault(self._account(host, user), {})
+            account[target] = {"t": time.time(), "value": value}
+            self._save()
+
+    def invalidate(self, host: str, user: str) -> None:
+        """Oublie tout ce qui concerne ce compte (un dossier a été renommé)."""
+        with self._lock:
+            if self._data.pop(self._account(host, user), None) is not None:
+                ic(f"[IMAP] cache dossiers invalidé pour {user}@{host}")
+                self._save()
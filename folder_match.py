@@ -0,0 +1,143 @@
+# folder_match.py
+
+import heapq
+import threading
+import unicodedata
+import re
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+
+# Préfixe de la boîte de réception (« INBOX/APA », « INBOX.APA »...) et séparateurs
+_INBOX_PREFIX = re.compile(r"^inbox(?:[/.\\]+|$)")
+_DELIMITERS = re.compile(r"[\s/.\\_\-|:]+")
+
+
+def normalize(name: str) -> str:
+    """
+    Clé de comparaison d'un nom de dossier : minuscules, sans accents, sans
+    préfixe INBOX, séparateurs (/ . _ - espaces...) réduits à un espace.
+    « INBOX/Envoyés » → « envoyes ».
+    """
+    text = unicodedata.normalize("NFKD", name.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _INBOX_PREFIX.sub("", text)
+    return _DELIMITERS.sub(" ", text).strip()
+
+
+class FolderMatcher:
+    """
+    Index n-grammes (trigrammes par défaut) des noms de dossiers, normalisés
+    une seule fois. Une recherche ne parcourt que les dossiers qui partagent
+    au moins un n-gramme avec la requête, garde les `shortlist` meilleurs
+    (coefficient de Dice) et les départage avec SequenceMatcher, comme avant
+    mais sur les noms normalisés.
+    """
+
+    def __init__(self, folders: list[str], n: int = 3, shortlist: int = 16):
+        self.folders = list(folders)
+        self.n = n
+        self.shortlist = shortlist
+        self.keys = [normalize(f) for f in self.folders]
+
+        self._raw: dict[str, int] = {}     # nom en minuscules → premier index
+        self._exact: dict[str, int] = {}   # clé normalisée → premier index
+        self._sizes: list[int] = []        # nombre de n-grammes de chaque clé
+        self._index: dict[str, list[int]] = {}
+        for i, (folder, key) in enumerate(zip(self.folders, self.keys)):
+            self._raw.setdefault(folder.lower(), i)
+            self._exact.setdefault(key, i)
+            grams = self._ngrams(key)
+            self._sizes.append(len(grams))
+            for g in grams:
+                self._index.setdefault(g, []).append(i)
+
+    def _ngrams(self, key: str) -> set[str]:
+        padded = f" {key} "
+        if len(padded) <= self.n:
+            return {padded}
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def _candidates(self, key: str) -> list[int]:
+        grams = self._ngrams(key)
+        counts: Counter = Counter()
+        for g in grams:
+            postings = self._index.get(g)
+            if postings:
+                counts.update(postings)
+        q, sizes = len(grams), self._sizes
+        return heapq.nlargest(
+            self.shortlist, counts,
+            key=lambda i: (2 * counts[i] / (q + sizes[i]), -i),
+        )
+
+    def search(self, query: str, limit: int = 1) -> list[tuple[str, float]]:
+        """Les `limit` dossiers les plus proches de `query`, avec leur score (0..1)."""
+        if not self.folders:
+            return []
+        hit = self._raw.get(query.lower())
+        key = normalize(query)
+        if hit is None:
+            hit = self._exact.get(key)
+        if hit is not None and limit == 1:
+            return [(self.folders[hit], 1.0)]
+
+        candidates = self._candidates(key)
+        if hit is not None and hit not in candidates:
+            candidates.append(hit)
+        if not candidates:
+            # aucun n-gramme commun : on retombe sur le parcours complet
+            candidates = range(len(self.folders))
+        # la requête en seq2 : SequenceMatcher n'analyse qu'une fois son côté
+        by_key, by_raw = SequenceMatcher(None, "", key), SequenceMatcher(None, "", query.lower())
+        scored: list[tuple[float, float, int]] = []   # tas des `limit` meilleurs
+        for i in candidates:
+            by_key.set_seq1(self.keys[i])
+            if i == hit:
+                score = 1.0
+            else:
+                # bornes supérieures bon marché : on saute ce qui ne peut pas entrer
+                floor = scored[0][0] if len(scored) >= limit else 0.0
+                if by_key.real_quick_ratio() < floor or by_key.quick_ratio() < floor:
+                    continue
+                score = by_key.ratio()
+            by_raw.set_seq1(self.folders[i].lower())
+            item = (score, by_raw.ratio(), -i)
+            if len(scored) < limit:
+                heapq.heappush(scored, item)
+            elif item > scored[0]:
+                heapq.heapreplace(scored, item)
+        scored.sort(reverse=True)
+        return [(self.folders[-i], score) for score, _, i in scored]
+
+    def best(self, *queries: str) -> tuple[str | None, float]:
+        """Meilleur dossier pour l'une des requêtes (alias) : (dossier, score)."""
+        best: tuple[str | None, float] = (None, 0.0)
+        for query in queries:
+            for folder, score in self.search(query, 1):
+                if score > best[1]:
+                    best = (folder, score)
+            if best[1] >= 1.0:
+                break
+        return best
+
+
+# Index des dernières listes de dossiers vues (une par compte, en pratique)
+_MATCHERS: "OrderedDict[tuple[str, ...], FolderMatcher]" = OrderedDict()
+_MATCHERS_LOCK = threading.Lock()
+_MATCHERS_MAX = 4
+
+
+def matcher_for(folders: list[str]) -> FolderMatcher:
+    """FolderMatcher de cette liste de dossiers, construit une seule fois."""
+    key = tuple(folders)
+    with _MATCHERS_LOCK:
+        matcher = _MATCHERS.get(key)
+        if matcher is not None:
+            _MATCHERS.move_to_end(key)
+            return matcher
+    matcher = FolderMatcher(list(key))
+    with _MATCHERS_LOCK:
+        _MATCHERS[key] = matcher
+        while len(_MATCHERS) > _MATCHERS_MAX:
+            _MATCHERS.popitem(last=False)
+    return matcher
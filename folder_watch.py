@@ -0,0 +1,268 @@
+# folder_watch.py
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from icecream import ic
+ic.disable()
+
+# Fichiers en cours d'écriture / de copie : le dossier n'est pas encore complet
+PARTIAL_PREFIXES = ("~$", ".~lock")
+PARTIAL_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload", ".download", ".!ut")
+
+
+def is_partial(name: str) -> bool:
+    low = name.lower()
+    return low.startswith(PARTIAL_PREFIXES) or low.endswith(PARTIAL_SUFFIXES)
+
+
+def folder_state(path: str) -> tuple[tuple, bool]:
+    """
+    (signature, en_cours) d'un dossier de protégé : fichiers (nom, taille,
+    date) triés, et vrai si un fichier partiel y traîne encore.
+    """
+    files, partial = [], False
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                if not e.is_file():
+                    continue
+                if is_partial(e.name):
+                    partial = True
+                    continue
+                st = e.stat()
+                files.append((e.name, st.st_size, st.st_mtime_ns))
+    except FileNotFoundError:
+        pass
+    return tuple(sorted(files)), partial
+
+
+def _subfolders(root: str) -> list[str]:
+    try:
+        with os.scandir(root) as it:
+            return sorted(e.name for e in it if e.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+# --------------------------------------------------------------------
+# Surveillance : inotify (Linux) ou parcours périodique
+# --------------------------------------------------------------------
+
+# <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_ROOT_MASK = IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_FOLDER_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """inotify via la libc (ctypes) : un watch sur la racine, un par dossier de protégé."""
+
+    def __init__(self, root: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.root = root
+        self._names: dict[int, str | None] = {}   # wd → protégé (None = racine)
+        self._watch(root, None, _ROOT_MASK)
+        for name in _subfolders(root):
+            self._watch(os.path.join(root, name), name, _FOLDER_MASK)
+
+    def _watch(self, path: str, name: str | None, mask: int) -> None:
+        wd = self._add(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if name is None or err != errno.ENOENT:
+                raise OSError(err, f"inotify_add_watch {path}")
+            return  # dossier déjà reparti
+        self._names[wd] = name
+
+    def wait(self, timeout: float) -> set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: set[str] = set()
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+            raw = buf[offset + _EVENT.size: offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # événements perdus : on repart de l'état complet
+                changed.update(_subfolders(self.root))
+                continue
+            if mask & IN_IGNORED:
+                self._names.pop(wd, None)
+                continue
+            if wd not in self._names:
+                continue
+            name = self._names[wd]
+            if name is not None:
+                changed.add(name)
+            elif mask & IN_ISDIR:
+                child = os.fsdecode(raw)
+                changed.add(child)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch(os.path.join(self.root, child), child, _FOLDER_MASK)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _Polling:
+    """Repli portable : un parcours os.scandir de chaque dossier toutes les `interval` s."""
+
+    def __init__(self, root: str, interval: float):
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._scanned = time.monotonic()
+
+    def _scan(self) -> dict[str, tuple]:
+        return {name: folder_state(os.path.join(self.root, name)) for name in _subfolders(self.root)}
+
+    def wait(self, timeout: float) -> set[str]:
+        # au plus un parcours par intervalle, quelle que soit la fréquence des appels
+        time.sleep(min(timeout, max(0.0, self._scanned + self.interval - time.monotonic())))
+        if time.monotonic() - self._scanned < self.interval:
+            return set()
+        before, self._snapshot = self._snapshot, self._scan()
+        self._scanned = time.monotonic()
+        return {name for name in before.keys() | self._snapshot.keys() if before.get(name) != self._snapshot.get(name)}
+
+    def close(self) -> None:
+        pass
+
+
+class FolderWatcher:
+    """
+    Signale les dossiers de protégés modifiés sous `root`.
+    backend : "inotify" (Linux, réveil immédiat, aucun parcours), "poll"
+    (parcours toutes les `poll_interval` s, partout) ou "auto" (inotify si
+    disponible, sinon poll).
+    """
+
+    def __init__(self, root: str, backend: str = "auto", poll_interval: float = 5.0):
+        self.root = root
+        self._impl: _Inotify | _Polling | None = None
+        if backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                self._impl = _Inotify(root)
+            except (OSError, AttributeError) as e:
+                if backend == "inotify":
+                    raise
+                ic(f"[watch] inotify indisponible ({e}), parcours périodique")
+        elif backend == "inotify":
+            raise OSError(errno.ENOSYS, "inotify indisponible sur cette plate-forme")
+        if self._impl is None:
+            self._impl = _Polling(root, poll_interval)
+        self.backend = "inotify" if isinstance(self._impl, _Inotify) else "poll"
+
+    def folders(self) -> list[str]:
+        return _subfolders(self.root)
+
+    def wait(self, timeout: float) -> set[str]:
+        """Dossiers modifiés depuis l'appel précédent (ensemble vide au bout de `timeout` s)."""
+        return self._impl.wait(max(0.0, timeout))  # type: ignore[union-attr]
+
+    def close(self) -> None:
+        self._impl.close()  # type: ignore[union-attr]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --------------------------------------------------------------------
+# Dossiers « complets et stables »
+# --------------------------------------------------------------------
+
+class StableFolders:
+    """
+    Décide quand un dossier de protégé peut partir : il contient des
+    fichiers, aucun fichier partiel, et rien n'y a bougé depuis `settle` s.
+    Un dossier déjà envoyé avec exactement ce contenu n'est pas reproposé.
+    """
+
+    def __init__(self, root: str, settle: float = 60.0):
+        self.root = root
+        self.settle = settle
+        self._pending: dict[str, tuple[tuple | None, float]] = {}   # nom → (signature, stable depuis)
+        self._sent: dict[str, tuple] = {}
+        self._retry_at: dict[str, float] = {}
+
+    def touch(self, *names: str) -> None:
+        """Dossiers à (re)vérifier : nouveaux ou modifiés."""
+        now = time.monotonic()
+        for name in names:
+            self._pending[name] = (None, now)
+
+    def ready(self, now: float | None = None) -> list[str]:
+        """Dossiers prêts à partir maintenant (retirés de l'attente)."""
+        now = time.monotonic() if now is None else now
+        out = []
+        for name, (signature, since) in list(self._pending.items()):
+            if self._retry_at.get(name, 0) > now:
+                continue
+            current, partial = folder_state(os.path.join(self.root, name))
+            if current != signature:
+                self._pending[name] = (current, now)   # a bougé : on repart pour `settle` s
+                continue
+            if partial or now - since < self.settle:
+                continue
+            del self._pending[name]
+            if current and self._sent.get(name) != current:
+                out.append(name)
+        return sorted(out)
+
+    def next_check(self, now: float | None = None, cap: float = 2.0) -> float:
+        """Délai avant la prochaine vérification utile (au plus `cap` s)."""
+        now = time.monotonic() if now is None else now
+        delays = [max(since + self.settle, self._retry_at.get(name, 0)) - now for name, (_, since) in self._pending.items()]
+        return max(0.0, min([cap] + delays))
+
+    def sent(self, names: list[str]) -> None:
+        for name in names:
+            self._sent[name], _ = folder_state(os.path.join(self.root, name))
+            self._retry_at.pop(name, None)
+
+    def retry(self, names: list[str], delay: float) -> None:
+        """Échecs : on réessaiera dans `delay` s, même sans changement du dossier."""
+        now = time.monotonic()
+        for name in names:
+            self._retry_at[name] = now + delay
+            self.touch(name)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
@@ -2,11 +2,14 @@ import imaplib
 import imap_tools
 from imap_tools.mailbox import MailBox
 import os
+import re
 import time
 from difflib import SequenceMatcher
+from folder_match import matcher_for
 from Email import *
 
 from config import Config 
+from imap_watch import MailboxWatcher
 from icecream import ic
 ic.disable()
 
@@ -21,20 +24,35 @@ def imap_login(server: str, username: str, password: str) -> imaplib.IMAP4_SSL:
     return imap
 
 
-def imap_list_folders(server: str, username: str, password: str) -> list[str]:
-    """Retourne une liste propre des dossiers IMAP."""
+_LIST_RE = re.compile(r'\((?P<flags>[^)]*)\) (?P<delim>"[^"]*"|NIL) (?P<name>.+)$')
+
+
+def parse_list_response(data) -> list[str]:
+    """Extrait les noms de dossiers d'une réponse LIST brute."""
+    folders = []
+    for d in data or []:
+        try:
+            line = d.decode() if isinstance(d, (bytes, bytearray)) else str(d)
+            m = _LIST_RE.match(line)
+            if m:
+                folders.append(m.group("name").strip('"'))
+        except Exception:
+            pass
+    return folders
+
+
+def imap_list_folders(server: str, username: str, password: str, session=None) -> list[str]:
+    """
+    Retourne une liste propre des dossiers IMAP.
+    Si `session` (IMAPSession) est fourni, réutilise sa connexion.
+    """
+    if session is not None:
+        return session.list_folders()
+
     imap = imap_login(server, username, password)
 
     typ, data = imap.list()
-    folders = []
-    if typ == "OK":
-        for d in data:
-            try:
-                parts = d.decode().split(' "/" ') #type:ignore
-                if len(parts) == 2:
-                    folders.append(parts[1].strip('"'))
-            except:
-                pass
+    folders = parse_list_response(data) if typ == "OK" else []
 
     imap.logout()
     return folders
@@ -50,36 +68,54 @@ def similarity(a: str, b: str) -> float:
 
 def find_closest_folder(target: str, folders: list[str]):
     """Retourne (best_folder, score)."""
-    scores = [(f, similarity(f, target)) for f in folders]
-    scores.sort(key=lambda x: x[1], reverse=True)
-    return scores[0] if scores else (None, 0)
+    best, score = matcher_for(folders).best(target)
+    return (best, score) if best is not None else (None, 0)
 
 
-def find_best_folder(target_name: str, MAIL_PASSWORD: str, MAIL_USERNAME: str, IMAP_SERVER: str):
+def find_best_folder(target_name: str, MAIL_PASSWORD: str, MAIL_USERNAME: str, IMAP_SERVER: str, session=None):
     """
     Return the folder name on the server that is closest to `target_name`
-    based on string similarity.
+    based on string similarity (normalized names, see folder_match).
+    If `session` (IMAPSession) is given, its connection and folder cache are reused.
     """
-    best_folder = None
-    best_score = 0.0
-    target = target_name.lower()
-
-    with imap_tools.mailbox.MailBox(IMAP_SERVER).login(MAIL_USERNAME, MAIL_PASSWORD) as mb:  # no need to specify "Inbox" here
-        for folder in mb.folder.list():
-            folder_name = folder.name
-            score = SequenceMatcher(None, target, folder_name.lower()).ratio()
-
-            if score > best_score:
-                best_score = score
-                best_folder = folder_name
+    cache_key = f"best:{target_name}"
+    if session is not None:
+        cached = session.cached(cache_key)
+        if cached is not None:
+            return tuple(cached)
+
+    if session is not None:
+        folder_names = session.list_folders()
+    else:
+        with imap_tools.mailbox.MailBox(IMAP_SERVER).login(MAIL_USERNAME, MAIL_PASSWORD) as mb:  # no need to specify "Inbox" here
+            folder_names = [folder.name for folder in mb.folder.list()]
+
+    # index n-grammes construit une fois par liste de dossiers (folder_match)
+    best_folder, best_score = matcher_for(folder_names).best(target_name)
     best_folder = "" if best_folder is None else best_folder
+    if session is not None and best_folder:
+        session.remember(cache_key, [best_folder, best_score])
     return best_folder, best_score
 
-def find_sent_folder(server: str, username: str, password: str, folder_suggestion: str | None = None):
+def find_sent_folder(server: str, username: str, password: str, folder_suggestion: str | None = None, session=None):
     """
     Trouve le dossier 'Envoyés' / 'Sent' / 'Outbox' le plus probable.
     Retourne : (folder, score, alias_used)
+    Avec une `session`, le résultat est mis en cache (FolderCache).
     """
+    cache_key = f"sent:{folder_suggestion or ''}"
+    if session is not None:
+        cached = session.cached(cache_key)
+        if cached is not None:
+            return tuple(cached)
+
+    found = _find_sent_folder(server, username, password, folder_suggestion, session)
+    if session is not None and found[0]:
+        session.remember(cache_key, list(found))
+    return found
+
+
+def _find_sent_folder(server: str, username: str, password: str, folder_suggestion: str | None, session):
     candidates = [
         "Sent", "Envoyés", "Envoyes", "Envoye", "Envoyer",
         "Outbox", "Sent Items", "Boîte d'envoi", "Envoyé"
@@ -87,18 +123,15 @@ def find_sent_folder(server: str, username: str, password: str, folder_suggestio
     if folder_suggestion is not None:
         candidates.append(folder_suggestion)
 
-    folders = imap_list_folders(server, username, password)
+    folders = imap_list_folders(server, username, password, session=session)
 
     # recherche directe d'après alias
     for c in candidates:
         if c in folders:
             return c, 1.0, c
 
-    # sinon, score sur tous
-    scored = [(fold, max(similarity(fold, c) for c in candidates)) for fold in folders]
-    scored.sort(key=lambda x: x[1], reverse=True)
-
-    best, score = scored[0]
+    # sinon, meilleur dossier pour l'un des alias (index n-grammes)
+    best, score = matcher_for(folders).best(*candidates)
     return best, score, best
 
 
@@ -106,14 +139,18 @@ def find_sent_folder(server: str, username: str, password: str, folder_suggestio
 # AJOUT MESSAGE
 # -----------------------------------------------------------
 
-def add_email_to_box(server: str, username: str, password: str, mailbox: str, raw_msg: bytes):
+def add_email_to_box(server: str, username: str, password: str, mailbox: str, raw_msg: bytes, session=None):
     """
     Ajoute un email dans un dossier IMAP.
     mailbox doit être un string (PAS tuple).
+    Si `session` (IMAPSession) est fourni, l'APPEND passe par sa connexion.
     """
     if isinstance(mailbox, tuple):
         mailbox = mailbox[0]
 
+    if session is not None:
+        return session.append(mailbox, raw_msg)
+
     imap = imap_login(server, username, password)
 
     try:
@@ -150,49 +187,20 @@ def wait_for_email(
 ) -> bool:
     """
     Attend qu'un email avec un sujet donné apparaisse dans un dossier IMAP.
+    Une seule connexion : IDLE si disponible, sinon polling incrémental
+    (UID >= UIDNEXT), recherche du sujet côté serveur.
     Retourne True si trouvé, False sinon.
     """
     end = time.time() + timeout
 
     while time.time() < end:
         try:
-            imap = imap_login(server, username, password)
-            imap.select(box, readonly=True)
-
-            typ, data = imap.search(None, 'UNSEEN')
-            if typ == "OK" and data and data[0]:
-                for msgid in data[0].split():
-                    typ2, msg_data = imap.fetch(msgid, '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
-                    # Vérifications robustes sur msg_data
-                    if typ2 != "OK" or not msg_data:
-                        continue
-
-                    first = msg_data[0]
-
-                    # Certains serveurs renvoient None, ou un élément non tuple
-                    if not isinstance(first, tuple) or len(first) < 2:
-                        continue
-
-                    raw_header = first[1]
-                    if raw_header is None:
-                        continue
-
-                    # Décodage sûr
-                    if isinstance(raw_header, (bytes, bytearray)):
-                        header = raw_header.decode(errors="ignore")
-                    else:
-                        header = str(raw_header)
-
-                    if subject.lower() in header.lower():
-                        imap.logout()
-                        return True
-
-            imap.logout()
-
-        except Exception:
-            pass
-
-        time.sleep(interval)
+            with MailboxWatcher(server, username, password, box) as watcher:
+                return watcher.wait_for_subject(subject, timeout=end - time.time(), interval=interval)
+        except Exception as e:
+            # connexion perdue : on se reconnecte tant qu'il reste du temps
+            ic(f"[IMAP] attente interrompue: {e}")
+            time.sleep(interval)
 
     return False
 
@@ -0,0 +1,349 @@
+# imap_session.py
+
+import re
+import time
+import queue
+import socket
+import imaplib
+import threading
+
+from config import Config
+from imap_handler import parse_list_response
+from folder_cache import FolderCache, is_stale_folder_error
+from mime_stream import SpooledMessage
+from icecream import ic
+ic.disable()
+
+# Erreurs après lesquelles la connexion est considérée perdue (BYE, timeout, reset)
+RECOVERABLE = (imaplib.IMAP4.abort, socket.timeout, OSError)
+
+# Réponse UIDPLUS (RFC 4315) à un APPEND : « [APPENDUID <uidvalidity> <uid>] »
+_APPENDUID = re.compile(rb"\[APPENDUID \d+ (\d+)\]", re.IGNORECASE)
+
+
+def parse_appenduid(data) -> int | None:
+    """UID attribué par le serveur à un APPEND réussi (None sans UIDPLUS)."""
+    for item in data or ():
+        m = _APPENDUID.search(item if isinstance(item, bytes) else str(item).encode())
+        if m:
+            return int(m.group(1))
+    return None
+
+
+def _quote_mailbox(mailbox: str) -> bytes:
+    return ('"' + mailbox.replace("\\", "\\\\").replace('"', '\\"') + '"').encode("utf-8")
+
+
+class _SpoolLiteral:
+    """Littéral d'APPEND écrit depuis le spool, à la demande d'imaplib (voir _append_stream)."""
+
+    def __init__(self, imap: imaplib.IMAP4, spooled: SpooledMessage):
+        self.imap = imap
+        self.spooled = spooled
+
+    def write(self, continuation: bytes) -> bytes:
+        for chunk in self.spooled.chunks():
+            self.imap.send(chunk)
+        return b""   # imaplib n'envoie plus que la fin de ligne
+
+
+def _append_stream(imap: imaplib.IMAP4, mailbox: str, date_time: str, spooled: SpooledMessage):
+    """
+    APPEND dont le littéral est lu depuis le spool, par morceaux :
+    imaplib.append exige le message complet en bytes (et en refait une copie).
+
+    Seul contournement d'imaplib du module : comme pour AUTHENTICATE, le
+    littéral est une méthode qu'imaplib appelle à la réponse « + » (attribut
+    `literal`), et la taille « {n} » est annoncée par nous. Étiquette,
+    réponses ([APPENDUID]...) et erreurs restent gérées par imaplib.
+    """
+    imap.literal = _SpoolLiteral(imap, spooled).write  # type: ignore[attr-defined]
+    return imap.xatom("APPEND", _quote_mailbox(mailbox), f"{date_time} {{{spooled.size}}}")
+
+
+def _appenduid(imap: imaplib.IMAP4) -> int | None:
+    """UID du message créé par le dernier APPEND (code [APPENDUID], RFC 4315) ; None sans UIDPLUS."""
+    _, codes = imap.response("APPENDUID")
+    last = codes[-1] if codes else None
+    return int(last.split()[1]) if last else None
+
+
+class _Slot:
+    """Une connexion IMAP authentifiée + le dossier actuellement sélectionné."""
+
+    def __init__(self):
+        self.imap: imaplib.IMAP4 | None = None
+        self.selected: tuple[str, bool] | None = None
+
+
+class IMAPSession:
+    """
+    Une (ou quelques) connexion(s) IMAP authentifiée(s), ouvertes pour tout un
+    run et partagées par les workers.
+
+    - chaque commande s'exécute sur une connexion empruntée : deux threads ne
+      parlent jamais en même temps sur la même socket
+    - SELECT n'est renvoyé que si le dossier demandé change
+    - sur BYE / timeout / reset, la connexion est rouverte et la commande
+      rejouée une fois ; APPEND et COPY ne sont pas rejoués à l'aveugle :
+      le Message-ID est d'abord cherché dans le dossier (UID SEARCH)
+    - LIST et les dossiers résolus passent par `folders` (FolderCache)
+    """
+
+    def __init__(
+        self,
+        server: str,
+        username: str,
+        password: str,
+        size: int = 1,
+        timeout: float = 60,
+        folders: FolderCache | None = None,
+    ):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.folders = folders
+
+        self._slots: queue.Queue[_Slot] = queue.Queue()
+        for _ in range(max(1, size)):
+            self._slots.put(_Slot())
+        self._all = list(self._slots.queue)
+        self._lock = threading.Lock()
+
+        self.stats = {"logins": 0, "commands": 0, "selects": 0, "reconnects": 0}
+
+    @classmethod
+    def from_config(cls, config: Config) -> "IMAPSession":
+        return cls(
+            config.imap.host,
+            config.identity.email,
+            config.identity.email_pwd,
+            size=config.imap.sessions,
+            folders=FolderCache.from_config(config),
+        )
+
+    # ------------------------------------------------------------
+    # Connexions
+    # ------------------------------------------------------------
+
+    def _connect(self, slot: _Slot) -> imaplib.IMAP4:
+        imap = imaplib.IMAP4_SSL(self.server, timeout=self.timeout)
+        imap.login(self.username, self.password)
+        slot.imap = imap
+        slot.selected = None
+        with self._lock:
+            self.stats["logins"] += 1
+        return imap
+
+    @staticmethod
+    def _drop(slot: _Slot) -> None:
+        imap, slot.imap, slot.selected = slot.imap, None, None
+        if imap is None:
+            return
+        try:
+            imap.logout()
+        except Exception:
+            try:
+                imap.shutdown()
+            except Exception:
+                pass
+
+    def _select(self, slot: _Slot, mailbox: str, readonly: bool) -> None:
+        if slot.selected == (mailbox, readonly):
+            return
+        typ, data = slot.imap.select(mailbox, readonly=readonly)  # type: ignore[union-attr]
+        if typ != "OK":
+            slot.selected = None
+            raise imaplib.IMAP4.error(f"SELECT {mailbox} failed: {data}")
+        slot.selected = (mailbox, readonly)
+        with self._lock:
+            self.stats["selects"] += 1
+
+    # ------------------------------------------------------------
+    # Exécution
+    # ------------------------------------------------------------
+
+    def run(self, fn, mailbox: str | None = None, readonly: bool = False, replay: bool = True):
+        """
+        Exécute fn(imap) sur une connexion de la session.
+        Si `mailbox` est donné, il est sélectionné au préalable (si besoin).
+        replay=False : commande qui modifie la boîte (APPEND, COPY) ; si la
+        connexion tombe pendant fn, l'erreur remonte sans rejouer (le serveur
+        a peut-être exécuté la commande).
+        """
+        slot = self._slots.get()
+        try:
+            for attempt in range(2):
+                started = False
+                try:
+                    imap = slot.imap or self._connect(slot)
+                    if mailbox is not None:
+                        self._select(slot, mailbox, readonly)
+                    with self._lock:
+                        self.stats["commands"] += 1
+                    started = True
+                    return fn(imap)
+                except RECOVERABLE as e:
+                    self._drop(slot)
+                    if attempt or (started and not replay):
+                        raise
+                    with self._lock:
+                        self.stats["reconnects"] += 1
+                    ic(f"[IMAP] connexion perdue ({e}), reconnexion")
+        finally:
+            self._slots.put(slot)
+
+    # ------------------------------------------------------------
+    # Cache des dossiers
+    # ------------------------------------------------------------
+
+    def cached(self, target: str):
+        if self.folders is None:
+            return None
+        return self.folders.get(self.server, self.username, target)
+
+    def remember(self, target: str, value) -> None:
+        if self.folders is not None:
+            self.folders.set(self.server, self.username, target, value)
+
+    def forget_folders(self) -> None:
+        if self.folders is not None:
+            self.folders.invalidate(self.server, self.username)
+
+    # ------------------------------------------------------------
+    # Commandes
+    # ------------------------------------------------------------
+
+    def list_folders(self) -> list[str]:
+        folders = self.cached("LIST")
+        if folders is not None:
+            return folders
+        typ, data = self.run(lambda imap: imap.list())
+        folders = parse_list_response(data) if typ == "OK" else []
+        if folders:
+            self.remember("LIST", folders)
+        return folders
+
+    def append(self, mailbox: str, raw_msg: "bytes | SpooledMessage", message_id: str | None = None) -> str | None:
+        """
+        APPEND dans `mailbox`. Retourne None si OK, sinon un message d'erreur.
+        Un SpooledMessage est envoyé par morceaux (pas de copie en mémoire).
+        """
+        return self.append_uid(mailbox, raw_msg, message_id)[0]
+
+    def append_uid(
+        self, mailbox: str, raw_msg: "bytes | SpooledMessage", message_id: str | None = None,
+    ) -> tuple[str | None, int | None]:
+        """
+        append, plus l'UID du message créé (APPENDUID) si le serveur le donne.
+        Connexion perdue pendant l'APPEND : le message n'est renvoyé que si
+        `message_id` est donné et introuvable dans `mailbox`.
+        """
+        if isinstance(mailbox, tuple):
+            mailbox = mailbox[0]
+        date_time = imaplib.Time2Internaldate(time.time())
+
+        def command(imap):
+            if isinstance(raw_msg, SpooledMessage):
+                typ, data = _append_stream(imap, mailbox, date_time, raw_msg)
+            else:
+                typ, data = imap.append(mailbox, "", date_time, raw_msg)
+            return typ, data, _appenduid(imap) if typ == "OK" else None
+
+        try:
+            try:
+                typ, data, uid = self.run(command, replay=False)
+            except RECOVERABLE as e:
+                found = self._find_after_loss(e, mailbox, message_id)
+                if found is not None:
+                    return None, found
+                typ, data, uid = self.run(command, replay=False)
+        except Exception as e:
+            if is_stale_folder_error(str(e)):
+                self.forget_folders()
+            return str(e), None
+        if typ != "OK":
+            err = f"IMAP append failed: {typ} {data}"
+            if is_stale_folder_error(err):
+                self.forget_folders()
+            return err, None
+        return None, uid
+
+    def copy_uid(self, source: str, uid: int, mailbox: str, message_id: str | None = None) -> str | None:
+        """
+        UID COPY d'un message de `source` vers `mailbox`, côté serveur (rien
+        n'est renvoyé sur le réseau). None si OK, sinon un message d'erreur.
+        Connexion perdue pendant la copie : même vérification qu'append_uid.
+        """
+        if isinstance(mailbox, tuple):
+            mailbox = mailbox[0]
+        if isinstance(source, tuple):
+            source = source[0]
+
+        def command():
+            return self.run(
+                lambda imap: imap.uid("COPY", str(uid), _quote_mailbox(mailbox).decode("utf-8")),
+                mailbox=_quote_mailbox(source).decode("utf-8"),
+                readonly=True,
+                replay=False,
+            )
+
+        try:
+            try:
+                typ, data = command()
+            except RECOVERABLE as e:
+                if self._find_after_loss(e, mailbox, message_id) is not None:
+                    return None
+                typ, data = command()
+        except Exception as e:
+            err = str(e)
+        else:
+            if typ == "OK":
+                return None
+            err = f"IMAP copy failed: {typ} {data}"
+        if is_stale_folder_error(err):
+            self.forget_folders()
+        return err
+
+    def find_uid(self, mailbox: str, message_id: str) -> int | None:
+        """UID du message de `mailbox` qui porte ce Message-ID (UID SEARCH), None s'il n'y est pas."""
+        def search(imap):
+            imap.literal = message_id.encode("utf-8")
+            return imap.uid("SEARCH", "HEADER", "Message-ID")
+
+        typ, data = self.run(search, mailbox=_quote_mailbox(mailbox).decode("utf-8"), readonly=True)
+        if typ != "OK" or not data or not data[0]:
+            return None
+        return int(data[0].split()[-1])
+
+    def _find_after_loss(self, error: Exception, mailbox: str, message_id: str | None) -> int | None:
+        """
+        Connexion perdue pendant un APPEND / COPY : UID du message s'il est
+        déjà dans `mailbox` (la commande a abouti), None s'il faut la rejouer.
+        Sans Message-ID, rien ne permet de vérifier : l'erreur remonte.
+        """
+        if not message_id:
+            raise error
+        with self._lock:
+            self.stats["reconnects"] += 1
+        found = self.find_uid(mailbox, message_id)
+        ic(f"[IMAP] connexion perdue ({error}), message {'déjà présent' if found else 'absent, renvoyé'}")
+        return found
+
+    def close(self) -> None:
+        for slot in self._all:
+            self._drop(slot)
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"IMAP session: {st['commands']} commandes, {st['logins']} logins, "
+            f"{st['selects']} SELECT, {st['reconnects']} reconnexions"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,207 @@
+# imap_watch.py
+
+import re
+import ssl
+import time
+import select
+import imaplib
+
+from icecream import ic
+ic.disable()
+
+_UIDNEXT_RE = re.compile(rb"UIDNEXT (\d+)")
+
+
+class MailboxWatcher:
+    """
+    Surveille un dossier IMAP sur UNE connexion persistante.
+
+    - IDLE si le serveur l'annonce (push : réveil dès qu'un message arrive)
+    - sinon polling incrémental : NOOP + recherche sur les seuls UID >= UIDNEXT
+    - la correspondance sur le sujet est faite côté serveur (SEARCH HEADER SUBJECT)
+    """
+
+    def __init__(self, server: str, username: str, password: str, box: str, timeout: float = 60):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.box = box
+        self.timeout = timeout
+
+        self.imap: imaplib.IMAP4 | None = None
+        self.uidnext = 1
+
+    # ------------------------------------------------------------
+    # Connexion
+    # ------------------------------------------------------------
+
+    def open(self) -> "MailboxWatcher":
+        imap = imaplib.IMAP4_SSL(self.server, timeout=self.timeout)
+        imap.login(self.username, self.password)
+        typ, data = imap.select(self.box, readonly=True)
+        if typ != "OK":
+            imap.logout()
+            raise imaplib.IMAP4.error(f"SELECT {self.box} failed: {data}")
+        self.imap = imap
+        self.uidnext = self._read_uidnext()
+        return self
+
+    def _read_uidnext(self) -> int:
+        imap = self.imap
+        _, data = imap.response("UIDNEXT")  # type: ignore[union-attr]
+        if data and data[0]:
+            return int(data[0])
+        typ, data = imap.status(self.box, "(UIDNEXT)")  # type: ignore[union-attr]
+        m = _UIDNEXT_RE.search(data[0] or b"") if typ == "OK" and data else None
+        return int(m.group(1)) if m else 1
+
+    def close(self) -> None:
+        if self.imap is None:
+            return
+        try:
+            self.imap.logout()
+        except Exception:
+            pass
+        self.imap = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def idle_supported(self) -> bool:
+        return self.imap is not None and "IDLE" in self.imap.capabilities
+
+    # ------------------------------------------------------------
+    # Attente de nouveaux messages
+    # ------------------------------------------------------------
+
+    def _buffered(self) -> bool:
+        """
+        Données déjà reçues mais pas encore lues : tampon SSL, ou tampon de
+        imap.file (imaplib lit le socket par blocs, une réponse arrivée avec
+        la précédente y attend). select() sur le socket ne voit ni l'un ni l'autre.
+        """
+        imap = self.imap
+        sock = imap.socket()  # type: ignore[union-attr]
+        if getattr(sock, "pending", lambda: 0)():
+            return True
+        # peek() rend le tampon s'il n'est pas vide ; sinon il lit le socket,
+        # non bloquant ici pour ne rien attendre
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(imap.file.peek(1))  # type: ignore[union-attr]
+        except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    def _idle(self, wait: float) -> bool:
+        """IDLE pendant au plus `wait` secondes. True si le dossier a changé."""
+        imap = self.imap
+        tag = imap._new_tag()  # type: ignore[union-attr]
+        imap.send(tag + b" IDLE\r\n")  # type: ignore[union-attr]
+        line = imap.readline()  # type: ignore[union-attr]
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE refusé: {line!r}")
+
+        sock = imap.socket()  # type: ignore[union-attr]
+        changed = False
+        end = time.monotonic() + wait
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            # select() plutôt qu'un timeout socket : un timeout rendrait le fichier inutilisable
+            if not self._buffered() and not select.select([sock], [], [], remaining)[0]:
+                break
+            line = imap.readline()  # type: ignore[union-attr]
+            if not line:
+                raise imaplib.IMAP4.abort("connexion fermée pendant IDLE")
+            if b"EXISTS" in line or b"RECENT" in line:
+                changed = True
+                break
+
+        imap.send(b"DONE\r\n")  # type: ignore[union-attr]
+        while True:
+            line = imap.readline()  # type: ignore[union-attr]
+            if not line:
+                raise imaplib.IMAP4.abort("connexion fermée après IDLE")
+            if line.startswith(tag):
+                break
+        return changed
+
+    def wait_for_change(self, wait: float, interval: float = 2) -> bool:
+        """
+        Bloque jusqu'à l'arrivée d'un message (IDLE) ou pendant `interval`
+        secondes (polling). Retourne True si un changement a été signalé ;
+        en polling on ne le sait pas, on retourne True pour forcer une recherche.
+        """
+        if wait <= 0:
+            return False
+        if self.idle_supported:
+            # les serveurs coupent IDLE au bout de ~30 min : on le relance régulièrement
+            return self._idle(min(wait, 25 * 60))
+        time.sleep(min(wait, interval))
+        self.imap.noop()  # type: ignore[union-attr]
+        return True
+
+    # ------------------------------------------------------------
+    # Recherches
+    # ------------------------------------------------------------
+
+    def _uid_search(self, *criteria: str, literal: str | None = None) -> list[int]:
+        imap = self.imap
+        args = list(criteria)
+        if literal is not None:
+            raw = literal.encode("utf-8")
+            if not raw.isascii():
+                args = ["CHARSET", "UTF-8"] + args
+            imap.literal = raw  # type: ignore[union-attr]
+        typ, data = imap.uid("SEARCH", *args)  # type: ignore[union-attr]
+        if typ != "OK" or not data or not data[0]:
+            return []
+        return [int(u) for u in data[0].split()]
+
+    def new_uids(self) -> list[int]:
+        """UID arrivés depuis le dernier appel (et avance UIDNEXT)."""
+        uids = [u for u in self._uid_search("UID", f"{self.uidnext}:*") if u >= self.uidnext]
+        if uids:
+            self.uidnext = max(uids) + 1
+        return uids
+
+    def search_subject(self, subject: str, since_uid: int | None = None, unseen: bool = False) -> list[int]:
+        criteria = []
+        if since_uid is not None:
+            criteria += ["UID", f"{since_uid}:*"]
+        if unseen:
+            criteria.append("UNSEEN")
+        criteria += ["HEADER", "SUBJECT"]
+        uids = self._uid_search(*criteria, literal=subject)
+        if since_uid is not None:
+            # "n:*" contient toujours le dernier UID, même s'il est < n
+            uids = [u for u in uids if u >= since_uid]
+        return uids
+
+    def wait_for_subject(self, subject: str, timeout: float = 20, interval: float = 2) -> bool:
+        """True dès qu'un message dont le sujet contient `subject` est présent."""
+        end = time.monotonic() + timeout
+
+        # Déjà là ? (même critère qu'avant : non lu)
+        if self.search_subject(subject, unseen=True):
+            return True
+
+        while True:
+            since = self.uidnext
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            if not self.wait_for_change(remaining, interval):
+                continue
+            if self.search_subject(subject, since_uid=since):
+                return True
+            new = self.new_uids()
+            ic(f"[IMAP] {len(new)} nouveau(x) message(s) dans {self.box}, sujet non trouvé")
@@ -0,0 +1,202 @@
+# manifest.py
+
+import os
+import json
+import time
+import hashlib
+from dataclasses import dataclass, field, asdict
+
+from icecream import ic
+ic.disable()
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class FileEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str | None = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+@dataclass
+class FolderEntry:
+    name: str
+    path: str
+    files: list[FileEntry] = field(default_factory=list)
+
+    @property
+    def paths(self) -> list[str]:
+        return [f.path for f in self.files]
+
+    @property
+    def sizes(self) -> dict[str, int]:
+        """Tailles connues, à passer à message_size / pack_attachments (pas de stat en plus)."""
+        return {f.path: f.size for f in self.files}
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(f.size for f in self.files)
+
+    @property
+    def digests(self) -> dict[str, bytes] | None:
+        """SHA-256 par fichier, si tous sont connus."""
+        if any(f.sha256 is None for f in self.files):
+            return None
+        return {f.path: bytes.fromhex(f.sha256) for f in self.files}  # type: ignore[arg-type]
+
+    def remember(self, digests: dict[str, bytes]) -> None:
+        """SHA-256 calculés après le parcours (empreinte d'un envoi), gardés pour les runs suivants."""
+        for f in self.files:
+            if f.sha256 is None and f.path in digests:
+                f.sha256 = digests[f.path].hex()
+
+    def signature(self) -> list[tuple[str, str]]:
+        # contenu si connu, sinon taille + date
+        return sorted((f.name, f.sha256 or f"{f.size}:{f.mtime_ns}") for f in self.files)
+
+
+_CHUNK = 1024 * 1024
+
+
+def file_sha256(path: str) -> bytes:
+    """SHA-256 du contenu d'un fichier (manifeste, empreintes du journal)."""
+    # lecture par blocs (hashlib.file_digest n'existe qu'à partir de Python 3.11)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK):
+            h.update(chunk)
+    return h.digest()
+
+
+def _known_digests(folders) -> dict[tuple[str, int, int], str]:
+    return {(f.path, f.size, f.mtime_ns): f.sha256 for folder in folders for f in folder.files if f.sha256}
+
+
+def _scan_folder(name: str, path: str, known: dict[tuple[str, int, int], str], hash_files: bool) -> FolderEntry:
+    folder = FolderEntry(name, path)
+    with os.scandir(path) as it:
+        for e in it:
+            if not e.is_file():
+                continue
+            st = e.stat()
+            entry = FileEntry(e.path, st.st_size, st.st_mtime_ns)
+            entry.sha256 = known.get((e.path, st.st_size, st.st_mtime_ns))
+            if hash_files and entry.sha256 is None:
+                entry.sha256 = file_sha256(e.path).hex()
+            folder.files.append(entry)
+    folder.files.sort(key=lambda f: f.name)
+    return folder
+
+
+class Manifest:
+    """
+    Inventaire du dossier « Protégés » pour un run : un seul parcours
+    os.scandir (un appel système par dossier, la taille et la date viennent
+    de l'entrée), partagé par toutes les étapes suivantes.
+
+    Persisté en JSON : au run suivant, les empreintes des fichiers dont la
+    taille et la date n'ont pas bougé sont reprises sans relire le contenu,
+    et diff() indique les dossiers nouveaux / modifiés / disparus.
+    """
+
+    def __init__(self, root: str, folders: dict[str, FolderEntry] | None = None, scanned_at: float | None = None):
+        self.root = root
+        self.folders = folders or {}
+        self.scanned_at = scanned_at or time.time()
+
+    # ------------------------------------------------------------
+    # Parcours
+    # ------------------------------------------------------------
+
+    @classmethod
+    def scan(cls, root: str, hash_files: bool = False, previous: "Manifest | None" = None) -> "Manifest":
+        """
+        Parcourt `root` (un niveau de sous-dossiers). Le SHA-256 d'un fichier
+        inchangé depuis `previous` (même taille, même date) est repris ; avec
+        `hash_files`, les autres sont calculés, sinon laissés à None.
+        """
+        known = _known_digests(previous.folders.values() if previous is not None else [])
+        manifest = cls(root)
+        try:
+            top = os.scandir(root)
+        except FileNotFoundError:
+            return manifest
+        with top:
+            for d in top:
+                if d.is_dir():
+                    manifest.folders[d.name] = _scan_folder(d.name, d.path, known, hash_files)
+        return manifest
+
+    def refresh(self, names: list[str]) -> None:
+        """
+        Reparcourt seulement ces dossiers (surveillance : ceux qui ont bougé),
+        avec la même reprise des SHA-256 que scan() ; un dossier disparu est retiré.
+        """
+        for name in names:
+            path = os.path.join(self.root, name)
+            previous = self.folders.get(name)
+            known = _known_digests([previous] if previous is not None else [])
+            try:
+                self.folders[name] = _scan_folder(name, path, known, False)
+            except (FileNotFoundError, NotADirectoryError):
+                self.folders.pop(name, None)
+        self.scanned_at = time.time()
+
+    # ------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "root": self.root,
+            "scanned_at": self.scanned_at,
+            "folders": {name: asdict(folder) for name, folder in self.folders.items()},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest | None":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            ic(f"[manifest] illisible, ignoré: {e}")
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        folders = {
+            name: FolderEntry(d["name"], d["path"], [FileEntry(**f) for f in d["files"]])
+            for name, d in data.get("folders", {}).items()
+        }
+        return cls(data.get("root", ""), folders, data.get("scanned_at"))
+
+    # ------------------------------------------------------------
+    # Comparaison
+    # ------------------------------------------------------------
+
+    def diff(self, previous: "Manifest | None") -> dict[str, list[str]]:
+        """Dossiers nouveaux / modifiés / disparus / inchangés depuis `previous`."""
+        before = previous.folders if previous is not None else {}
+        out: dict[str, list[str]] = {"added": [], "changed": [], "removed": [], "unchanged": []}
+        for name, folder in sorted(self.folders.items()):
+            if name not in before:
+                out["added"].append(name)
+            elif folder.signature() != before[name].signature():
+                out["changed"].append(name)
+            else:
+                out["unchanged"].append(name)
+        out["removed"] = sorted(set(before) - set(self.folders))
+        return out
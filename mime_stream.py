@@ -0,0 +1,227 @@
+# mime_stream.py
+
+import os
+import copy
+import uuid
+import base64
+import tempfile
+from io import BytesIO
+from email import policy
+from email.generator import BytesGenerator
+from email.message import EmailMessage, MIMEPart
+
+# 57 octets bruts = une ligne base64 de 76 caractères : on lit par multiples de 57
+B64_LINE_IN = 57
+READ_CHUNK = B64_LINE_IN * 1024          # ~57 Ko lus à la fois
+SEND_CHUNK = 64 * 1024
+SPOOL_MEMORY = 1024 * 1024               # au-delà, le message part sur disque
+
+CRLF = b"\r\n"
+_PART_HEADERS = ("content-type", "content-transfer-encoding")
+_OUTER_SKIP = _PART_HEADERS + ("mime-version",)
+
+
+def _fold(name: str, value) -> bytes:
+    return policy.SMTP.fold_binary(name, value)
+
+
+def attachment_headers(path: str) -> bytes:
+    """En-têtes MIME d'une pièce jointe (identiques à msg.add_attachment)."""
+    part = MIMEPart(policy=policy.SMTP)
+    part["Content-Type"] = "application/octet-stream"
+    part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
+    part["Content-Transfer-Encoding"] = "base64"
+    return b"".join(_fold(k, v) for k, v in part.items())
+
+
+def _serialize(msg: EmailMessage) -> tuple[bytes, bytes]:
+    """(bloc d'en-têtes, corps) du message sans pièces jointes, en CRLF."""
+    buf = BytesIO()
+    BytesGenerator(buf, policy=policy.SMTP).flatten(msg)
+    head, _, body = buf.getvalue().partition(CRLF + CRLF)
+    return head + CRLF, body
+
+
+def _new_boundary() -> str:
+    # longueur fixe : la taille calculée par message_size() est exacte
+    return f"==============={uuid.uuid4().hex}=="
+
+
+def _segments(msg: EmailMessage, paths: list[str], boundary: str):
+    """
+    Découpage du message final : des bytes déjà prêts, et pour chaque pièce
+    jointe son chemin (str) à encoder en base64 à cet endroit.
+    """
+    head, body = _serialize(msg)
+
+    if not paths:
+        yield head + CRLF + body
+        return
+
+    # En-têtes du message (From, To, Subject...) puis enveloppe multipart/mixed
+    outer = [_fold(name, value) for name, value in msg.items() if name.lower() not in _OUTER_SKIP]
+    outer.append(b"MIME-Version: 1.0" + CRLF)
+    outer.append(_fold("Content-Type", f'multipart/mixed; boundary="{boundary}"'))
+    yield b"".join(outer) + CRLF
+
+    # 1re partie : le corps texte/HTML tel que composé
+    delim = b"--" + boundary.encode("ascii")
+    part = [delim + CRLF]
+    part += [_fold(name, value) for name, value in msg.items() if name.lower() in _PART_HEADERS]
+    part.append(CRLF + body)
+    if not body.endswith(CRLF):
+        part.append(CRLF)
+    yield b"".join(part)
+
+    for p in paths:
+        yield delim + CRLF + attachment_headers(p) + CRLF
+        yield p
+
+    yield delim + b"--" + CRLF
+
+
+def b64_encoded_size(n: int) -> int:
+    """Taille exacte de n octets en base64, lignes de 76 caractères + CRLF."""
+    full_lines, rest = divmod(n, B64_LINE_IN)
+    size = full_lines * (76 + 2)
+    if rest:
+        size += 4 * ((rest + 2) // 3) + 2
+    return size
+
+
+def message_size(msg: EmailMessage, paths: list[str], sizes: dict[str, int] | None = None) -> int:
+    """
+    Taille exacte (octets) du message final avec ces pièces jointes, sans le
+    construire : seules les tailles des fichiers sont lues (ou prises dans `sizes`).
+    """
+    sizes = sizes or {}
+    total = 0
+    for seg in _segments(msg, paths, _new_boundary()):
+        if isinstance(seg, bytes):
+            total += len(seg)
+        else:
+            n = sizes.get(seg)
+            total += b64_encoded_size(os.path.getsize(seg) if n is None else n)
+    return total
+
+
+def attachment_cost(path: str, size: int) -> int:
+    """Octets ajoutés au message par une pièce jointe : délimiteur + en-têtes + base64."""
+    delim = 2 + len(_new_boundary())
+    return delim + len(CRLF) + len(attachment_headers(path)) + len(CRLF) + b64_encoded_size(size)
+
+
+def pack_attachments(
+    msg: EmailMessage,
+    paths: list[str],
+    max_bytes: int,
+    sizes: dict[str, int] | None = None,
+) -> list[list[str]]:
+    """
+    Répartit les pièces jointes en un minimum de messages de moins de
+    `max_bytes` chacun (first-fit decreasing). Un fichier trop gros à lui
+    seul part dans son propre message. La place du suffixe « (i/n) » ajouté
+    au sujet de chaque partie est réservée.
+    """
+    if not paths:
+        return [[]]
+    sizes = sizes or {}
+    costs = {
+        p: attachment_cost(p, os.path.getsize(p) if sizes.get(p) is None else sizes[p])
+        for p in paths
+    }
+    # coût fixe d'un message multipart (en-têtes, corps, enveloppe), hors pièces jointes,
+    # avec le plus long suffixe de sujet possible (au plus une partie par fichier)
+    n = len(paths)
+    numbered = copy.deepcopy(msg)
+    del numbered["Subject"]
+    numbered["Subject"] = f"{msg['Subject'] or ''} ({n}/{n})"
+    first = paths[0]
+    base = message_size(numbered, [first], {first: 0}) - attachment_cost(first, 0)
+    capacity = max_bytes - base
+
+    bins: list[tuple[int, list[str]]] = []
+    for p in sorted(paths, key=costs.__getitem__, reverse=True):
+        c = costs[p]
+        for i, (used, items) in enumerate(bins):
+            if used + c <= capacity:
+                bins[i] = (used + c, items + [p])
+                break
+        else:
+            bins.append((c, [p]))
+    return [items for _, items in bins]
+
+
+class SpooledMessage:
+    """
+    Message MIME final (en-têtes + corps + pièces jointes en base64) sérialisé
+    UNE fois dans un fichier temporaire « spoolé » : en mémoire tant qu'il est
+    petit, sur disque au-delà de SPOOL_MEMORY.
+
+    Les pièces jointes sont encodées par morceaux : un fichier n'est jamais
+    chargé entièrement en mémoire. Le même spool sert au DATA SMTP et aux
+    APPEND IMAP.
+    """
+
+    def __init__(self, spool, size: int):
+        self._spool = spool
+        self.size = size
+        # appelé avec la taille de chaque morceau parti en DATA (suivi de progression)
+        self.on_progress = None
+
+    @classmethod
+    def build(cls, msg: EmailMessage, paths: list[str]) -> "SpooledMessage":
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY, prefix="mailspool_")
+        for seg in _segments(msg, paths, _new_boundary()):
+            if isinstance(seg, bytes):
+                spool.write(seg)
+                continue
+            # pièce jointe, encodée au fil de l'eau
+            with open(seg, "rb") as f:
+                while True:
+                    chunk = f.read(READ_CHUNK)
+                    if not chunk:
+                        break
+                    spool.write(base64.encodebytes(chunk).replace(b"\n", CRLF))
+        return cls(spool, spool.tell())
+
+    # ------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------
+
+    def chunks(self, size: int = SEND_CHUNK):
+        """Le message brut, par morceaux, depuis le début."""
+        self._spool.seek(0)
+        while True:
+            chunk = self._spool.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+    def smtp_chunks(self, size: int = SEND_CHUNK):
+        """Le message prêt pour DATA : « dot-stuffing » + terminaison <CRLF>.<CRLF>."""
+        at_line_start = True
+        last = b""
+        for chunk in self.chunks(size):
+            if at_line_start and chunk.startswith(b"."):
+                chunk = b"." + chunk
+            chunk = chunk.replace(b"\n.", b"\n..")
+            at_line_start = chunk.endswith(b"\n")
+            last = chunk
+            yield chunk
+            if self.on_progress is not None:
+                self.on_progress(len(chunk))
+        yield (b"" if last.endswith(CRLF) else CRLF) + b"." + CRLF
+
+    def as_bytes(self) -> bytes:
+        """Copie complète en mémoire (chemins qui n'acceptent que des bytes)."""
+        return b"".join(self.chunks())
+
+    def close(self) -> None:
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,112 @@
+# perf.py
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from icecream import ic
+ic.disable()
+
+# Étapes mesurées, dans l'ordre du rapport
+STAGES = (
+    "scan", "compose", "zip", "attach", "connect", "auth",
+    "send", "imap_resolve", "append", "imap_copy", "archive",
+)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Percentile (interpolation linéaire) d'une liste triée."""
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class PerfRecorder:
+    """
+    Durées par étape (spans) d'un run, thread-safe et sans dépendance.
+    Un span coûte deux perf_counter() et un append sous verrou.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: dict[str, list[float]] = {}
+        self._bytes: dict[str, int] = {}
+        self._t0 = time.perf_counter()
+
+    def add(self, stage: str, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+            if nbytes:
+                self._bytes[stage] = self._bytes.get(stage, 0) + nbytes
+
+    def report(self) -> dict:
+        wall = time.perf_counter() - self._t0
+        with self._lock:
+            samples = {k: sorted(v) for k, v in self._samples.items()}
+            nbytes = dict(self._bytes)
+
+        order = [s for s in STAGES if s in samples] + sorted(set(samples) - set(STAGES))
+        stages = {}
+        for stage in order:
+            values = samples[stage]
+            total = sum(values)
+            entry = {
+                "count": len(values),
+                "total_s": round(total, 4),
+                "p50_s": round(_percentile(values, 0.50), 4),
+                "p95_s": round(_percentile(values, 0.95), 4),
+                "max_s": round(values[-1], 4),
+            }
+            if stage in nbytes:
+                entry["bytes"] = nbytes[stage]
+                entry["mb_per_s"] = round(nbytes[stage] / (1024 * 1024) / total, 2) if total else None
+            stages[stage] = entry
+
+        uploaded = nbytes.get("send", 0)
+        return {
+            "wall_s": round(wall, 3),
+            "bytes_uploaded": uploaded,
+            "effective_mb_per_s": round(uploaded / (1024 * 1024) / wall, 2) if wall else None,
+            "stages": stages,
+        }
+
+    def write(self, run_dir: str, name: str = "perf.json") -> str:
+        path = os.path.join(run_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+# Enregistreur du run en cours (None = instrumentation inactive, spans gratuits)
+_current: PerfRecorder | None = None
+
+
+def start() -> PerfRecorder:
+    global _current
+    _current = PerfRecorder()
+    return _current
+
+
+def stop() -> PerfRecorder | None:
+    global _current
+    recorder, _current = _current, None
+    return recorder
+
+
+@contextmanager
+def span(stage: str, nbytes: int = 0):
+    """Mesure le bloc sous le nom `stage` (si un enregistreur est actif)."""
+    recorder = _current
+    if recorder is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(stage, time.perf_counter() - t0, nbytes)
@@ -0,0 +1,255 @@
+# progress.py
+
+import time
+import queue
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from icecream import ic
+ic.disable()
+
+# États d'un protégé pendant le run
+WAITING = "waiting"
+PREPARING = "preparing"
+QUEUED = "queued"
+SENDING = "sending"
+RETRY = "retry"
+FINISHING = "finishing"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL = {DONE, FAILED, CANCELLED}
+
+LABELS = {
+    WAITING: "en attente",
+    PREPARING: "préparation",
+    QUEUED: "prêt",
+    SENDING: "envoi",
+    RETRY: "nouvel essai",
+    FINISHING: "copie / archivage",
+    DONE: "envoyé",
+    FAILED: "échec",
+    CANCELLED: "annulé",
+}
+
+
+class RunProgress:
+    """
+    Canal entre un run (boucle asyncio, threads d'envoi) et l'interface :
+    - les changements d'état vont dans une file thread-safe, que l'interface
+      vide à son rythme (`drain`) ; le run n'attend jamais l'interface
+    - les octets envoyés sont cumulés par protégé dans un compteur, pas un
+      événement par morceau de DATA
+    - `cancel()` se demande depuis n'importe quel thread ; le run ne lance
+      plus de nouvel envoi et laisse finir ceux en cours
+    """
+
+    def __init__(self):
+        self._events: queue.SimpleQueue = queue.SimpleQueue()
+        self._bytes: dict[str, int] = {}
+        self._bytes_lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._cancelled: asyncio.Event | None = None
+
+    # ------------------------------------------------------------
+    # Côté run
+    # ------------------------------------------------------------
+
+    def bind(self) -> None:
+        """À appeler dans la boucle du run : l'annulation pourra réveiller ses attentes."""
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._cancelled = asyncio.Event()
+            if self._cancel.is_set():
+                self._cancelled.set()
+
+    def emit(self, protege: str, state: str, **fields) -> None:
+        self._events.put(("state", protege, time.monotonic(), fields | {"state": state}))
+
+    def message(self, text: str) -> None:
+        """Message d'état général (remplace le status_callback)."""
+        self._events.put(("message", None, time.monotonic(), {"text": text}))
+
+    def end(self, error: str | None = None) -> None:
+        """Fin du run (dernier événement)."""
+        self._events.put(("end", None, time.monotonic(), {"error": error, "cancelled": self.cancelled}))
+
+    def add_bytes(self, protege: str, n: int) -> None:
+        with self._bytes_lock:
+            self._bytes[protege] = self._bytes.get(protege, 0) + n
+
+    def set_bytes(self, protege: str, n: int) -> None:
+        with self._bytes_lock:
+            self._bytes[protege] = n
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    async def wait(self, aw) -> bool:
+        """Attend `aw`, sauf annulation avant la fin : rend False (et abandonne `aw`)."""
+        if self._cancelled is None:
+            await aw
+            return True
+        task = asyncio.ensure_future(aw)
+        stop = asyncio.ensure_future(self._cancelled.wait())
+        try:
+            await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+        if task.done():
+            task.result()
+            return True
+        task.cancel()
+        return False
+
+    async def sleep(self, delay: float) -> bool:
+        """asyncio.sleep interrompu par l'annulation : rend False si annulé."""
+        return await self.wait(asyncio.sleep(delay))
+
+    # ------------------------------------------------------------
+    # Côté interface
+    # ------------------------------------------------------------
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel.set()
+            if self._loop is not None and self._cancelled is not None:
+                self._loop.call_soon_threadsafe(self._cancelled.set)
+
+    def drain(self, limit: int = 1000) -> list[tuple]:
+        """Au plus `limit` événements en attente : (type, protégé, t, champs)."""
+        events = []
+        try:
+            while len(events) < limit:
+                events.append(self._events.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+    def bytes_sent(self) -> dict[str, int]:
+        with self._bytes_lock:
+            return dict(self._bytes)
+
+
+@dataclass
+class ProtegeProgress:
+    name: str
+    state: str = WAITING
+    total: int = 0                 # octets SMTP (estimés, puis exacts après préparation)
+    sent: int = 0
+    started: float | None = None   # début du premier envoi
+    ended: float | None = None
+    error: str = ""
+
+    def rate(self, now: float) -> float | None:
+        """Débit d'envoi (octets/s) : en cours, ou moyen une fois terminé."""
+        if self.started is None or not self.sent:
+            return None
+        elapsed = (self.ended or now) - self.started
+        return self.sent / elapsed if elapsed > 0 else None
+
+    def eta(self, now: float) -> float | None:
+        if self.state in FINAL:
+            return 0.0
+        rate = self.rate(now)
+        if not rate:
+            return None
+        return max(0, self.total - self.sent) / rate
+
+
+class ProgressBoard:
+    """
+    Vue agrégée d'un run pour l'affichage : une ligne par protégé, débit
+    global lissé et fin estimée. Alimentée par RunProgress.drain() /
+    bytes_sent(), sans dépendance à Tk.
+    """
+
+    def __init__(self, smoothing: float = 0.3, window: float = 0.5):
+        self.rows: dict[str, ProtegeProgress] = {}
+        self.status = ""
+        self.finished = False
+        self.cancelled = False
+        self.error: str | None = None
+        self.smoothing = smoothing
+        self.window = window
+        self.rate: float | None = None          # débit global lissé (octets/s)
+        self._sample: tuple[float, int] | None = None
+
+    def apply(self, events: list[tuple], sent: dict[str, int], now: float | None = None) -> set[str]:
+        """Intègre les événements et les compteurs d'octets ; rend les protégés modifiés."""
+        now = time.monotonic() if now is None else now
+        changed = set()
+        for kind, name, t, fields in events:
+            if kind == "message":
+                self.status = fields["text"]
+            elif kind == "end":
+                self.finished = True
+                self.cancelled = fields["cancelled"]
+                self.error = fields["error"]
+            else:
+                row = self.rows.get(name)
+                if row is None:
+                    row = self.rows[name] = ProtegeProgress(name)
+                state = fields["state"]
+                row.state = state
+                if fields.get("total"):
+                    row.total = fields["total"]
+                if fields.get("error"):
+                    row.error = fields["error"]
+                if state == SENDING and row.started is None:
+                    row.started = t
+                elif state in FINAL or state == FINISHING:
+                    row.ended = row.ended or t
+                changed.add(name)
+        for name, n in sent.items():
+            row = self.rows.get(name)
+            if row is not None and row.sent != n:
+                row.sent = n
+                changed.add(name)
+        self._update_rate(now)
+        return changed
+
+    def _update_rate(self, now: float) -> None:
+        total = sum(row.sent for row in self.rows.values())
+        if self._sample is None:
+            self._sample = (now, total)
+            return
+        t0, b0 = self._sample
+        if now - t0 < self.window:
+            return
+        rate = max(0, total - b0) / (now - t0)
+        self.rate = rate if self.rate is None else self.smoothing * rate + (1 - self.smoothing) * self.rate
+        self._sample = (now, total)
+
+    def totals(self) -> dict:
+        rows = self.rows.values()
+        remaining = sum(max(0, r.total - r.sent) for r in rows if r.state not in FINAL)
+        return {
+            "count": len(self.rows),
+            "done": sum(1 for r in rows if r.state == DONE),
+            "failed": sum(1 for r in rows if r.state == FAILED),
+            "sent": sum(r.sent for r in rows),
+            "total": sum(r.total for r in rows if r.state != CANCELLED),
+            "rate": self.rate,
+            "eta": remaining / self.rate if self.rate else (0.0 if not remaining else None),
+        }
+
+
+def format_rate(rate: float | None) -> str:
+    return "–" if not rate else f"{rate / (1024 * 1024):.2f} MB/s"
+
+
+def format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return "–"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}min{seconds % 60:02d}"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}"
@@ -0,0 +1,108 @@
+# rate_limit.py
+
+import time
+import asyncio
+
+from config import Config
+from icecream import ic
+ic.disable()
+
+
+class TokenBucket:
+    """
+    Seau à jetons : `rate` jetons par seconde, au plus `capacity` en réserve.
+    Une demande plus grosse que la réserve part quand le seau est plein et
+    le laisse en dette : le débit moyen reste respecté.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1e-9)
+        self._tokens = self.capacity
+        self._t = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+        self._t = now
+
+    def delay(self, n: float) -> float:
+        """Secondes à attendre avant de pouvoir prendre `n` jetons."""
+        self._refill()
+        missing = min(n, self.capacity) - self._tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, n: float) -> None:
+        self._refill()
+        self._tokens -= n
+
+
+class SendQuota:
+    """
+    Quotas d'envoi d'un compte : messages par minute et Mo par heure.
+    Chaque seau démarre avec 10 % du quota et se remplit à 90 % du débit
+    permis : sur n'importe quelle fenêtre (minute / heure), on reste sous
+    la limite du fournisseur. 0 = pas de limite.
+    """
+
+    def __init__(self, msgs_per_min: float = 0, mb_per_hour: float = 0):
+        self.msgs_per_min = msgs_per_min
+        self.mb_per_hour = mb_per_hour
+        self._msgs = TokenBucket(0.9 * msgs_per_min / 60, 0.1 * msgs_per_min) if msgs_per_min > 0 else None
+        bytes_per_hour = mb_per_hour * 1024 * 1024
+        self._bytes = TokenBucket(0.9 * bytes_per_hour / 3600, 0.1 * bytes_per_hour) if mb_per_hour > 0 else None
+        self._lock = asyncio.Lock()   # premier arrivé, premier servi
+        self.stats = {"waits": 0, "waited_s": 0.0}
+
+    @classmethod
+    def from_config(cls, config: Config) -> "SendQuota":
+        return cls(config.smtp.rate_msgs_per_min, config.smtp.rate_mb_per_hour)
+
+    @property
+    def enabled(self) -> bool:
+        return self._msgs is not None or self._bytes is not None
+
+    def _buckets(self, n_msgs: int, nbytes: int):
+        if self._msgs is not None:
+            yield self._msgs, n_msgs
+        if self._bytes is not None:
+            yield self._bytes, nbytes
+
+    async def acquire(self, n_msgs: int, nbytes: int) -> float:
+        """Attend que les quotas permettent `n_msgs` messages / `nbytes` octets ; rend l'attente."""
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        async with self._lock:
+            while True:
+                delay = max(b.delay(n) for b, n in self._buckets(n_msgs, nbytes))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+                waited += delay
+            for b, n in self._buckets(n_msgs, nbytes):
+                b.take(n)
+        if waited:
+            self.stats["waits"] += 1
+            self.stats["waited_s"] += waited
+            ic(f"[SMTP] quota: {waited:.1f}s d'attente")
+        return waited
+
+    def predict(self, n_msgs: int, nbytes: int) -> float:
+        """Durée minimale (s) imposée par les quotas pour envoyer ce volume."""
+        seconds = 0.0
+        for b, n in self._buckets(n_msgs, nbytes):
+            seconds = max(seconds, max(0.0, n - b.capacity) / b.rate)
+        return seconds
+
+    def describe(self) -> str:
+        parts = []
+        if self.msgs_per_min > 0:
+            parts.append(f"{self.msgs_per_min:g} messages/min")
+        if self.mb_per_hour > 0:
+            parts.append(f"{self.mb_per_hour:g} Mo/h")
+        return ", ".join(parts) or "aucun"
+
+    def summary(self) -> str:
+        st = self.stats
+        return f"Quota SMTP ({self.describe()}): {st['waits']} attentes, {st['waited_s']:.1f}s au total"
@@ -0,0 +1,179 @@
+# run_journal.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.request import pathname2url
+
+from manifest import file_sha256
+from icecream import ic
+ic.disable()
+
+# États d'un envoi : pending (en cours) → prepared → accepted | failed | unknown
+PENDING = "pending"
+PREPARED = "prepared"
+ACCEPTED = "accepted"
+FAILED = "failed"
+# connexion coupée après la fin du DATA : le serveur a peut-être accepté le
+# message. Jamais retenté par une reprise (risque de doublon) : à vérifier.
+UNKNOWN = "unknown"
+
+_FIELDS = ("status", "message_id", "imap_copied", "archived", "error", "run_dir")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sends (
+    protege      TEXT NOT NULL,
+    fingerprint  TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    message_id   TEXT,
+    imap_copied  INTEGER,
+    archived     INTEGER,
+    error        TEXT,
+    run_dir      TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    updated_at   REAL NOT NULL,
+    PRIMARY KEY (protege, fingerprint)
+)
+"""
+
+
+def file_digests(paths: list[str], digests: dict[str, bytes] | None = None) -> dict[str, bytes]:
+    """SHA-256 de chaque fichier : repris de `digests` (manifeste) si connu, sinon relu."""
+    digests = digests or {}
+    return {p: digests.get(p) or file_sha256(p) for p in paths}
+
+
+def fingerprint(paths: list[str], digests: dict[str, bytes] | None = None) -> str:
+    """
+    Empreinte des pièces jointes d'un protégé : noms + contenus (SHA-256).
+    `digests` : SHA-256 déjà calculés par fichier (manifeste), sinon relus.
+    """
+    digests = file_digests(paths, digests)
+    h = hashlib.sha256()
+    for p in sorted(paths, key=os.path.basename):
+        h.update(os.path.basename(p).encode("utf-8") + b"\0")
+        h.update(digests[p])
+    return h.hexdigest()
+
+
+class RunJournal:
+    """
+    Journal des envois d'un trimestre (SQLite, une ligne par protégé et par
+    jeu de pièces jointes).
+
+    Chaque changement d'état est validé sur disque immédiatement
+    (synchronous=FULL) : si le programme s'arrête en plein run, le journal dit
+    exactement ce qui est parti. Un run « --resume » saute les envois déjà
+    acceptés et ne retente que les échecs et les envois restés en cours ;
+    les envois à l'issue inconnue (UNKNOWN) sont laissés à l'opérateur.
+    Ces écritures bloquent le temps d'un fsync : depuis la boucle asyncio,
+    passer par un thread (le pipeline a le sien, un seul écrivain).
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        """read_only : journal existant ouvert en lecture seule (simulation), rien n'est créé."""
+        self.path = path
+        self._lock = threading.Lock()
+        if read_only:
+            uri = "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(_SCHEMA)
+
+    @staticmethod
+    def quarter_path(log_dir: str, tri: int, yr: int) -> str:
+        return os.path.join(log_dir, f"journal_{yr}_T{tri}.sqlite")
+
+    @classmethod
+    def for_quarter(cls, log_dir: str, tri: int, yr: int, read_only: bool = False) -> "RunJournal":
+        return cls(cls.quarter_path(log_dir, tri, yr), read_only=read_only)
+
+    # ------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------
+
+    def get(self, protege: str, fp: str) -> dict | None:
+        with self._lock:
+            cur = self._db.execute(
+                "SELECT * FROM sends WHERE protege = ? AND fingerprint = ?", (protege, fp)
+            )
+            row = cur.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cur.description], row))
+
+    def is_accepted(self, protege: str, fp: str) -> bool:
+        entry = self.get(protege, fp)
+        return entry is not None and entry["status"] == ACCEPTED
+
+    def has_accepted(self, protege: str) -> bool:
+        """Un envoi accepté pour ce protégé ce trimestre, quelles que soient les pièces jointes."""
+        return self.has_status(protege, ACCEPTED)
+
+    def has_status(self, protege: str, *statuses: str) -> bool:
+        """Un envoi dans l'un de ces états pour ce protégé ce trimestre."""
+        marks = ", ".join("?" for _ in statuses)
+        with self._lock:
+            return self._db.execute(
+                f"SELECT 1 FROM sends WHERE protege = ? AND status IN ({marks}) LIMIT 1", (protege, *statuses)
+            ).fetchone() is not None
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM sends GROUP BY status"))
+
+    # ------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------
+
+    def record(self, protege: str, fp: str, **fields) -> None:
+        """Crée ou met à jour la ligne (protégé, empreinte) ; chaque appel est durable."""
+        unknown = set(fields) - set(_FIELDS)
+        if unknown:
+            raise ValueError(f"champs de journal inconnus: {sorted(unknown)}")
+        for key in ("imap_copied", "archived"):
+            if key in fields and fields[key] is not None:
+                fields[key] = int(bool(fields[key]))
+
+        new_attempt = int(fields.get("status") == PENDING)
+        now = time.time()
+        with self._lock:
+            try:
+                exists = self._db.execute(
+                    "SELECT 1 FROM sends WHERE protege = ? AND fingerprint = ?", (protege, fp)
+                ).fetchone()
+                if exists:
+                    sets = "".join(f", {k} = ?" for k in fields)
+                    self._db.execute(
+                        f"UPDATE sends SET attempts = attempts + ?, updated_at = ?{sets} "
+                        f"WHERE protege = ? AND fingerprint = ?",
+                        (new_attempt, now, *fields.values(), protege, fp),
+                    )
+                else:
+                    fields.setdefault("status", PENDING)
+                    cols = "".join(f", {k}" for k in fields)
+                    marks = "".join(", ?" for _ in fields)
+                    self._db.execute(
+                        f"INSERT INTO sends (protege, fingerprint, attempts, updated_at{cols}) "
+                        f"VALUES (?, ?, ?, ?{marks})",
+                        (protege, fp, new_attempt, now, *fields.values()),
+                    )
+            except sqlite3.Error as e:
+                # le journal ne doit jamais faire échouer un envoi
+                ic(f"[journal] écriture impossible ({protege}): {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,119 @@
+# run_log.py
+
+import os
+import json
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+from icecream import ic
+ic.disable()
+
+_STOP = object()
+_BATCH = 512           # lignes écrites au plus par passage
+
+
+class RunLogger:
+    """
+    Journal d'un run, écrit par UN thread dédié.
+
+    Les appelants (boucle asyncio, threads d'envoi) ne font que déposer
+    l'enregistrement dans une file ; le thread écrivain vide la file par lots
+    dans deux fichiers ouverts une seule fois :
+    - log.txt      : lignes lisibles « [date] message »
+    - events.jsonl : un objet JSON par événement (protégé, étape, durée,
+                     octets, résultat...)
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name=f"log-{os.path.basename(run_dir)}", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------
+
+    def write(self, txt: str, **event) -> None:
+        """Une ligne dans log.txt, et un événement dans events.jsonl si des champs sont donnés."""
+        if self._closed:
+            return
+        self._queue.put((datetime.now(), txt, event or None))
+
+    def close(self) -> None:
+        """Vide la file et ferme les fichiers (bloquant)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # ------------------------------------------------------------
+    # Thread écrivain
+    # ------------------------------------------------------------
+
+    def _writer(self) -> None:
+        text = open(os.path.join(self.run_dir, "log.txt"), "a", encoding="utf-8")
+        events = open(os.path.join(self.run_dir, "events.jsonl"), "a", encoding="utf-8")
+        try:
+            stop = False
+            while not stop:
+                batch = [self._queue.get()]
+                while len(batch) < _BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for item in batch:
+                    if item is _STOP:
+                        stop = True
+                        continue
+                    ts, txt, event = item
+                    if txt:
+                        text.write(f"[{ts.strftime('%Y-%m-%d %H:%M:%S')}] {txt}\n")
+                    if event is not None:
+                        record = {"ts": ts.isoformat(timespec="milliseconds"), **event}
+                        if txt:
+                            record.setdefault("message", txt)
+                        events.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                text.flush()
+                events.flush()
+        except Exception as e:
+            ic(f"[log] écriture impossible: {e}")
+        finally:
+            text.close()
+            events.close()
+
+
+_LOGGERS: dict[str, RunLogger] = {}
+_LOCK = threading.Lock()
+
+
+def get_logger(run_dir: str) -> RunLogger:
+    key = os.path.abspath(run_dir)
+    with _LOCK:
+        logger = _LOGGERS.get(key)
+        if logger is None:
+            logger = _LOGGERS[key] = RunLogger(run_dir)
+        return logger
+
+
+def close_logger(run_dir: str) -> None:
+    with _LOCK:
+        logger = _LOGGERS.pop(os.path.abspath(run_dir), None)
+    if logger is not None:
+        logger.close()
+
+
+@atexit.register
+def close_all() -> None:
+    """Vide tous les journaux encore ouverts (fin du programme)."""
+    with _LOCK:
+        loggers = list(_LOGGERS.values())
+        _LOGGERS.clear()
+    for logger in loggers:
+        logger.close()
@@ -1,12 +1,14 @@
 # send_email.py
 
 import os
+import asyncio
 import smtplib
-import zipfile
 import tempfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from email.message import EmailMessage
-from email.utils import make_msgid, formatdate
+from email.utils import make_msgid, formatdate, parseaddr, getaddresses
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -14,6 +16,13 @@ from Email import compose_email  # ton composeur de message
 import config
 from imap_handler import add_email_to_box, find_sent_folder, find_best_folder  # nouveau handler IMAP
 from config import Config  # config centralisée
+from smtp_pool import SMTPPool, RECONNECT_CODES, DeliveryUnknown
+from imap_session import IMAPSession
+from folder_cache import is_stale_folder_error
+from compression import build_zip, estimate_zip_size
+from mime_stream import SpooledMessage, message_size, pack_attachments, attachment_cost
+import perf
+from async_transport import AsyncSMTPPool, AsyncIMAPSession, smtp_send_verified_async, copy_to_imap_async
 from icecream import ic
 ic.disable()
 
@@ -22,34 +31,34 @@ ic.disable()
 # --------------------------------------------------------------------
 
 
-def bytes_size(paths):
-    return sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
-
-
-def est_smtp_mb(paths, config: Config):
-    return bytes_size(paths) * config.smtp.b64_overhead / (1024 * 1024)
+def est_smtp_mb(paths, config: Config, msg: EmailMessage | None = None, sizes: dict[str, int] | None = None):
+    """
+    Taille SMTP exacte en MB : base64 + en-têtes MIME des pièces jointes, et
+    tout le message (en-têtes, corps) si `msg` est fourni.
+    `sizes` : tailles déjà connues (manifeste), pour ne pas refaire de stat.
+    """
+    sizes = sizes or {}
+    paths = [p for p in paths if p in sizes or os.path.isfile(p)]
+    if msg is None:
+        size = sum(attachment_cost(p, sizes[p] if p in sizes else os.path.getsize(p)) for p in paths)
+    else:
+        size = message_size(msg, paths, sizes)
+    return size / (1024 * 1024)
 
 
-def zip_all(label, paths):
+def zip_all(label, paths, stats: dict | None = None):
+    """
+    Zippe les pièces jointes : formats déjà compressés (PDF, JPEG...) stockés,
+    les autres deflatés. `stats` reçoit durée et octets économisés.
+    """
     tmpdir = tempfile.mkdtemp(prefix=f"mailzip_{label}_")
     zpath = os.path.join(tmpdir, f"{label}.zip")
-    with zipfile.ZipFile(zpath, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for p in paths:
-            zf.write(p, arcname=os.path.basename(p))
+    st = build_zip(zpath, paths)
+    if stats is not None:
+        stats.update(st)
     return [zpath], tmpdir
 
 
-def attach_files(msg: EmailMessage, paths):
-    for p in paths:
-        with open(p, "rb") as f:
-            msg.add_attachment(
-                f.read(),
-                maintype="application",
-                subtype="octet-stream",
-                filename=os.path.basename(p),
-            )
-
-
 # --------------------------------------------------------------------
 # SMTP
 # --------------------------------------------------------------------
@@ -62,26 +71,149 @@ def smtp_connect(config: Config):
     user = config.identity.email
     pwd = config.identity.email_pwd
 
-    if use_ssl:
-        s = smtplib.SMTP_SSL(host, port, timeout=60)
-        s.ehlo()
-    else:
-        s = smtplib.SMTP(host, port, timeout=60)
-        s.ehlo()
-        try:
-            s.starttls()
+    with perf.span("connect"):
+        if use_ssl:
+            s = smtplib.SMTP_SSL(host, port, timeout=60)
             s.ehlo()
-        except smtplib.SMTPException:
-            pass
+        else:
+            s = smtplib.SMTP(host, port, timeout=60)
+            s.ehlo()
+            try:
+                s.starttls()
+                s.ehlo()
+            except smtplib.SMTPException:
+                pass
 
-    s.login(user, pwd)  # pyright: ignore[reportArgumentType]
+    with perf.span("auth"):
+        s.login(user, pwd)  # pyright: ignore[reportArgumentType]
     return s
 
 
-def smtp_send_verified(msg: EmailMessage, config: Config):
+def _rset_quietly(s: smtplib.SMTP) -> None:
+    try:
+        s.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+def _send_spooled(s: smtplib.SMTP, msg: EmailMessage, spooled: SpooledMessage, rcpt_options=()) -> None:
+    """
+    Équivalent de s.send_message() pour un message déjà sérialisé dans un
+    spool : le DATA est envoyé par morceaux, sans copie complète en mémoire.
+    """
+    from_addr = parseaddr(msg["Sender"] or msg["From"])[1]
+    to_addrs = [a for _, a in getaddresses(
+        msg.get_all("To", []) + msg.get_all("Cc", []) + msg.get_all("Bcc", [])
+    ) if a]
+
+    s.ehlo_or_helo_if_needed()
+    mail_opts = [f"SIZE={spooled.size}"] if s.has_extn("size") else []
+
+    code, resp = s.mail(from_addr, mail_opts)
+    if code != 250:
+        if code == 421:
+            s.close()
+        else:
+            _rset_quietly(s)
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+    refused = {}
+    for addr in to_addrs:
+        code, resp = s.rcpt(addr, list(rcpt_options))
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+        if code == 421:
+            s.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        _rset_quietly(s)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, resp = s.docmd("data")
+    if code != 354:
+        if code == 421:
+            s.close()
+        else:
+            _rset_quietly(s)
+        raise smtplib.SMTPDataError(code, resp)
+    chunks = spooled.smtp_chunks()
+    chunk = next(chunks)
+    for following in chunks:
+        s.send(chunk)
+        chunk = following
+    # dernier morceau = fin du DATA : au-delà, une coupure laisse l'envoi incertain
+    try:
+        s.send(chunk)
+        code, resp = s.getreply()
+    except OSError as e:
+        s.close()
+        raise DeliveryUnknown(f"pas de réponse après la fin du DATA ({e}), réception incertaine: vérifier avant de renvoyer") from e
+    if code != 250:
+        if code == 421:
+            s.close()
+        else:
+            _rset_quietly(s)
+        raise smtplib.SMTPDataError(code, resp)
+
+
+def _send_on(s: smtplib.SMTP, msg: EmailMessage, config: Config, res: dict, spooled: SpooledMessage | None = None) -> None:
+    """Une transaction MAIL/RCPT/DATA sur une session déjà authentifiée."""
+    feats = getattr(s, "esmtp_features", {}) or {}
+    support_dsn = (hasattr(s, "has_extn") and s.has_extn("dsn")) or ("dsn" in feats)
+
+    rcpt_opts = [config.smtp.dsn_options] if (config.smtp.request_dsn and support_dsn) else None
+    res["used_dsn"] = bool(rcpt_opts)
+
+    def send(rcpt_options=None):
+        with perf.span("send", spooled.size if spooled is not None else 0):
+            _send(rcpt_options)
+
+    def _send(rcpt_options):
+        if spooled is not None:
+            _send_spooled(s, msg, spooled, rcpt_options or ())
+        elif rcpt_options:
+            s.send_message(msg, mail_options=[], rcpt_options=rcpt_options)
+        else:
+            s.send_message(msg, mail_options=[])
+
+    try:
+        send(rcpt_opts)
+        res["accepted"] = True
+    except smtplib.SMTPRecipientsRefused as e:
+        # Si le serveur a interprété NOTIFY comme partie de l'adresse, retente sans DSN
+        err = next(iter(e.recipients.values()))
+        if b"NOTIFY=" in err[1] or "NOTIFY=" in str(err[1]):
+            send()
+            res["accepted"] = True
+            res["used_dsn"] = False
+        else:
+            raise
+
+
+def _is_reconnect_error(e: Exception) -> bool:
+    if isinstance(e, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code in RECONNECT_CODES
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return any(c in RECONNECT_CODES for c, _ in e.recipients.values())
+    return False
+
+
+def smtp_send_verified(
+    msg: EmailMessage,
+    config: Config,
+    pool: SMTPPool | None = None,
+    spooled: SpooledMessage | None = None,
+):
     """
     Envoi SMTP avec DSN si (et seulement si) annoncé par le serveur
     et activé via SMTP_REQUEST_DSN.
+    Si `pool` est fourni, la session est empruntée au pool (pas de nouveau
+    handshake/login) et l'envoi est rejoué une fois sur une session neuve
+    après un 421 ou une déconnexion.
+    Si `spooled` est fourni, c'est lui qui est transmis (msg ne sert alors
+    qu'à l'enveloppe : From / To / Message-ID).
     Retourne un dict {accepted, used_dsn, message_id, copied_sent}.
     """
 
@@ -92,6 +224,19 @@ def smtp_send_verified(msg: EmailMessage, config: Config):
         "copied_sent": False,
     }
 
+    if pool is not None:
+        for attempt in range(2):
+            try:
+                with pool.connection() as s:
+                    _send_on(s, msg, config, res, spooled)
+                break
+            except Exception as e:
+                if attempt == 0 and _is_reconnect_error(e):
+                    ic(f"[SMTP] session perdue ({e}), nouvelle tentative")
+                    continue
+                raise
+        return res
+
     s = smtp_connect(config)
     try:
         try:
@@ -106,27 +251,7 @@ def smtp_send_verified(msg: EmailMessage, config: Config):
             except Exception:
                 pass
 
-        feats = getattr(s, "esmtp_features", {}) or {}
-        support_dsn = (hasattr(s, "has_extn") and s.has_extn("dsn")) or ("dsn" in feats)
-
-        rcpt_opts = [config.smtp.dsn_options] if (config.smtp.request_dsn and support_dsn) else None
-        res["used_dsn"] = bool(rcpt_opts)
-
-        try:
-            if rcpt_opts:
-                s.send_message(msg, mail_options=[], rcpt_options=rcpt_opts)
-            else:
-                s.send_message(msg, mail_options=[])
-            res["accepted"] = True
-        except smtplib.SMTPRecipientsRefused as e:
-            # Si le serveur a interprété NOTIFY comme partie de l'adresse, retente sans DSN
-            err = next(iter(e.recipients.values()))
-            if b"NOTIFY=" in err[1] or "NOTIFY=" in str(err[1]):
-                s.send_message(msg, mail_options=[])
-                res["accepted"] = True
-                res["used_dsn"] = False
-            else:
-                raise
+        _send_on(s, msg, config, res, spooled)
     finally:
         try:
             s.quit()
@@ -135,11 +260,332 @@ def smtp_send_verified(msg: EmailMessage, config: Config):
 
     return res
 
+# --------------------------------------------------------------------
+# COPIE IMAP
+# --------------------------------------------------------------------
+
+def copy_to_imap(
+    msg: EmailMessage,
+    result: dict,
+    config: Config,
+    dev=False,
+    session: IMAPSession | None = None,
+    spooled: SpooledMessage | None = None,
+) -> None:
+    """
+    Range une copie du message envoyé dans le dossier 'Envoyés' et dans
+    config.imap.mailbox_name. Met à jour result["copied_sent"].
+    Avec une session, le spool est envoyé tel quel (APPEND en flux) ; sinon
+    le message est sérialisé une seule fois pour les deux dossiers.
+    Si le serveur rend l'UID du message (UIDPLUS), le second dossier est
+    rempli par UID COPY côté serveur ; à défaut, par un second APPEND.
+    """
+    user = config.identity.email
+    pwd = config.identity.email_pwd
+    server = config.imap.host
+
+    if not (server and user and pwd):
+        return
+
+    if spooled is not None and session is not None:
+        raw = spooled
+    else:
+        raw = spooled.as_bytes() if spooled is not None else msg.as_bytes()
+    size = spooled.size if spooled is not None else len(raw)  # type: ignore[arg-type]
+
+    def resolve_sent():
+        folder, _, _ = find_sent_folder(server, user, pwd, config.imap.sentbox_name, session=session)
+        return folder
+
+    def resolve_apa():
+        folder, _ = find_best_folder(
+                        target_name=config.imap.mailbox_name, 
+                        IMAP_SERVER=server, 
+                        MAIL_USERNAME=user, 
+                        MAIL_PASSWORD=pwd,
+                        session=session)
+        return folder
+
+    def append(folder):
+        if session is not None:
+            return session.append_uid(folder, raw, msg["Message-ID"])
+        return add_email_to_box(server, user, pwd, folder, raw), None
+
+    placed = None   # (dossier, UID) du premier APPEND : les suivants sont des UID COPY
+    for label, resolve in (("Envoyés", resolve_sent), (config.imap.mailbox_name, resolve_apa)):
+        if not label:
+            continue
+        with perf.span("imap_resolve"):
+            folder = resolve()
+        if not folder:
+            if not dev:
+                ic(f"[IMAP] Impossible de déterminer le dossier '{label}'.")
+            continue
+        if placed is not None:
+            # copie côté serveur, sans renvoyer le message
+            with perf.span("imap_copy"):
+                err = session.copy_uid(placed[0], placed[1], folder, msg["Message-ID"])  # type: ignore[union-attr]
+            if err is None:
+                result["copied_sent"] = True
+                continue
+            ic(f"[IMAP] UID COPY impossible ({err}), nouvel APPEND")
+        with perf.span("append", size):
+            err, uid = append(folder)
+        if err and is_stale_folder_error(err):
+            # dossier renommé depuis la mise en cache : le cache a été vidé, on résout à nouveau
+            with perf.span("imap_resolve"):
+                folder = resolve()
+            if folder:
+                with perf.span("append", size):
+                    err, uid = append(folder)
+        if err is None and uid is not None and placed is None:
+            placed = (folder, uid)
+        result["copied_sent"] = (err is None)
+        if not dev and err:
+            ic(f"[IMAP] Append échec: {err}")
+
+
+# --------------------------------------------------------------------
+# COMPOSITION / LIVRAISON D'UN MESSAGE
+# --------------------------------------------------------------------
+
+def _compose(config: Config, ctx: dict) -> EmailMessage:
+    msg = compose_email(config=config, context=ctx)  # From/To/Subject/Body déjà posés
+
+    sender_env = config.identity.email
+    if config.smtp.request_dsn:
+        # Demande d'accusé de lecture (MDN)
+        msg["Disposition-Notification-To"] = sender_env
+        # Variante ancienne encore utilisée
+        msg["Return-Receipt-To"] = sender_env
+    return msg
+
+
+def _split_parts(
+    config: Config,
+    ctx: dict,
+    msg: EmailMessage,
+    attachments: list[str],
+    max_bytes: int,
+    sizes: dict[str, int] | None,
+) -> list[tuple[EmailMessage, list[str]]]:
+    """
+    Un message par lot de pièces jointes, numérotés "(1/3)"... s'il y en a
+    plusieurs. Chaque partie recomposée est mesurée (Message-ID et Date
+    changent d'une partie à l'autre) : si l'une dépasse `max_bytes`, la
+    répartition est refaite avec une marge d'autant.
+    """
+    budget = max_bytes
+    while True:
+        batches = pack_attachments(msg, attachments, budget, sizes)
+        if len(batches) == 1:
+            return [(msg, batches[0])]
+        parts = []
+        for i, batch in enumerate(batches, start=1):
+            part = _compose(config, ctx)
+            subject = part["Subject"]
+            del part["Subject"]
+            part["Subject"] = f"{subject} ({i}/{len(batches)})"
+            parts.append((part, batch))
+        # un fichier seul trop gros part de toute façon dans son propre message
+        over = max((message_size(m, b, sizes) - max_bytes for m, b in parts if len(b) > 1), default=0)
+        if over <= 0:
+            return parts
+        budget -= over
+
+
+@dataclass
+class PreparedEmail:
+    """
+    Un envoi prêt à partir : message(s) composé(s) et déjà sérialisé(s).
+    Plusieurs messages quand le dossier a été découpé.
+    """
+    ctx: dict
+    messages: list[tuple[EmailMessage, SpooledMessage]]
+    size_mb: float
+    tmpdir: str | None = None
+    results: list[dict | None] = field(default_factory=list)
+
+    @property
+    def accepted(self) -> bool:
+        return bool(self.results) and all(r and r["accepted"] for r in self.results)
+
+    def pending_parts(self) -> list[int]:
+        """
+        Index des messages pas encore acceptés (tous au premier envoi) :
+        un nouvel essai après un refus temporaire ne renvoie pas les parties
+        déjà parties.
+        """
+        if len(self.results) != len(self.messages):
+            self.results = [None] * len(self.messages)
+        return [i for i, r in enumerate(self.results) if not (r and r["accepted"])]
+
+    def result(self, config: Config) -> dict:
+        result = {
+            "accepted": self.accepted,
+            "used_dsn": bool(self.results) and all(r and r["used_dsn"] for r in self.results),
+            "message_id": self.ctx.get("message_id"),
+            "copied_sent": bool(self.results) and all(r and r["copied_sent"] for r in self.results),
+        }
+        if config.smtp.request_dsn:
+            result['used_dsn']=True
+        return result
+
+    def close(self) -> None:
+        for _, spooled in self.messages:
+            spooled.close()
+        # Nettoyage zip si créé
+        if self.tmpdir:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+            self.tmpdir = None
+
+
+def prepare_email(config: Config, ctx: dict) -> PreparedEmail:
+    """
+    Étape « préparation » (CPU / disque) : composition, taille exacte,
+    zip ou découpage, sérialisation en spool. Aucun accès réseau.
+    """
+    # 1) Compose le message (subject + corps depuis templates/.env)
+    with perf.span("compose"):
+        msg = _compose(config, ctx)
+    # exposés à l'appelant (suivi de réception)
+    ctx["message_id"] = msg["Message-ID"]
+    ctx["subject"] = msg["Subject"]
+
+    # 2) Pièces jointes : zip ou découpage si trop gros
+    attachments = ctx["attachments"]
+    sizes = ctx.get("sizes")   # tailles du manifeste, si fourni
+    tmpdir = None
+    max_bytes = int(config.smtp.max_mb * 1024 * 1024)
+    parts = [(msg, attachments)]
+
+    size_mb = est_smtp_mb(attachments, config=config, msg=msg, sizes=sizes)
+    if size_mb > config.smtp.max_mb:
+        if config.smtp.oversize_strategy == "split":
+            parts = _split_parts(config, ctx, msg, attachments, max_bytes, sizes)
+        else:
+            # Le zip ramènerait-il le message sous le seuil ? (PDF/JPEG : presque rien à gagner)
+            zip_name = f"{ctx['name']}.zip"
+            projected = estimate_zip_size(attachments)
+            if message_size(msg, [zip_name], {zip_name: projected}) > max_bytes:
+                ctx["zip_stats"] = {"skipped": True, "projected_bytes": projected}
+                parts = _split_parts(config, ctx, msg, attachments, max_bytes, sizes)
+            else:
+                zip_stats = {}
+                with perf.span("zip"):
+                    zipped, tmpdir = zip_all(ctx["name"], attachments, stats=zip_stats)
+                ctx["zip_stats"] = zip_stats
+                parts = [(msg, zipped)]
+                # l'estimation n'est qu'un échantillon : taille réelle du message zippé
+                if message_size(msg, zipped) > max_bytes:
+                    ctx["zip_stats"] = {"skipped": True, "projected_bytes": os.path.getsize(zipped[0])}
+                    shutil.rmtree(tmpdir, ignore_errors=True)
+                    tmpdir = None
+                    parts = _split_parts(config, ctx, msg, attachments, max_bytes, sizes)
+
+    if len(parts) > 1:
+        ctx["message_id"] = parts[0][0]["Message-ID"]
+        ctx["parts"] = [(m["Message-ID"], m["Subject"]) for m, _ in parts]
+    else:
+        ctx.pop("parts", None)   # nouvelle préparation sans découpage
+
+    # Sérialisation unique en flux (spool) : pièces jointes encodées par morceaux
+    prepared = PreparedEmail(ctx=ctx, messages=[], size_mb=size_mb, tmpdir=tmpdir)
+    try:
+        for m, paths in parts:
+            with perf.span("attach"):
+                spooled = SpooledMessage.build(m, paths)
+            prepared.messages.append((m, spooled))
+    except BaseException:
+        prepared.close()
+        raise
+    return prepared
+
+
+def deliver_email(prepared: PreparedEmail, config: Config, smtp_pool: SMTPPool | None = None) -> bool:
+    """Étape « envoi » : SMTP vérifié de chaque message préparé. True si tout est accepté."""
+    def deliver(i):
+        m, spooled = prepared.messages[i]
+        prepared.results[i] = smtp_send_verified(m, config, pool=smtp_pool, spooled=spooled)
+
+    pending = prepared.pending_parts()
+    if len(pending) > 1 and smtp_pool is not None:
+        # les parties partent en parallèle sur les sessions du pool
+        with ThreadPoolExecutor(max_workers=min(len(pending), smtp_pool.size)) as ex:
+            list(ex.map(deliver, pending))
+    else:
+        for i in pending:
+            deliver(i)
+    return prepared.accepted
+
+
+def finish_email(prepared: PreparedEmail, config: Config, dev=False, imap_session: IMAPSession | None = None) -> None:
+    """Étape « suivi » : copies IMAP des messages acceptés, puis libération des spools."""
+    try:
+        if not config.imap.copy_sent:
+            return
+        for (m, spooled), result in zip(prepared.messages, prepared.results):
+            if not (result and result["accepted"]):
+                continue
+            try:
+                copy_to_imap(m, result, config, dev=dev, session=imap_session, spooled=spooled)
+            except Exception as e:
+                # le message est parti : un souci IMAP ne doit pas faire échouer l'envoi
+                if not dev:
+                    ic(f"[IMAP] Copie impossible: {e}")
+    finally:
+        prepared.close()
+
+
+async def deliver_email_async(prepared: PreparedEmail, config: Config, smtp_pool: AsyncSMTPPool) -> bool:
+    """deliver_email sur le moteur asyncio : aucune attente bloquante, aucun thread."""
+    async def deliver(i):
+        m, spooled = prepared.messages[i]
+        prepared.results[i] = await smtp_send_verified_async(m, config, smtp_pool, spooled)
+
+    # toutes les parties vont au bout avant de remonter une erreur (résultats partiels gardés)
+    outcomes = await asyncio.gather(*(deliver(i) for i in prepared.pending_parts()), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return prepared.accepted
+
+
+async def finish_email_async(
+    prepared: PreparedEmail,
+    config: Config,
+    imap_session: IMAPSession,
+    appender: AsyncIMAPSession,
+    dev=False,
+) -> None:
+    """finish_email sur le moteur asyncio (APPEND via `appender`)."""
+    try:
+        if not config.imap.copy_sent:
+            return
+        for (m, spooled), result in zip(prepared.messages, prepared.results):
+            if not (result and result["accepted"]):
+                continue
+            try:
+                await copy_to_imap_async(m, result, config, imap_session, appender, spooled, dev=dev)
+            except Exception as e:
+                # le message est parti : un souci IMAP ne doit pas faire échouer l'envoi
+                if not dev:
+                    ic(f"[IMAP] Copie impossible: {e}")
+    finally:
+        prepared.close()
+
+
 # --------------------------------------------------------------------
 # FONCTION PRINCIPALE D’ENVOI
 # --------------------------------------------------------------------
 
-def send_email(config: Config, ctx=None, dev=False ) -> bool:
+def send_email(
+    config: Config,
+    ctx=None,
+    dev=False,
+    smtp_pool: SMTPPool | None = None,
+    imap_session: IMAPSession | None = None,
+) -> bool:
     """
     ctx : dict contenant au minimum :
         - name
@@ -150,6 +596,10 @@ def send_email(config: Config, ctx=None, dev=False ) -> bool:
         - sender_role
         - attachments : liste de chemins
 
+    smtp_pool : pool de sessions SMTP partagé par le run (optionnel).
+    imap_session : session IMAP persistante partagée par le run (optionnel).
+
+    Enchaîne prepare_email → deliver_email → finish_email.
     Retourne True si SMTP a accepté le message.
     """
 
@@ -167,79 +617,27 @@ def send_email(config: Config, ctx=None, dev=False ) -> bool:
             "attachments": attachments,
         }
 
-    # 1) Compose le message (subject + corps depuis templates/.env)
-    msg = compose_email(config=config, context=ctx)  # From/To/Subject/Body déjà posés
-    mid = msg["Message-ID"]
-
-    sender_env = config.identity.email
-    if config.smtp.request_dsn:
-        # Demande d'accusé de lecture (MDN)
-        msg["Disposition-Notification-To"] = sender_env
-        # Variante ancienne encore utilisée
-        msg["Return-Receipt-To"] = sender_env
-
-    # 2) Pièces jointes + zip si trop gros
-    attachments = ctx["attachments"]
-    tmpdir = None
-
-    size_mb = est_smtp_mb(attachments, config=config)
-    if size_mb > config.smtp.max_mb:
-        attachments, tmpdir = zip_all(ctx["name"], attachments)
-        ctx["attachments"] = attachments
-
-    attach_files(msg, attachments)
-
-
-    # 3) Envoi SMTP vérifié
-    result = smtp_send_verified(msg, config)
-
-    # 4) Copie IMAP “Envoyés” via imap_handler (optionnelle)
-    if config.imap.copy_sent and result["accepted"]:
-        user = config.identity.email
-        pwd = config.identity.email_pwd
-        server = config.imap.host
-
-        if server and user and pwd:
-            sent_folder, _, _ = find_sent_folder(server, user, pwd, config.imap.sentbox_name)
-            APA_folder = config.imap.mailbox_name
-            if sent_folder:
-                err = add_email_to_box(server, user, pwd, sent_folder, msg.as_bytes())
-                result["copied_sent"] = (err is None)
-                if not dev and err:
-                    ic(f"[IMAP] Append échec: {err}")
-            else:
-                if not dev:
-                    ic("[IMAP] Impossible de déterminer le dossier 'Envoyés'.")
-            if APA_folder:
-                APA_folder, _ = find_best_folder(
-                                    target_name=APA_folder, 
-                                    IMAP_SERVER=server, 
-                                    MAIL_USERNAME=user, 
-                                    MAIL_PASSWORD=pwd)
-                err = add_email_to_box(server, user, pwd, APA_folder, msg.as_bytes())
-                result["copied_sent"] = (err is None)
-                if not dev and err:
-                    ic(f"[IMAP] Append échec: {err}")
-            else:
-                if not dev:
-                    ic(f"[IMAP] Impossible de déterminer le dossier '{APA_folder}'.")
-
-    # 5) Nettoyage zip si créé
-    if tmpdir:
-        shutil.rmtree(tmpdir, ignore_errors=True)
-    if config.smtp.request_dsn:
-        result['used_dsn']=True
+    prepared = prepare_email(config, ctx)
+    zipped = prepared.tmpdir is not None
+    n_messages = len(prepared.messages)
+    try:
+        deliver_email(prepared, config, smtp_pool)
+    finally:
+        finish_email(prepared, config, dev=dev, imap_session=imap_session)
+    result = prepared.result(config)
 
-    # 6) Rapport console
+    # Rapport console
     if not dev:
         ic("=== ENVOI ===")
-        ic(f"Message-ID: {mid}")
+        ic(f"Message-ID: {ctx['message_id']}")
         ic(f"SMTP accepté: {result['accepted']}")
         ic(f"DSN utilisé: {result['used_dsn']}")
         ic(f"Copié 'Envoyés' IMAP: {result['copied_sent']}")
-        ic(f"Taille estimée SMTP avant envoi: {size_mb:.2f} MB (seuil {config.smtp.max_mb} MB)")
-        if size_mb > config.smtp.max_mb:
+        ic(f"Taille SMTP avant envoi: {prepared.size_mb:.2f} MB (seuil {config.smtp.max_mb} MB)")
+        if zipped:
             ic("→ Fichiers zippés avant envoi.")
+        if n_messages > 1:
+            ic(f"→ Envoi découpé en {n_messages} messages.")
 
     return bool(result.get("accepted")) # TODO : change to full result and correct subsequent functions
 
@@ -0,0 +1,200 @@
+# smtp_limiter.py
+
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+import smtplib
+from contextlib import asynccontextmanager
+
+from config import Config
+from smtp_pool import DeliveryUnknown
+from icecream import ic
+ic.disable()
+
+# Réponses de « ralentissement » : le serveur refuse pour l'instant, pas pour toujours
+THROTTLE_CODES = (421, 450, 451, 452)
+
+
+def is_deferral(e: BaseException) -> bool:
+    """
+    Vrai pour un refus temporaire (4xx, 421) ou une connexion coupée avant
+    la fin du DATA : à retenter plus tard. Une coupure après (DeliveryUnknown)
+    n'est pas retentée, le message est peut-être déjà parti.
+    """
+    if isinstance(e, DeliveryUnknown):
+        return False
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code in THROTTLE_CODES or 400 <= e.smtp_code < 500
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        codes = [c for c, _ in e.recipients.values()]
+        return bool(codes) and all(400 <= c < 500 for c in codes)
+    return isinstance(e, (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout, asyncio.TimeoutError))
+
+
+def backoff_delay(attempt: int, base: float, cap: float = 120.0) -> float:
+    """Attente avant l'essai n°attempt+1 : exponentielle plafonnée, « full jitter »."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LimitStore:
+    """Plafond de parallélisme appris par serveur SMTP, gardé d'un run à l'autre (JSON)."""
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self._data: dict = {}
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except Exception as e:
+                ic(f"[SMTP] plafonds illisibles, ignorés: {e}")
+
+    def get(self, host: str) -> int | None:
+        entry = self._data.get(host.lower())
+        return int(entry["ceiling"]) if entry else None
+
+    def set(self, host: str, ceiling: int) -> None:
+        self._data[host.lower()] = {"ceiling": int(ceiling), "t": time.time()}
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, indent=1)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            ic(f"[SMTP] plafond non enregistré: {e}")
+
+
+class AdaptiveLimiter:
+    """
+    Nombre d'envois SMTP simultanés ajusté en AIMD d'après les réponses du
+    serveur :
+    - +1 après une « fenêtre » (autant d'envois réussis que la limite) si le
+      débit par envoi reste sain (au moins `healthy_ratio` du meilleur
+      observé : ajouter une connexion ne fait pas que partager le tuyau)
+    - ×`decrease` sur un ralentissement (421/4xx, connexion coupée), une
+      seule fois par limite : les échecs simultanés d'une même vague ne
+      divisent pas plusieurs fois ; ensuite la limite ne remonte plus
+      au-dessus du dernier niveau sain pendant ce run
+    Le plus haut niveau sain est gardé dans `store` pour le run suivant.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        maximum: int,
+        minimum: int = 1,
+        decrease: float = 0.5,
+        healthy_ratio: float = 0.5,
+        host: str = "",
+        store: LimitStore | None = None,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.decrease = decrease
+        self.healthy_ratio = healthy_ratio
+        self.host = host
+        self.store = store
+
+        self._cond = asyncio.Condition()
+        self._in_flight = 0
+        self._epoch = 0             # incrémenté à chaque changement de limite
+        self._window = 0            # envois réussis depuis le dernier changement
+        self._rate: float | None = None   # débit par envoi (EWMA, octets/s)
+        self._best_rate = 0.0
+        self._throttled = False
+
+        self.initial = self.limit
+        self.peak = self.limit
+        self.ceiling: int | None = None   # plus haut niveau sans ralentissement
+        self.stats = {"throttles": 0, "retries": 0, "increases": 0, "decreases": 0}
+
+    @classmethod
+    def from_config(cls, config: Config) -> "AdaptiveLimiter":
+        store = LimitStore(config.smtp.limits_path)
+        learned = store.get(config.smtp.host)
+        return cls(
+            initial=learned or config.smtp.concurrency,
+            maximum=config.smtp.max_concurrency,
+            host=config.smtp.host,
+            store=store,
+        )
+
+    # ------------------------------------------------------------
+    # Emprunt
+    # ------------------------------------------------------------
+
+    @asynccontextmanager
+    async def slot(self):
+        """Attend une place sous la limite courante ; rend l'époque (à passer aux retours)."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            yield self._epoch
+        finally:
+            async with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    # ------------------------------------------------------------
+    # Retours du serveur
+    # ------------------------------------------------------------
+
+    def on_success(self, epoch: int, nbytes: int, seconds: float) -> None:
+        if seconds > 0 and nbytes > 0:
+            rate = nbytes / seconds
+            self._rate = rate if self._rate is None else 0.8 * self._rate + 0.2 * rate
+            self._best_rate = max(self._best_rate, self._rate)
+        if epoch != self._epoch:
+            return
+        self._window += 1
+        cap = self.ceiling if self._throttled else self.maximum
+        if self._window < self.limit or self.limit >= cap:  # type: ignore[operator]
+            return
+        healthy = self._rate is None or self._rate >= self.healthy_ratio * self._best_rate
+        if not healthy:
+            self._window = 0
+            return
+        self.ceiling = max(self.ceiling or 0, self.limit)
+        self._set_limit(self.limit + 1)
+        self.stats["increases"] += 1
+
+    def on_throttle(self, epoch: int) -> None:
+        self.stats["throttles"] += 1
+        if epoch != self._epoch:
+            return  # déjà réduit pour cette vague
+        self._throttled = True
+        self.ceiling = max(self.minimum, min(self.ceiling or self.limit, self.limit - 1))
+        self._set_limit(max(self.minimum, int(self.limit * self.decrease)))
+        self.stats["decreases"] += 1
+        ic(f"[SMTP] ralentissement, limite ramenée à {self.limit}")
+
+    def _set_limit(self, value: int) -> None:
+        self.limit = value
+        self.peak = max(self.peak, value)
+        self._epoch += 1
+        self._window = 0
+
+    # ------------------------------------------------------------
+    # Fin de run
+    # ------------------------------------------------------------
+
+    def remember(self) -> None:
+        """Enregistre le plafond appris (le plus haut niveau sain observé)."""
+        if self.store is None:
+            return
+        ceiling = self.ceiling if self.ceiling is not None else self.limit
+        self.store.set(self.host, max(self.minimum, ceiling))
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"SMTP adaptatif: limite {self.initial}→{self.limit} (pic {self.peak}, max {self.maximum}), "
+            f"{st['throttles']} ralentissements, {st['retries']} nouveaux essais"
+        )
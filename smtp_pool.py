@@ -0,0 +1,181 @@
+# smtp_pool.py
+
+import time
+import smtplib
+import threading
+from contextlib import contextmanager
+
+from config import Config
+from icecream import ic
+ic.disable()
+
+# Codes SMTP qui signifient "la session est morte, reconnecte-toi"
+RECONNECT_CODES = (421,)
+
+
+class DeliveryUnknown(smtplib.SMTPException):
+    """
+    Connexion perdue une fois la fin du DATA (<CRLF>.<CRLF>) transmise : le
+    serveur a peut-être déjà accepté le message. Jamais rejoué automatiquement
+    (le destinataire le recevrait deux fois).
+    """
+
+
+class SMTPPool:
+    """
+    Pool thread-safe de sessions SMTP authentifiées, partagé par tous les
+    envois d'un run.
+
+    - taille max = config.smtp.concurrency (une session par worker)
+    - plusieurs transactions par session (RSET entre deux envois)
+    - NOOP sur les sessions restées inactives plus de `idle_check` secondes
+    - les sessions mortes (421, déconnexion) sont jetées et recréées
+    """
+
+    def __init__(self, config: Config, size: int | None = None, idle_check: float = 30.0):
+        self.config = config
+        self.size = max(1, size or config.smtp.concurrency)
+        self.idle_check = idle_check
+
+        self._idle: list[tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+        self.stats = {
+            "connections": 0,     # sessions ouvertes (handshake + login)
+            "reused": 0,          # transactions servies par une session existante
+            "transactions": 0,    # envois effectués via le pool
+            "reconnects": 0,      # sessions jetées puis recréées (421, NOOP KO...)
+            "noop_failures": 0,
+        }
+
+    # ------------------------------------------------------------
+    # Connexions
+    # ------------------------------------------------------------
+
+    def _open(self) -> smtplib.SMTP:
+        # import local : send_email importe ce module
+        from send_email import smtp_connect
+
+        s = smtp_connect(self.config)
+        with self._lock:
+            self.stats["connections"] += 1
+        return s
+
+    @staticmethod
+    def _drop(s: smtplib.SMTP) -> None:
+        try:
+            s.quit()
+        except Exception:
+            try:
+                s.close()
+            except Exception:
+                pass
+
+    def _healthy(self, s: smtplib.SMTP, last_used: float) -> bool:
+        if time.monotonic() - last_used < self.idle_check:
+            return True
+        try:
+            code, _ = s.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self._open()
+
+            s, last_used = item
+            if self._healthy(s, last_used):
+                with self._lock:
+                    self.stats["reused"] += 1
+                return s
+
+            with self._lock:
+                self.stats["noop_failures"] += 1
+                self.stats["reconnects"] += 1
+            self._drop(s)
+
+    def _checkin(self, s: smtplib.SMTP) -> None:
+        # RSET : remet la session à zéro pour la transaction suivante
+        try:
+            code, _ = s.rset()
+            ok = code == 250
+        except Exception:
+            ok = False
+
+        with self._lock:
+            if ok and not self._closed:
+                self._idle.append((s, time.monotonic()))
+                return
+        self._drop(s)
+
+    def discard(self, s: smtplib.SMTP) -> None:
+        """Jette une session qui a renvoyé 421 / s'est déconnectée."""
+        with self._lock:
+            self.stats["reconnects"] += 1
+        self._drop(s)
+
+    # ------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------
+
+    @contextmanager
+    def connection(self):
+        """
+        Prête une session SMTP authentifiée le temps d'une transaction.
+        Si la transaction lève une erreur de connexion, la session est jetée
+        au lieu d'être remise dans le pool.
+        """
+        self._slots.acquire()
+        try:
+            s = self._checkout()
+            with self._lock:
+                self.stats["transactions"] += 1
+            try:
+                yield s
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code in RECONNECT_CODES:
+                    self.discard(s)
+                else:
+                    self._checkin(s)
+                raise
+            except smtplib.SMTPRecipientsRefused as e:
+                codes = {c for c, _ in e.recipients.values()}
+                if codes & set(RECONNECT_CODES):
+                    self.discard(s)
+                else:
+                    self._checkin(s)
+                raise
+            except BaseException:
+                # déconnexion, timeout socket, ou état inconnu : on ne réutilise pas
+                self.discard(s)
+                raise
+            else:
+                self._checkin(s)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for s, _ in idle:
+            self._drop(s)
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"SMTP pool: {st['transactions']} transactions, {st['connections']} connexions, "
+            f"{st['reused']} réutilisations, {st['reconnects']} reconnexions"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,42 @@
+# tests/conftest.py
+
+"""
+Racine du dépôt dans sys.path : les modules (à plat, sans paquet)
+s'importent directement depuis les tests. Fixture `make_config` : une
+Config complète, hors réseau.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config, SMTPConfig, IMAPConfig, PathsConfig, IdentityConfig  # noqa: E402
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """Config d'envoi : templates ASH du dépôt, Protégés et logs dans tmp_path, champs SMTP au choix."""
+    def make(**smtp) -> Config:
+        templates = Config.find_templates("ASH")
+        templates.TEMPLATE_DIR = os.path.join(ROOT, templates.TEMPLATE_DIR)
+        return Config(
+            smtp=SMTPConfig(**{
+                "host": "127.0.0.1", "port": 2525, "use_ssl": False, "request_dsn": False,
+                "max_mb": 19, "concurrency": 1, "b64_overhead": 1.37, "dsn_options": "",
+                "mdn_requested": False, **smtp,
+            }),
+            imap=IMAPConfig(host="127.0.0.1", mailbox_name="INBOX/ASH", sentbox_name=None, copy_sent=False),
+            paths=PathsConfig(
+                proteges_dir=str(tmp_path / "Protégés"), log_dir=str(tmp_path / "logs"), test_mode=1,
+            ),
+            identity=IdentityConfig(
+                email="moi@example.org", email_pwd="x", emailrec="dest@example.org",
+                name_sender="Moi", role="Mandataire",
+            ),
+            template=templates,
+        )
+    return make
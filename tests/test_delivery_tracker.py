@@ -0,0 +1,90 @@
+# tests/test_delivery_tracker.py
+
+"""
+Rapprochement des messages reçus et des envois (DeliveryTracker._match),
+sans serveur IMAP.
+
+    python -m pytest -q tests
+"""
+
+from delivery_tracker import DeliveryTracker
+
+
+def _tracker() -> DeliveryTracker:
+    t = DeliveryTracker("imap.example.org", "moi@example.org", "x", "INBOX")
+    t.expect("Dupont", "<1@example.org>", "Rapport trimestriel Dupont")
+    t.expect("Dupont Jean", "<2@example.org>", "Rapport trimestriel Dupont Jean")
+    return t
+
+
+def _confirmed(t: DeliveryTracker) -> dict:
+    return {p: r["uid"] for p, r in t.report().items() if r["confirmed"]}
+
+
+def test_message_id_exact():
+    t = _tracker()
+    # sujet de l'autre protégé, mais le Message-ID tranche
+    t._match(10, {"message-id": "<2@example.org>", "subject": "Rapport trimestriel Dupont"})
+    assert _confirmed(t) == {"Dupont Jean": 10}
+
+
+def test_message_id_dans_references():
+    t = _tracker()
+    t._match(11, {"message-id": "<x@ailleurs>", "references": "<0@a> <1@example.org>", "subject": "Re: autre"})
+    assert _confirmed(t) == {"Dupont": 11}
+
+
+def test_sujet_contenu_dans_un_autre_ne_confirme_pas():
+    t = _tracker()
+    t._match(12, {"message-id": "<x@ailleurs>", "subject": "Rapport trimestriel Dupont Jean"})
+    assert _confirmed(t) == {"Dupont Jean": 12}
+
+
+def test_sujet_identique_avec_prefixe():
+    t = _tracker()
+    t._match(13, {"subject": "TR: RE:  rapport trimestriel   DUPONT"})
+    assert _confirmed(t) == {"Dupont": 13}
+
+
+def test_sujet_partage_ignore():
+    t = DeliveryTracker("imap.example.org", "moi@example.org", "x", "INBOX")
+    t.expect("A", "<1@example.org>", "Rapport")
+    t.expect("B", "<2@example.org>", "Rapport")
+    t._match(14, {"subject": "Rapport"})
+    assert _confirmed(t) == {}
+
+
+def _split_tracker() -> DeliveryTracker:
+    t = DeliveryTracker("imap.example.org", "moi@example.org", "x", "INBOX")
+    t.expect("Dupont", "<1@example.org>", "Rapport Dupont", [
+        ("<1@example.org>", "Rapport Dupont (1/3)"),
+        ("<2@example.org>", "Rapport Dupont (2/3)"),
+        ("<3@example.org>", "Rapport Dupont (3/3)"),
+    ])
+    return t
+
+
+def test_envoi_decoupe_confirme_a_la_derniere_partie():
+    t = _split_tracker()
+    t._match(20, {"message-id": "<1@example.org>", "subject": "Rapport Dupont (1/3)"})
+    t._match(21, {"message-id": "<3@example.org>", "subject": "Rapport Dupont (3/3)"})
+    assert _confirmed(t) == {}
+    assert t._outstanding()[0]["message_id"] == "<2@example.org>"
+    # partie 2 reconnue au sujet (Message-ID réécrit en route)
+    t._match(22, {"message-id": "<x@ailleurs>", "subject": "Rapport Dupont (2/3)"})
+    report = t.report()["Dupont"]
+    assert report["confirmed"] and report["uid"] == 20
+    assert [(p["uid"], p["confirmed"]) for p in report["parts"]] == [(20, True), (22, True), (21, True)]
+
+
+def test_envoi_decoupe_partie_manquante():
+    t = _split_tracker()
+    t._match(20, {"message-id": "<1@example.org>"})
+    t._match(21, {"message-id": "<2@example.org>"})
+    report = t.report()["Dupont"]
+    assert not report["confirmed"] and report["confirmed_at"] is None
+    assert [p["confirmed"] for p in report["parts"]] == [True, True, False]
+
+
+def test_envoi_simple_sans_detail_des_parties():
+    assert "parts" not in _tracker().report()["Dupont"]
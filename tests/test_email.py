@@ -0,0 +1,57 @@
+# tests/test_email.py
+
+"""
+Corps texte de Email.compose_email : template converti une fois, valeurs
+HTML converties à chaque message.
+
+    python -m pytest -q tests
+"""
+
+from types import SimpleNamespace
+
+from Email import compose_email
+from email_utils import html_to_text
+
+
+def _config(template_dir: str):
+    return SimpleNamespace(
+        template=SimpleNamespace(
+            TEMPLATE_DIR=template_dir,
+            subject_template_name="subject.txt",
+            body_html_template_name="body.html",
+        ),
+        identity=SimpleNamespace(email="expediteur@example.org", emailrec="dest@example.org"),
+    )
+
+
+def _compose(tmp_path, body_html: str, context: dict):
+    (tmp_path / "subject.txt").write_text("Rapport {name}\n", encoding="utf-8")
+    (tmp_path / "body.html").write_text(body_html, encoding="utf-8")
+    msg = compose_email(_config(str(tmp_path)), context)
+    text = msg.get_body(preferencelist=("plain",)).get_content().strip()
+    html = msg.get_body(preferencelist=("html",)).get_content()
+    return text, html
+
+
+def test_valeurs_html_converties_dans_le_corps_texte(tmp_path):
+    body = "<p>Bonjour <strong>$name</strong> &amp; co,</p><p>Note : $note</p>"
+    ctx = {"name": "Dupont &amp; fils", "note": "<em>urgent</em><br>à lire", "tri": 3}
+    text, html = _compose(tmp_path, body, ctx)
+
+    assert text == "Bonjour Dupont & fils & co,\n\nNote : urgent\nà lire"
+    # même résultat que la conversion du HTML déjà substitué
+    assert text == html_to_text(html)
+    # le corps HTML garde les valeurs telles quelles
+    assert "<strong>Dupont &amp; fils</strong>" in html
+
+
+def test_valeurs_texte_inchangees(tmp_path):
+    text, _ = _compose(tmp_path, "<p>Bonjour $name,</p><p>T$tri</p>", {"name": "Jeanne < Paul", "tri": 3})
+    assert text == "Bonjour Jeanne < Paul,\n\nT3"
+
+
+def test_dollars_litteraux(tmp_path):
+    body = "<p>Prix : 5$$ ou 6&#36; ($$name), &#36;name reste tel quel</p><p>${name}&nbsp;: $tri</p>"
+    text, html = _compose(tmp_path, body, {"name": "Dupont", "tri": 3})
+    assert text == "Prix : 5$ ou 6$ ($name), $name reste tel quel\n\nDupont\xa0: 3"
+    assert text == html_to_text(html)
@@ -0,0 +1,117 @@
+# tests/test_folder_watch.py
+
+"""
+StableFolders.ready : un dossier de protégé part quand il est complet et
+n'a plus bougé depuis `settle` s (horloge passée explicitement).
+
+    python -m pytest -q tests
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import folder_watch
+from folder_watch import StableFolders
+
+SETTLE = 60.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge de folder_watch (touch / retry) ; ready() la reçoit en argument."""
+    now = [1000.0]
+    monkeypatch.setattr(folder_watch, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def stable(tmp_path, clock):
+    return StableFolders(str(tmp_path), settle=SETTLE)
+
+
+def _write(root, name: str, filename: str, data: bytes = b"x", mtime_ns: int | None = None) -> None:
+    folder = root / name
+    folder.mkdir(exist_ok=True)
+    path = folder / filename
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_pret_apres_stabilisation(tmp_path, stable, clock):
+    _write(tmp_path, "Dupont", "releve.pdf")
+    stable.touch("Dupont")
+    t0 = clock[0]
+    assert stable.ready(t0) == []            # premier relevé de l'état
+    assert stable.ready(t0 + SETTLE - 1) == []
+    assert stable.ready(t0 + SETTLE) == ["Dupont"]
+    assert stable.pending == 0
+    assert stable.ready(t0 + 2 * SETTLE) == []
+
+
+def test_dossier_vide_jamais_propose(tmp_path, stable, clock):
+    (tmp_path / "Vide").mkdir()
+    stable.touch("Vide")
+    t0 = clock[0]
+    stable.ready(t0)
+    assert stable.ready(t0 + SETTLE) == []
+
+
+def test_fichier_partiel_bloque(tmp_path, stable, clock):
+    _write(tmp_path, "Dupont", "releve.pdf")
+    _write(tmp_path, "Dupont", "budget.xlsx.part")
+    stable.touch("Dupont")
+    t0 = clock[0]
+    stable.ready(t0)
+    assert stable.ready(t0 + 10 * SETTLE) == []
+    # copie terminée : renommage, puis de nouveau `settle` s d'attente
+    os.rename(tmp_path / "Dupont" / "budget.xlsx.part", tmp_path / "Dupont" / "budget.xlsx")
+    t1 = t0 + 10 * SETTLE
+    assert stable.ready(t1 + 1) == []
+    assert stable.ready(t1 + 1 + SETTLE) == ["Dupont"]
+
+
+def test_modification_relance_l_attente(tmp_path, stable, clock):
+    _write(tmp_path, "Dupont", "releve.pdf", b"v1", mtime_ns=1)
+    stable.touch("Dupont")
+    t0 = clock[0]
+    stable.ready(t0)
+    _write(tmp_path, "Dupont", "releve.pdf", b"v2 plus long", mtime_ns=2)
+    assert stable.ready(t0 + SETTLE) == []   # a bougé : on repart de là
+    assert stable.ready(t0 + 2 * SETTLE - 1) == []
+    assert stable.ready(t0 + 2 * SETTLE) == ["Dupont"]
+
+
+def test_deja_envoye_pas_repropose(tmp_path, stable, clock):
+    _write(tmp_path, "Dupont", "releve.pdf", mtime_ns=1)
+    stable.touch("Dupont")
+    t0 = clock[0]
+    stable.ready(t0)
+    assert stable.ready(t0 + SETTLE) == ["Dupont"]
+    stable.sent(["Dupont"])
+    # événement sans changement de contenu (ex. lecture, attributs)
+    stable.touch("Dupont")
+    stable.ready(t0 + SETTLE)
+    assert stable.ready(t0 + 3 * SETTLE) == []
+    # nouvelle pièce : reproposé
+    _write(tmp_path, "Dupont", "budget.xlsx", mtime_ns=2)
+    stable.touch("Dupont")
+    stable.ready(t0 + 3 * SETTLE)
+    assert stable.ready(t0 + 4 * SETTLE) == ["Dupont"]
+
+
+def test_nouvel_essai_apres_echec(tmp_path, stable, clock):
+    _write(tmp_path, "Dupont", "releve.pdf")
+    stable.touch("Dupont")
+    t0 = clock[0]
+    stable.ready(t0)
+    assert stable.ready(t0 + SETTLE) == ["Dupont"]
+    clock[0] = t0 + SETTLE
+    stable.retry(["Dupont"], delay=300)
+    assert stable.pending == 1
+    # dossier inchangé, mais pas avant le délai
+    assert stable.ready(clock[0] + 299) == []
+    stable.ready(clock[0] + 300)
+    assert stable.ready(clock[0] + 300 + SETTLE) == ["Dupont"]
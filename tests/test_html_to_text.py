@@ -0,0 +1,76 @@
+# tests/test_html_to_text.py
+
+"""
+Sorties de référence de email_utils.html_to_text (bench/golden) et cas
+particuliers du convertisseur.
+
+    python -m pytest -q tests
+"""
+
+import os
+
+import pytest
+
+from bench.html_to_text_bench import _regex_html_to_text
+from email_utils import html_to_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN = os.path.join(ROOT, "bench", "golden")
+SOURCES = {
+    "ASH_body": os.path.join(ROOT, "templates", "ASH_body.html"),
+    "structures": os.path.join(GOLDEN, "structures.html"),
+}
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", sorted(SOURCES))
+def test_golden(name):
+    expected = _read(os.path.join(GOLDEN, f"{name}.txt"))
+    assert html_to_text(_read(SOURCES[name])) + "\n" == expected
+
+
+def test_ash_body_identique_a_l_ancien_rendu():
+    body = _read(SOURCES["ASH_body"])
+    assert html_to_text(body) == _regex_html_to_text(body)
+
+
+def test_listes_imbriquees_et_tableau():
+    html = (
+        "<ul><li>a<ul><li>b</li></ul></li></ul>"
+        "<ol><li>un<li>deux</ol>"
+        "<table><tr><th>Poste</th><th>Montant</th></tr><tr><td>Loyer</td><td>650</td></tr></table>"
+    )
+    assert html_to_text(html) == "- a\n  - b\n\n1. un\n2. deux\n\nPoste | Montant\nLoyer | 650"
+
+
+def test_balises_en_majuscules():
+    assert html_to_text("<P>Bonjour</P><UL><Li>x</LI></UL>") == html_to_text("<p>Bonjour</p><ul><li>x</li></ul>")
+
+
+def test_liens_script_et_entites():
+    html = (
+        '<p><a href="https://ex.org/?a=1&amp;b=2">portail</a> '
+        '<a href="mailto:c@ex.org">c@ex.org</a> <a href="#haut">haut</a></p>'
+        "<script>var x = '<p>non</p>';</script><p>&eacute;t&eacute;</p>"
+    )
+    assert html_to_text(html) == "portail (https://ex.org/?a=1&b=2) c@ex.org haut\n\nété"
+
+
+def test_majuscules_attributs_et_chevrons():
+    html = '<TABLE class="t"><TR><TD title="a > b">x<TD>y</TABLE><p>1 < 2 et <img alt="<logo>"> 3 > 2</p>'
+    assert html_to_text(html) == "x | y\n\n1 < 2 et <logo> 3 > 2"
+
+
+@pytest.mark.parametrize("small", [
+    _read(SOURCES["structures"]),
+    "<ul><li>a<ol><li>un<li>deux</ol></li><li>b</li></ul>"
+    "<table><tr><th>Poste</th><th>Montant</th></tr><tr><td>Loyer</td><td>650</td></tr></table>",
+])
+def test_meme_rendu_quelle_que_soit_la_taille(small):
+    # gros template = mêmes blocs répétés : rendu = rendus des blocs, séparés par une ligne vide
+    n = 100_000 // len(small) + 1
+    assert html_to_text(small * n) == "\n\n".join([html_to_text(small)] * n)
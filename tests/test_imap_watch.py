@@ -0,0 +1,51 @@
+# tests/test_imap_watch.py
+
+"""
+IDLE de MailboxWatcher contre un serveur minimal local (sans SSL).
+
+    python -m pytest -q tests
+"""
+
+import time
+import socket
+import imaplib
+import threading
+
+from imap_watch import MailboxWatcher
+
+
+def _serve(srv: socket.socket, idle_reply: bytes) -> None:
+    conn, _ = srv.accept()
+    with conn, conn.makefile("rb") as f:
+        conn.sendall(b"* OK [CAPABILITY IMAP4rev1 IDLE] pret\r\n")
+        while line := f.readline():
+            tag = line.split()[0]
+            if b" IDLE" in line:
+                conn.sendall(idle_reply)   # continuation et notification dans le même envoi
+                f.readline()               # DONE
+            conn.sendall(tag + b" OK fait\r\n")
+            if b" LOGOUT" in line:
+                return
+
+
+def _watcher(idle_reply: bytes) -> MailboxWatcher:
+    srv = socket.create_server(("127.0.0.1", 0))
+    threading.Thread(target=_serve, args=(srv, idle_reply), daemon=True).start()
+    w = MailboxWatcher("127.0.0.1", "moi", "x", "INBOX")
+    w.imap = imaplib.IMAP4("127.0.0.1", srv.getsockname()[1])
+    return w
+
+
+def test_idle_voit_une_notification_deja_en_tampon():
+    w = _watcher(b"+ idling\r\n* 1 EXISTS\r\n")
+    start = time.monotonic()
+    assert w._idle(5) is True
+    assert time.monotonic() - start < 2
+    w.close()
+
+
+def test_idle_sans_changement_attend_puis_reste_utilisable():
+    w = _watcher(b"+ idling\r\n")
+    assert w._idle(0.3) is False
+    assert w.imap.noop()[0] == "OK"
+    w.close()
@@ -0,0 +1,78 @@
+# tests/test_mime_stream.py
+
+"""
+Taille des messages (mime_stream) et découpage des gros dossiers : chaque
+partie envoyée reste sous SMTP_MAX_MB, suffixe « (i/n) » compris.
+
+    python -m pytest -q tests
+"""
+
+import random
+
+import pytest
+
+from mime_stream import SpooledMessage, message_size, pack_attachments
+from send_email import _compose, prepare_email
+from Rapports_trimestriel import _make_ctx
+
+KB = 1024
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Douze pièces jointes incompressibles de 20 à 60 Ko."""
+    rnd = random.Random(1)
+    paths = []
+    for i in range(12):
+        path = tmp_path / f"releve_{i:02d}.pdf"
+        path.write_bytes(rnd.randbytes(rnd.randint(20 * KB, 60 * KB)))
+        paths.append(str(path))
+    return paths
+
+
+def _ctx(config, files):
+    return _make_ctx("Dupont", 3, 2026, "T3 2026", files, config)
+
+
+def test_taille_exacte_sans_construire(make_config, files):
+    config = make_config()
+    msg = _compose(config, _ctx(config, files))
+    for paths in ([], files[:1], files):
+        spooled = SpooledMessage.build(msg, paths)
+        try:
+            assert message_size(msg, paths) == spooled.size
+        finally:
+            spooled.close()
+
+
+@pytest.mark.parametrize("max_kb", range(90, 400, 23))
+def test_lots_sous_le_seuil(make_config, files, max_kb):
+    config = make_config()
+    msg = _compose(config, _ctx(config, files))
+    max_bytes = max_kb * KB
+    batches = pack_attachments(msg, files, max_bytes)
+    assert sorted(p for batch in batches for p in batch) == sorted(files)
+    for i, batch in enumerate(batches, start=1):
+        numbered = _compose(config, _ctx(config, files))
+        subject = numbered["Subject"]
+        del numbered["Subject"]
+        numbered["Subject"] = f"{subject} ({i}/{len(batches)})"
+        assert len(batch) == 1 or message_size(numbered, batch) <= max_bytes
+
+
+@pytest.mark.parametrize("strategy", ["split", "zip"])
+@pytest.mark.parametrize("max_kb", range(90, 400, 37))
+def test_parties_envoyees_sous_le_seuil(make_config, files, strategy, max_kb):
+    config = make_config(max_mb=max_kb / 1024, oversize_strategy=strategy)
+    ctx = _ctx(config, files)
+    prepared = prepare_email(config, ctx)
+    try:
+        max_bytes = int(config.smtp.max_mb * 1024 * 1024)
+        assert len(prepared.messages) > 1   # pièces incompressibles : découpage même en « zip »
+        for msg, spooled in prepared.messages:
+            assert spooled.size <= max_bytes, msg["Subject"]
+        assert ctx["parts"] == [(m["Message-ID"], m["Subject"]) for m, _ in prepared.messages]
+        n = len(prepared.messages)
+        assert [m["Subject"].endswith(f" ({i}/{n})") for i, (m, _) in enumerate(prepared.messages, 1)] == [True] * n
+    finally:
+        prepared.close()
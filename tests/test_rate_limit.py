@@ -0,0 +1,81 @@
+# tests/test_rate_limit.py
+
+"""
+Seau à jetons et quotas d'envoi (rate_limit), sur une horloge simulée.
+
+    python -m pytest -q tests
+"""
+
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket, SendQuota
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge de rate_limit avancée à la main ; asyncio.sleep l'avance sans attendre."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+
+    async def sleep(seconds):
+        now[0] += max(seconds, 1e-6)   # une vraie attente dure toujours un peu
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", sleep)
+    return now
+
+
+def test_seau_plein_puis_debit(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4.0)
+    assert bucket.delay(4) == 0.0
+    bucket.take(4)
+    assert bucket.delay(1) == pytest.approx(0.5)
+    clock[0] += 1.0
+    assert bucket.delay(2) == 0.0
+    # jamais plus que la capacité en réserve
+    clock[0] += 60.0
+    bucket.take(4)
+    assert bucket.delay(1) == pytest.approx(0.5)
+
+
+def test_demande_plus_grosse_que_le_seau(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2.0)
+    # part dès que le seau est plein...
+    assert bucket.delay(10) == 0.0
+    bucket.take(10)
+    # ...et la dette se rembourse au débit du seau
+    assert bucket.delay(1) == pytest.approx(9.0)
+
+
+def test_quota_sans_limite(clock):
+    quota = SendQuota()
+    assert not quota.enabled
+    assert asyncio.run(quota.acquire(100, 10**9)) == 0.0
+    assert quota.predict(100, 10**9) == 0.0
+
+
+def test_quota_messages_par_minute(clock):
+    quota = SendQuota(msgs_per_min=60)
+    start = clock[0]
+
+    async def send(n):
+        for _ in range(n):
+            await quota.acquire(1, 1000)
+
+    asyncio.run(send(30))
+    # 6 messages d'avance (10 %), puis 0,9 message/s
+    assert clock[0] - start == pytest.approx(24 / 0.9)
+    assert quota.predict(30, 30 * 1000) == pytest.approx(24 / 0.9)
+    assert quota.stats["waits"] == 24
+    assert quota.stats["waited_s"] == pytest.approx(24 / 0.9)
+
+
+def test_quota_mo_par_heure(clock):
+    quota = SendQuota(mb_per_hour=100)
+    mb = 1024 * 1024
+    # 10 Mo d'avance, puis 90 Mo/h : 25 Mo à envoyer → 15 Mo à 0,025 Mo/s
+    assert quota.predict(5, 25 * mb) == pytest.approx(600.0)
+    waited = asyncio.run(quota.acquire(1, 25 * mb))
+    assert waited == 0.0
+    assert asyncio.run(quota.acquire(1, mb)) == pytest.approx(15 * 40 + 40)
@@ -0,0 +1,81 @@
+# tests/test_run_journal.py
+
+"""
+Journal des envois (RunJournal) et reprise d'un run (--resume) : ce qui est
+accepté ou incertain n'est pas renvoyé.
+
+    python -m pytest -q tests
+"""
+
+import asyncio
+
+from run_journal import RunJournal, fingerprint, PENDING, ACCEPTED, FAILED, UNKNOWN
+from Rapports_trimestriel import effectuer_rapport_async_limited, current_trimester
+
+
+def _write(path, text: str) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_etats_durables_et_tentatives(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    with RunJournal(path) as journal:
+        journal.record("Dupont", "fp1", status=PENDING, run_dir="run1")
+        journal.record("Dupont", "fp1", status=FAILED, error="smtp")
+        journal.record("Dupont", "fp1", status=PENDING, run_dir="run2", error=None)
+        journal.record("Dupont", "fp1", status=ACCEPTED, message_id="<1@example.org>", archived=True)
+
+    with RunJournal(path, read_only=True) as journal:
+        entry = journal.get("Dupont", "fp1")
+        assert (entry["status"], entry["attempts"], entry["archived"]) == (ACCEPTED, 2, 1)
+        assert (entry["run_dir"], entry["error"], entry["message_id"]) == ("run2", None, "<1@example.org>")
+        assert journal.counts() == {ACCEPTED: 1}
+
+
+def test_has_accepted_quelles_que_soient_les_pieces(tmp_path):
+    with RunJournal(str(tmp_path / "journal.sqlite")) as journal:
+        journal.record("Dupont", "ancien", status=ACCEPTED)
+        journal.record("Martin", "fp", status=FAILED)
+        journal.record("Durand", "fp", status=UNKNOWN)
+
+        assert journal.has_accepted("Dupont")
+        assert not journal.is_accepted("Dupont", "nouveau")
+        assert not journal.has_accepted("Martin")
+        assert not journal.has_accepted("Durand")
+        assert journal.has_status("Durand", ACCEPTED, UNKNOWN)
+        assert not journal.has_status("Inconnu", ACCEPTED, UNKNOWN)
+
+
+def test_empreinte_noms_et_contenus(tmp_path):
+    a = _write(tmp_path / "a" / "releve.pdf", "un")
+    b = _write(tmp_path / "a" / "budget.xlsx", "deux")
+    same = fingerprint([b, a])
+    assert fingerprint([a, b]) == same
+    # même contenu ailleurs : même empreinte ; contenu modifié : autre empreinte
+    assert fingerprint([_write(tmp_path / "b" / "releve.pdf", "un"), b]) == same
+    _write(tmp_path / "a" / "releve.pdf", "un bis")
+    assert fingerprint([a, b]) != same
+
+
+def test_reprise_saute_acceptes_et_incertains(tmp_path, make_config):
+    config = make_config()
+    proteges = tmp_path / "Protégés"
+    files = {
+        name: [_write(proteges / name / "releve.txt", f"relevé {name}")]
+        for name in ("Accepte", "Incertain", "Echoue", "Modifie", "Nouveau")
+    }
+    tri, yr, _ = current_trimester()
+    with RunJournal.for_quarter(config.paths.log_dir, tri, yr) as journal:
+        for name, status in (("Accepte", ACCEPTED), ("Incertain", UNKNOWN), ("Echoue", FAILED), ("Modifie", ACCEPTED)):
+            journal.record(name, fingerprint(files[name]), status=status, message_id=f"<{name}@example.org>")
+    # pièces jointes changées depuis l'envoi accepté : nouvel envoi
+    _write(proteges / "Modifie" / "releve.txt", "relevé corrigé")
+
+    outcome = asyncio.run(effectuer_rapport_async_limited(
+        config, status_callback=lambda _: None, resume=True, dry_run=True,
+    ))
+    assert outcome["skipped"] == ["Accepte"]
+    assert outcome["unknown"] == ["Incertain"]
+    assert sorted(outcome["planned"]) == ["Echoue", "Modifie", "Nouveau"]
@@ -0,0 +1,34 @@
+# tests/test_send_session.py
+
+"""
+Runs enchaînés d'une session de surveillance (SendSession) : un seul
+dossier de run, mais des rapports par lot.
+
+    python -m pytest -q tests
+"""
+
+import asyncio
+import os
+
+from Rapports_trimestriel import SendSession, effectuer_rapport_async_limited
+
+
+def test_rapports_par_lot(tmp_path, make_config):
+    config = make_config()
+    folder = tmp_path / "Protégés" / "Dupont"
+    folder.mkdir(parents=True)
+    (folder / "releve.txt").write_text("relevé", encoding="utf-8")
+
+    async def batches():
+        async with SendSession([config]) as session:
+            for _ in range(2):
+                await effectuer_rapport_async_limited(
+                    status_callback=lambda _: None, dry_run=True, only=["Dupont"], session=session,
+                )
+            return session.run_dir
+
+    run_dir = asyncio.run(batches())
+    files = set(os.listdir(run_dir))
+    for n in ("001", "002"):
+        assert {f"perf-{n}.json", f"profile-{n}.prof", f"profile-{n}.txt"} <= files
+    assert "perf.json" not in files and "profile.prof" not in files
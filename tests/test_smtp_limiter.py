@@ -0,0 +1,92 @@
+# tests/test_smtp_limiter.py
+
+"""
+Parallélisme SMTP adaptatif (AIMD) et classement des erreurs d'envoi.
+
+    python -m pytest -q tests
+"""
+
+import smtplib
+
+from smtp_limiter import AdaptiveLimiter, LimitStore, is_deferral
+from smtp_pool import DeliveryUnknown
+
+
+def _window(limiter: AdaptiveLimiter, nbytes: int = 1000, seconds: float = 1.0) -> None:
+    """Une fenêtre complète d'envois réussis à la limite courante."""
+    epoch = limiter._epoch
+    for _ in range(limiter.limit):
+        limiter.on_success(epoch, nbytes, seconds)
+
+
+def test_fenetre_reussie_augmente_de_un():
+    limiter = AdaptiveLimiter(initial=2, maximum=4)
+    limiter.on_success(limiter._epoch, 1000, 1.0)
+    assert limiter.limit == 2
+    _window(limiter)
+    assert limiter.limit == 3
+    _window(limiter)
+    _window(limiter)
+    assert (limiter.limit, limiter.peak) == (4, 4)   # jamais au-delà du maximum
+
+
+def test_debit_degrade_pas_d_augmentation():
+    limiter = AdaptiveLimiter(initial=2, maximum=8)
+    _window(limiter, seconds=1.0)
+    assert limiter.limit == 3
+    # débit par envoi tombé au dixième (moyenne glissante : quelques envois lents)
+    for _ in range(10):
+        limiter.on_success(limiter._epoch - 1, 1000, 10.0)
+    # ajouter une connexion ne fait que partager le tuyau : on reste à 3
+    for _ in range(5):
+        _window(limiter, seconds=10.0)
+    assert limiter.limit == 3
+
+
+def test_ralentissement_divise_une_fois_par_vague():
+    limiter = AdaptiveLimiter(initial=8, maximum=16)
+    epoch = limiter._epoch
+    for _ in range(5):
+        limiter.on_throttle(epoch)   # échecs simultanés de la même vague
+    assert limiter.limit == 4
+    assert (limiter.stats["throttles"], limiter.stats["decreases"]) == (5, 1)
+    limiter.on_throttle(limiter._epoch)
+    assert limiter.limit == 2
+
+
+def test_plafond_apres_ralentissement():
+    limiter = AdaptiveLimiter(initial=6, maximum=16)
+    limiter.on_throttle(limiter._epoch)
+    assert (limiter.limit, limiter.ceiling) == (3, 5)
+    for _ in range(10):
+        _window(limiter)
+    # remonte jusqu'au dernier niveau sain, pas au-delà pendant ce run
+    assert limiter.limit == 5
+
+
+def test_succes_d_une_ancienne_vague_ignores():
+    limiter = AdaptiveLimiter(initial=4, maximum=16)
+    old = limiter._epoch
+    limiter.on_throttle(old)
+    for _ in range(10):
+        limiter.on_success(old, 1000, 1.0)
+    assert limiter.limit == 2
+
+
+def test_plafond_memorise(tmp_path):
+    path = str(tmp_path / "limits.json")
+    limiter = AdaptiveLimiter(initial=4, maximum=16, host="SMTP.Example.org", store=LimitStore(path))
+    limiter.on_throttle(limiter._epoch)
+    limiter.remember()
+    assert LimitStore(path).get("smtp.example.org") == 3
+
+
+def test_is_deferral():
+    assert is_deferral(smtplib.SMTPResponseException(421, b"trop de connexions"))
+    assert is_deferral(smtplib.SMTPResponseException(451, b"greylisting"))
+    assert not is_deferral(smtplib.SMTPResponseException(550, b"boite inconnue"))
+    assert is_deferral(smtplib.SMTPServerDisconnected("coupé avant DATA"))
+    assert is_deferral(smtplib.SMTPRecipientsRefused({"a@example.org": (450, b"plus tard")}))
+    assert not is_deferral(smtplib.SMTPRecipientsRefused({"a@example.org": (550, b"non")}))
+    # coupure après le DATA : peut-être déjà parti, jamais retenté
+    assert not is_deferral(DeliveryUnknown("réponse perdue"))